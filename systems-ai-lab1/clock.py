@@ -0,0 +1,16 @@
+class SimulatedClock:
+    """
+    Детерминированные часы для проверки истечения срока жизни фактов.
+    Передаются в ExpertSystem вместо time.monotonic
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> float:
+        """Сдвиг времени вперед на заданное число секунд"""
+        self.now += seconds
+        return self.now
@@ -0,0 +1,130 @@
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DOMAIN_FILE = "domain.txt"
+ASK_KIND = "ВОПРОС"
+DERIVE_KIND = "ВЫВОД"
+
+
+class DomainRegistry:
+    """
+    Область значений фактов: для каждого объекта - допустимые значения,
+    вид (ВОПРОС - значение спрашивается у пользователя или датчика,
+    ВЫВОД - значение только выводится правилами) и описание.
+
+    Файл области лежит рядом с файлом правил, по строке на объект:
+        ВИД объект = значение1/значение2/... ; описание
+    Пустая область (файла нет) ничего не ограничивает
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Dict] = {}
+
+    @classmethod
+    def load(cls, path: str) -> "DomainRegistry":
+        """Чтение файла области. Ошибки формата - ValueError с номером строки"""
+        domain = cls()
+        with open(path, "r", encoding="utf-8") as f:
+            for line_num, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    domain._parse_line(line)
+                except ValueError as e:
+                    raise ValueError(f"{path}, строка {line_num}: {e}") from None
+        return domain
+
+    @classmethod
+    def for_rules_file(cls, rules_file: str) -> "DomainRegistry":
+        """Область из файла domain.txt в каталоге файла правил (пустая, если файла нет)"""
+        path = os.path.join(os.path.dirname(rules_file), DOMAIN_FILE)
+        if not os.path.exists(path):
+            return cls()
+        return cls.load(path)
+
+    def _parse_line(self, line: str):
+        definition, _, description = line.partition(";")
+        kind, _, declaration = definition.strip().partition(" ")
+        kind = kind.upper()
+        if kind not in (ASK_KIND, DERIVE_KIND):
+            raise ValueError(f"вид объекта должен быть {ASK_KIND} или {DERIVE_KIND}, получено: {kind}")
+
+        obj, sep, values = declaration.partition("=")
+        obj = obj.strip()
+        if not sep or not obj:
+            raise ValueError("ожидается: ВИД объект = значение1/значение2")
+        values = [value.strip() for value in values.split("/") if value.strip()]
+        if not values:
+            raise ValueError(f"не заданы значения объекта {obj}")
+
+        self.declare(obj, values, askable=kind == ASK_KIND, description=description.strip())
+
+    def declare(self, obj: str, values: Iterable[str], askable: bool = True, description: str = ""):
+        """Описание объекта (повторное описание заменяет прежнее)"""
+        self._entries[obj] = {
+            "values": tuple(values),
+            "askable": askable,
+            "description": description,
+        }
+
+    def __contains__(self, obj: str) -> bool:
+        return obj in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def values(self, obj: str) -> Optional[Tuple[str, ...]]:
+        """Допустимые значения объекта (None - объект не описан)"""
+        entry = self._entries.get(obj)
+        return entry["values"] if entry else None
+
+    def hint(self, obj: str) -> str:
+        """Подсказка вида 'да/нет' (пустая строка - объект не описан)"""
+        values = self.values(obj)
+        return "/".join(values) if values else ""
+
+    def description(self, obj: str) -> str:
+        entry = self._entries.get(obj)
+        return entry["description"] if entry else ""
+
+    def is_askable(self, obj: str) -> Optional[bool]:
+        """Спрашивается ли значение объекта (None - объект не описан)"""
+        entry = self._entries.get(obj)
+        return entry["askable"] if entry else None
+
+    def allows(self, obj: str, value: str) -> bool:
+        """Допустимо ли значение. Для неописанных объектов ограничений нет"""
+        entry = self._entries.get(obj)
+        return entry is None or value in entry["values"]
+
+    def rule_possible(self, rule: Dict) -> bool:
+        """Может ли правило сработать: значения условий не выходят за область (как в allows)"""
+        return all(self.allows(obj, value) for obj, value in rule["conditions"])
+
+    def validate(self, obj: str, value: str) -> Optional[str]:
+        """Текст ошибки для недопустимого значения или None"""
+        if self.allows(obj, value):
+            return None
+        return f"недопустимое значение {obj} = {value}, допустимо: {self.hint(obj)}"
+
+    def check_rules(self, rules: Iterable[Dict]) -> List[str]:
+        """Несоответствия правил области: неописанные объекты, значения вне области, вывод спрашиваемых"""
+        if not self._entries:
+            return []
+
+        problems = []
+        for rule in rules:
+            conclusion_obj = rule["conclusion"][0]
+            literals = list(rule["conditions"]) + [rule["conclusion"]]
+            for obj, value in literals:
+                if obj not in self._entries:
+                    problems.append(f"объект {obj} не описан в области: {rule['text']}")
+                elif not self.allows(obj, value):
+                    problems.append(f"{self.validate(obj, value)}: {rule['text']}")
+            if self.is_askable(conclusion_obj):
+                problems.append(f"спрашиваемый объект {conclusion_obj} выводится правилом: {rule['text']}")
+        return problems
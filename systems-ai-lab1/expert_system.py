@@ -1,10 +1,15 @@
+import copy
+import heapq
+from contextlib import contextmanager
 import re
 import time
 import os
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Set, Tuple, Optional
 
 from colors import Colors
+from domain import DomainRegistry
+from persistent_map import FactSet, FactStore
 
 
 class ExpertSystem:
@@ -13,13 +18,38 @@ class ExpertSystem:
     для предметной области "Умный дом"
     """
 
-    def __init__(self, rules_file: str = "rules.txt"):
+    # Время жизни показаний датчиков (в секундах) по умолчанию
+    SENSOR_TTLS = {
+        "движение_в_коридоре": 60,
+        "движение_на_входе": 60,
+        "дым": 300,
+        "утечка_газа": 300,
+        "температура_внутренняя": 900,
+    }
+
+    def __init__(self, rules_file: str = "rules.txt", clock: Optional[Callable[[], float]] = None):
         self.rules_file = rules_file
         self.rules = []
-        self.facts = {}
-        self.derived_facts = set()
+        self.facts = FactStore()
+        self.derived_facts = FactSet()
         self.inference_log = []
         self.animation_speed = 0.05
+        self.clock = clock or time.monotonic
+        self.fact_ttls = dict(self.SENSOR_TTLS)
+        self.fact_expiry: Dict[str, float] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        # Зависимости выводов: посылка -> выведенные из нее объекты и обратно
+        self._dependents: FactStore = FactStore()
+        self._premises: FactStore = FactStore()
+        self.scenarios: Dict[str, "ExpertSystem"] = {}
+        self._subscribers: Dict[str, List[Callable[[Dict], Any]]] = {}
+        self._pending_changes: Optional[Dict[str, Optional[str]]] = None
+        self._slice_cache: Dict[FrozenSet[str], List[Dict]] = {}
+        self._rule_keys: Optional[Set[Tuple]] = None
+        self._conclusions_by_conditions: Dict[Tuple, str] = {}
+        self._condition_index: Optional[Dict[str, List[int]]] = None
+        self._concluded_objects: Set[str] = set()
+        self.domain = self.load_domain()
         self.load_rules()
         self.initialize_facts()
 
@@ -85,13 +115,16 @@ class ExpertSystem:
 
     def initialize_facts(self):
         """Инициализация стартовой ситуации"""
-        self.facts = {
-            "время_суток": "вечер",
-            "день_недели": "рабочий",
-            "присутствие_людей": "да",
-            "температура_внешняя": "холодно",
-            "освещенность": "темно",
-        }
+        previous_values = {obj: self.facts.get(obj) for obj in self._subscribers}
+        self.facts = FactStore(
+            {
+                "время_суток": "вечер",
+                "день_недели": "рабочий",
+                "присутствие_людей": "да",
+                "температура_внешняя": "холодно",
+                "освещенность": "темно",
+            }
+        )
 
         self.print_section("Инициализация системы", Colors.BRIGHT_MAGENTA)
         self.animate_text("🏠 Загружаю параметры умного дома...")
@@ -104,9 +137,17 @@ class ExpertSystem:
         print(f"\n{Colors.DIM}{'─' * 50}{Colors.RESET}")
         self.derived_facts.clear()
         self.inference_log.clear()
+        self.fact_expiry.clear()
+        self._expiry_heap.clear()
+        self._dependents.clear()
+        self._premises.clear()
+
+        for obj, old_value in previous_values.items():
+            self._fact_changed(obj, old_value)
 
     def load_rules(self):
         """Загрузка правил из файла"""
+        self.invalidate_rule_caches()
         try:
             with open(self.rules_file, "r", encoding="utf-8") as f:
                 self.rules = []
@@ -127,11 +168,26 @@ class ExpertSystem:
                 else:
                     self.print_warning("Правила не найдены")
 
+                for problem in self.domain.check_rules(self.rules):
+                    self.print_warning(f"Область значений: {problem}")
+
         except FileNotFoundError:
             self.print_warning(f"Файл {self.rules_file} не найден")
             self.animate_text("📝 Создаю новый файл с базовыми правилами...")
             self.create_default_rules()
 
+    def load_domain(self) -> DomainRegistry:
+        """Загрузка области значений фактов (без файла области ограничений нет)"""
+        try:
+            return DomainRegistry.for_rules_file(self.rules_file)
+        except ValueError as e:
+            self.print_error(f"Ошибка в области значений: {e}")
+            return DomainRegistry()
+
+    def fact_hint(self, obj: str) -> Tuple[str, str]:
+        """Возможные значения и описание объекта из области значений (domain.txt)"""
+        return self.domain.hint(obj), self.domain.description(obj) or obj.replace("_", " ")
+
     def create_default_rules(self):
         """Создание файла с базовыми правилами для умного дома"""
         default_rules = [
@@ -212,33 +268,229 @@ class ExpertSystem:
                 return False
         return True
 
+    def derive_fact(self, rule: Dict) -> bool:
+        """Добавление заключения правила в базу фактов без вывода на экран"""
+        conclusion_obj, conclusion_value = rule["conclusion"]
+
+        if conclusion_obj in self.facts:
+            return False
+
+        self.facts[conclusion_obj] = conclusion_value
+        self.derived_facts.add(conclusion_obj)
+        self._fact_changed(conclusion_obj, None)
+        self._drop_premises(conclusion_obj)
+        premises = frozenset(cond_obj for cond_obj, _ in rule["conditions"])
+        self._premises[conclusion_obj] = premises
+        for cond_obj in premises:
+            self._dependents[cond_obj] = self._dependents.get(cond_obj, frozenset()) | {conclusion_obj}
+        self.inference_log.append(
+            {
+                "rule": rule["text"],
+                "conclusion": f"{conclusion_obj} = {conclusion_value}",
+                "timestamp": datetime.now().strftime("%H:%M:%S"),
+            }
+        )
+        return True
+
     def apply_rule(self, rule: Dict) -> bool:
         """Применение правила (добавление нового факта)"""
         conclusion_obj, conclusion_value = rule["conclusion"]
 
-        if conclusion_obj not in self.facts:
-            self.facts[conclusion_obj] = conclusion_value
-            self.derived_facts.add(conclusion_obj)
-
+        if self.derive_fact(rule):
             print(f"\n{Colors.BRIGHT_GREEN}⚡ Правило сработало!{Colors.RESET}")
             print(f"{Colors.DIM}┌─ Условие: {Colors.RESET}{self._format_conditions(rule['conditions'])}")
             print(
                 f"{Colors.DIM}└─ Вывод: {Colors.RESET}{Colors.BRIGHT_YELLOW}{conclusion_obj} = {conclusion_value}{Colors.RESET}"
             )
 
-            self.inference_log.append(
-                {
-                    "rule": rule["text"],
-                    "conclusion": f"{conclusion_obj} = {conclusion_value}",
-                    "timestamp": datetime.now().strftime("%H:%M:%S"),
-                }
-            )
-
             time.sleep(0.5)
             return True
 
         return False
 
+    def add_fact(self, obj: str, value: str, ttl: Optional[float] = None):
+        """
+        Добавление исходного факта. Если задан срок жизни ttl (или он известен
+        для объекта из fact_ttls), факт будет отозван по его истечении.
+        Замена значения отзывает выведенные из старого значения факты
+        и выводит их заново из нового
+        """
+        old_value = self.facts.get(obj)
+        with self._batched_changes():
+            retracted = []
+            if old_value is not None and old_value != value:
+                retracted = self.retract_facts(self._dependents.pop(obj, ()))
+
+            self.facts[obj] = value
+            self.derived_facts.discard(obj)
+            # Исходный факт больше не зависит от посылок, из которых был выведен
+            self._drop_premises(obj)
+            self._fact_changed(obj, old_value)
+            if retracted:
+                self.saturate()
+
+        if ttl is None:
+            ttl = self.fact_ttls.get(obj)
+        if ttl is None:
+            self.fact_expiry.pop(obj, None)
+            return
+
+        expires_at = self.clock() + ttl
+        self.fact_expiry[obj] = expires_at
+        heapq.heappush(self._expiry_heap, (expires_at, obj))
+
+    def retract_facts(self, objs: Iterable[str]) -> List[str]:
+        """Удаление фактов вместе со всеми выведенными из них фактами"""
+        retracted = []
+        stack = list(objs)
+        while stack:
+            obj = stack.pop()
+            if obj not in self.facts:
+                continue
+            old_value = self.facts[obj]
+            del self.facts[obj]
+            self._fact_changed(obj, old_value)
+            self.derived_facts.discard(obj)
+            self.fact_expiry.pop(obj, None)
+            retracted.append(obj)
+            self._drop_premises(obj)
+            stack.extend(self._dependents.pop(obj, ()))
+        return retracted
+
+    def _drop_premises(self, obj: str):
+        """Удаление ребер зависимостей от посылок объекта (он больше не выведен из них)"""
+        for premise in self._premises.pop(obj, ()):
+            dependents = self._dependents.get(premise, frozenset()) - {obj}
+            if dependents:
+                self._dependents[premise] = dependents
+            else:
+                self._dependents.pop(premise, None)
+
+    def expire_facts(self) -> List[str]:
+        """
+        Отзыв фактов с истекшим сроком жизни и повторный вывод зависимых фактов.
+        Просроченные записи извлекаются из кучи, поэтому проверка стоит O(log n)
+        на каждый истекший факт, а не полный просмотр базы фактов
+        """
+        now = self.clock()
+        expired = []
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, obj = heapq.heappop(self._expiry_heap)
+            # Запись устарела, если факт был обновлен или удален после ее добавления
+            if self.fact_expiry.get(obj) != expires_at:
+                continue
+            expired.append(obj)
+
+        if expired:
+            with self._batched_changes():
+                self.retract_facts(expired)
+                self.saturate()
+        return expired
+
+    def subscribe(self, obj: str, callback: Optional[Callable[[Dict], Any]] = None, queue=None) -> Callable:
+        """
+        Подписка драйвера на изменения объекта obj. При каждом изменении его значения
+        вызывается callback(событие) или событие кладется в queue (любой объект с put()).
+        Событие - словарь с ключами object, old, new (None - факт отсутствует).
+        Возвращает обработчик, который передается в unsubscribe()
+        """
+        if (callback is None) == (queue is None):
+            raise ValueError("Нужно указать ровно один из параметров: callback или queue")
+
+        handler = callback if callback is not None else queue.put
+        self._subscribers.setdefault(obj, []).append(handler)
+        return handler
+
+    def unsubscribe(self, obj: str, handler: Callable):
+        """Отмена подписки на изменения объекта"""
+        handlers = self._subscribers.get(obj, [])
+        if handler in handlers:
+            handlers.remove(handler)
+        if not handlers:
+            self._subscribers.pop(obj, None)
+
+    def _fact_changed(self, obj: str, old_value: Optional[str]):
+        """
+        Уведомление подписчиков об изменении объекта.
+        Для объектов без подписчиков стоит одну проверку по индексу подписок
+        """
+        if obj not in self._subscribers:
+            return
+        if self._pending_changes is not None:
+            self._pending_changes.setdefault(obj, old_value)
+            return
+
+        new_value = self.facts.get(obj)
+        if new_value != old_value:
+            self._dispatch(obj, old_value, new_value)
+
+    @contextmanager
+    def _batched_changes(self):
+        """
+        Объединение изменений в одно уведомление на объект: если факт был отозван
+        и выведен заново с тем же значением, подписчики не уведомляются
+        """
+        if self._pending_changes is not None:
+            yield
+            return
+
+        self._pending_changes = {}
+        try:
+            yield
+        finally:
+            pending, self._pending_changes = self._pending_changes, None
+            for obj, old_value in pending.items():
+                new_value = self.facts.get(obj)
+                if new_value != old_value:
+                    self._dispatch(obj, old_value, new_value)
+
+    def _dispatch(self, obj: str, old_value: Optional[str], new_value: Optional[str]):
+        """Рассылка события подписчикам объекта"""
+        event = {"object": obj, "old": old_value, "new": new_value}
+        for handler in list(self._subscribers.get(obj, ())):
+            handler(event)
+
+    def fork(self) -> "ExpertSystem":
+        """
+        Ветвь системы для сценариев «что если». Базы фактов разделяют
+        структуру с исходной системой, поэтому их ветвление стоит O(1);
+        список правил, индексы правил и сроки жизни копируются (поверхностно),
+        так что ни факты, ни правила ветви не затрагивают исходную систему
+        """
+        branch = copy.copy(self)
+        branch.rules = list(self.rules)
+        branch.fact_ttls = dict(self.fact_ttls)
+        branch._slice_cache = dict(self._slice_cache)
+        branch._rule_keys = None if self._rule_keys is None else set(self._rule_keys)
+        branch._conclusions_by_conditions = dict(self._conclusions_by_conditions)
+        branch._condition_index = (
+            None if self._condition_index is None else {obj: list(ids) for obj, ids in self._condition_index.items()}
+        )
+        branch._concluded_objects = set(self._concluded_objects)
+        branch.facts = self.facts.fork()
+        branch.derived_facts = self.derived_facts.fork()
+        branch._dependents = self._dependents.fork()
+        branch._premises = self._premises.fork()
+        branch.inference_log = []
+        branch.fact_expiry = {}
+        branch._expiry_heap = []
+        branch.scenarios = {}
+        branch._subscribers = {}
+        branch._pending_changes = None
+        return branch
+
+    def what_if(self, assumptions: Dict[str, str]) -> "ExpertSystem":
+        """Ветвь с заданными допущениями и выполненным на ней выводом"""
+        branch = self.fork()
+        for obj, value in assumptions.items():
+            branch.add_fact(obj, value)
+        branch.saturate()
+        return branch
+
+    def diff_facts(self, other: "ExpertSystem") -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+        """Различия фактов двух ветвей: объект -> (значение здесь, значение в other)"""
+        return {obj: (self.facts.get(obj), other.facts.get(obj)) for obj in self.facts.diff(other.facts)}
+
     def _format_conditions(self, conditions: List[Tuple[str, str]]) -> str:
         """Форматирование условий для вывода"""
         formatted = []
@@ -246,8 +498,248 @@ class ExpertSystem:
             formatted.append(f"{Colors.CYAN}{obj}={value}{Colors.RESET}")
         return f" {Colors.WHITE}И{Colors.RESET} ".join(formatted)
 
-    def forward_chaining(self) -> List[str]:
+    def invalidate_rule_caches(self):
+        """Сброс структур, построенных по базе правил (вызывается при ее изменении)"""
+        self._slice_cache.clear()
+        self._rule_keys = None
+        self._conclusions_by_conditions = {}
+        self._condition_index = None
+        self._concluded_objects = set()
+
+    @staticmethod
+    def canonical_rule_key(rule: Dict) -> Tuple:
+        """
+        Канонический ключ правила: условия отсортированы, пробелы нормализованы.
+        Регистр сохраняется - значения сравниваются при выводе с учетом регистра.
+        Правила с равными ключами эквивалентны
+        """
+
+        def normalize(text: str) -> str:
+            return " ".join(text.split())
+
+        conditions = tuple(sorted((normalize(obj), normalize(value)) for obj, value in rule["conditions"]))
+        conclusion_obj, conclusion_value = rule["conclusion"]
+        return conditions, (normalize(conclusion_obj), normalize(conclusion_value))
+
+    def _ensure_rule_index(self):
+        """Построение хэш-индекса правил для поиска дубликатов и конфликтов за O(1)"""
+        if self._rule_keys is not None:
+            return
+        self._rule_keys = set()
+        self._conclusions_by_conditions = {}
+        for rule in self.rules:
+            self._index_rule(rule)
+
+    def _index_rule(self, rule: Dict):
+        """Добавление правила в хэш-индекс"""
+        conditions, (conclusion_obj, conclusion_value) = key = self.canonical_rule_key(rule)
+        self._rule_keys.add(key)
+        self._conclusions_by_conditions.setdefault((conditions, conclusion_obj), conclusion_value)
+
+    def classify_rule(self, rule: Dict) -> str:
+        """
+        Проверка правила относительно базы:
+        'new' - новое правило, 'duplicate' - уже есть в базе,
+        'conflict' - при тех же условиях база выводит другое значение объекта
+        """
+        self._ensure_rule_index()
+        key = self.canonical_rule_key(rule)
+        if key in self._rule_keys:
+            return "duplicate"
+
+        conditions, (conclusion_obj, conclusion_value) = key
+        known_value = self._conclusions_by_conditions.get((conditions, conclusion_obj))
+        if known_value is not None and known_value != conclusion_value:
+            return "conflict"
+        return "new"
+
+    def bulk_import_rules(self, filename: str) -> Dict[str, int]:
+        """
+        Импорт правил без дубликатов.
+        Файл читается построчно, новые правила собираются в список и дописываются
+        в файл базы одной записью (с заголовком импорта, только если они есть).
+        Конфликтующие правила добавляются, как и в add_rule, и учитываются в статистике.
+        При ошибке чтения ни база, ни файл не меняются
+        """
+        stats = {"lines": 0, "parsed": 0, "added": 0, "duplicates": 0, "conflicts": 0, "invalid": 0}
+        self._ensure_rule_index()
+
+        new_rules = []
+        try:
+            with open(filename, "r", encoding="utf-8") as src:
+                for line in src:
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    stats["lines"] += 1
+
+                    rule = self.parse_rule(line)
+                    if not rule:
+                        stats["invalid"] += 1
+                        continue
+                    stats["parsed"] += 1
+
+                    status = self.classify_rule(rule)
+                    if status == "duplicate":
+                        stats["duplicates"] += 1
+                        continue
+                    if status == "conflict":
+                        stats["conflicts"] += 1
+
+                    new_rules.append(rule)
+                    # Индексируется сразу, чтобы найти дубликаты внутри импортируемого файла
+                    self._index_rule(rule)
+        except Exception:
+            self._rule_keys = None
+            raise
+
+        if not new_rules:
+            return stats
+
+        needs_newline = False
+        if os.path.exists(self.rules_file) and os.path.getsize(self.rules_file) > 0:
+            with open(self.rules_file, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+
+        header = f"\n# Импорт из {filename} ({datetime.now().strftime('%d.%m.%Y %H:%M:%S')})\n"
+        try:
+            with open(self.rules_file, "a", encoding="utf-8") as dst:
+                dst.write(("\n" if needs_newline else "") + header + "".join(rule["text"] + "\n" for rule in new_rules))
+        except Exception:
+            self._rule_keys = None
+            raise
+
+        self.rules.extend(new_rules)
+        stats["added"] = len(new_rules)
+        self._slice_cache.clear()
+        self._condition_index = None
+        return stats
+
+    def _ensure_condition_index(self):
+        """Индекс правил по объектам условий и множество выводимых объектов"""
+        if self._condition_index is not None:
+            return
+        self._condition_index = {}
+        self._concluded_objects = set()
+        for i, rule in enumerate(self.rules):
+            self._concluded_objects.add(rule["conclusion"][0])
+            for obj, _ in rule["conditions"]:
+                self._condition_index.setdefault(obj, []).append(i)
+
+    def rank_missing_inputs(self, limit: Optional[int] = None) -> List[Tuple[str, float, int]]:
+        """
+        Ранжирование недостающих исходных фактов по тому, сколько ожидающих правил
+        они могут разблокировать. По индексу условий для каждого правила считается,
+        сколько его условий уже выполнено и не опровергнуто ли оно известными фактами.
+        Вклад правила в оценку объекта равен 1 / (число недостающих условий), так что
+        правила, которым осталось одно условие, весят больше всего.
+        Возвращает список (объект, оценка, число правил)
+        """
+        self._ensure_condition_index()
+
+        matched = [0] * len(self.rules)
+        dead = set()
+        for obj, value in self.facts.items():
+            for i in self._condition_index.get(obj, ()):
+                if i in dead:
+                    continue
+                for cond_obj, cond_value in self.rules[i]["conditions"]:
+                    if cond_obj == obj:
+                        if cond_value == value:
+                            matched[i] += 1
+                        else:
+                            dead.add(i)
+
+        scores: Dict[str, float] = {}
+        counts: Dict[str, int] = {}
+        for i, rule in enumerate(self.rules):
+            if i in dead or rule["conclusion"][0] in self.facts:
+                continue
+            missing = len(rule["conditions"]) - matched[i]
+            for cond_obj, _ in rule["conditions"]:
+                if cond_obj in self.facts or cond_obj in self._concluded_objects:
+                    continue
+                scores[cond_obj] = scores.get(cond_obj, 0.0) + 1.0 / missing
+                counts[cond_obj] = counts.get(cond_obj, 0) + 1
+
+        ranked = sorted(scores, key=lambda obj: (-scores[obj], -counts[obj], obj))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(obj, scores[obj], counts[obj]) for obj in ranked]
+
+    def get_rule_slice(self, targets: Iterable[str]) -> List[Dict]:
+        """
+        Срез базы правил, относящийся к целевым объектам:
+        правила, от которых (транзитивно) зависят заключения о targets.
+        Срез вычисляется один раз для каждого набора целей и кэшируется
+        """
+        key = frozenset(targets)
+        cached = self._slice_cache.get(key)
+        if cached is not None:
+            return cached
+
+        rules_by_conclusion: Dict[str, List[int]] = {}
+        for i, rule in enumerate(self.rules):
+            rules_by_conclusion.setdefault(rule["conclusion"][0], []).append(i)
+
+        needed = set(key)
+        stack = list(key)
+        selected = set()
+        while stack:
+            obj = stack.pop()
+            for i in rules_by_conclusion.get(obj, []):
+                if i in selected or not self._rule_possible(self.rules[i]):
+                    continue
+                selected.add(i)
+                for cond_obj, _ in self.rules[i]["conditions"]:
+                    if cond_obj not in needed:
+                        needed.add(cond_obj)
+                        stack.append(cond_obj)
+
+        rule_slice = [self.rules[i] for i in sorted(selected)]
+        self._slice_cache[key] = rule_slice
+        return rule_slice
+
+    def _rule_possible(self, rule: Dict) -> bool:
+        """Условия правила не выходят за область значений (иначе правило никогда не сработает)"""
+        return self.domain.rule_possible(rule)
+
+    def saturate(self, rules: Optional[List[Dict]] = None) -> List[str]:
+        """Прямая цепочка до неподвижной точки без анимации и вывода на экран"""
+        if rules is None:
+            rules = self.rules
+
+        applied_rules = []
+        changed = True
+        while changed:
+            changed = False
+            for rule in rules:
+                if self.check_rule_conditions(rule) and self.derive_fact(rule):
+                    applied_rules.append(rule["text"])
+                    changed = True
+        return applied_rules
+
+    def forward_chaining_for(self, targets: Iterable[str], animate: bool = False) -> Dict[str, str]:
+        """
+        Прямая цепочка только по срезу правил, влияющих на целевые объекты.
+        Возвращает найденные значения целевых объектов
+        """
+        targets = frozenset(targets)
+        rule_slice = self.get_rule_slice(targets)
+
+        if animate:
+            self.forward_chaining(rule_slice)
+        else:
+            self.saturate(rule_slice)
+
+        return {obj: self.facts[obj] for obj in targets if obj in self.facts}
+
+    def forward_chaining(self, rules: Optional[List[Dict]] = None) -> List[str]:
         """Прямая цепочка рассуждений"""
+        if rules is None:
+            rules = self.rules
+
         self.print_section("Механизм логического вывода", Colors.BRIGHT_BLUE)
         self.animate_text("🧠 Запускаю анализ правил...")
 
@@ -263,8 +755,8 @@ class ExpertSystem:
             else:
                 print(f"\n{Colors.BRIGHT_MAGENTA}🔍 Поиск применимых правил:{Colors.RESET}")
 
-            for i, rule in enumerate(self.rules):
-                self.print_progress_bar(i + 1, len(self.rules), "Анализирую правила")
+            for i, rule in enumerate(rules):
+                self.print_progress_bar(i + 1, len(rules), "Анализирую правила")
                 time.sleep(0.02)
 
                 if self.check_rule_conditions(rule):
@@ -288,29 +780,66 @@ class ExpertSystem:
 
         return applied_rules
 
-    def ask_user_for_facts(self) -> bool:
-        """Запрос у пользователя дополнительных фактов"""
+    def ask_user_for_facts(self, limit: int = 5) -> bool:
+        """
+        Запрос у пользователя дополнительных фактов. Недостающие исходные факты
+        ранжируются по числу правил, которые они могут разблокировать,
+        и запрашиваются одной формой; вывод затем повторяется один раз для всех ответов
+        """
         self.print_section("Требуется дополнительная информация", Colors.BRIGHT_YELLOW)
 
         print(f"{Colors.BRIGHT_YELLOW}🤔 Не удается применить ни одно правило{Colors.RESET}")
         print(f"{Colors.DIM}Для продолжения работы нужна дополнительная информация{Colors.RESET}")
 
-        possible_facts = [
-            ("движение_в_коридоре", "да/нет", "Обнаружено движение в коридоре"),
-            ("движение_на_входе", "да/нет", "Обнаружено движение на входе"),
-            ("температура_внутренняя", "жарко/нормально/холодно", "Температура в доме"),
-            ("дым", "да/нет", "Обнаружен дым"),
-            ("утечка_газа", "да/нет", "Обнаружена утечка газа"),
-            ("время_суток", "утро/день/вечер/ночь", "Время суток"),
-            ("день_недели", "рабочий/выходной", "Тип дня"),
-        ]
+        ranked = self.rank_missing_inputs(limit)
+        if not ranked:
+            return self._ask_free_form_fact()
+
+        print(f"\n{Colors.BRIGHT_BLUE}💡 Наиболее полезные параметры:{Colors.RESET}")
+        for i, (obj, _, rule_count) in enumerate(ranked, 1):
+            values, description = self.fact_hint(obj)
+            values_hint = f" ({values})" if values else ""
+            print(f"  {Colors.BRIGHT_MAGENTA}{i}.{Colors.RESET} {Colors.CYAN}{obj}{Colors.RESET}")
+            print(f"     {Colors.DIM}{description}{values_hint}, влияет на правил: {rule_count}{Colors.RESET}")
+
+        print(f"\n{Colors.DIM}Введите значения (Enter - пропустить, 'стоп' - завершить){Colors.RESET}")
 
-        print(f"\n{Colors.BRIGHT_BLUE}💡 Возможные параметры для ввода:{Colors.RESET}")
-        for i, (fact, values, description) in enumerate(possible_facts, 1):
-            if fact not in self.facts:
-                print(f"  {Colors.BRIGHT_MAGENTA}{i}.{Colors.RESET} {Colors.CYAN}{fact}{Colors.RESET}")
-                print(f"     {Colors.DIM}{description} ({values}){Colors.RESET}")
+        answers = {}
+        try:
+            for obj, _, _ in ranked:
+                values = self.fact_hint(obj)[0]
+                values_hint = f" ({values})" if values else ""
+                while True:
+                    value = input(f"  {Colors.BRIGHT_WHITE}➤ {obj}{values_hint}: {Colors.RESET}").strip()
+                    if not value or value.lower() in ["стоп", "stop", "exit", "quit"]:
+                        break
+                    error = self.domain.validate(obj, value)
+                    if not error:
+                        break
+                    self.print_error(error)
+
+                if value.lower() in ["стоп", "stop", "exit", "quit"]:
+                    if not answers:
+                        self.print_info("Работа завершена пользователем")
+                        return False
+                    break
+                if value:
+                    answers[obj] = value
+
+        except KeyboardInterrupt:
+            print(f"\n{Colors.BRIGHT_YELLOW}Работа прервана пользователем{Colors.RESET}")
+            return False
 
+        if not answers:
+            return self._ask_free_form_fact()
+
+        for obj, value in answers.items():
+            self.add_fact(obj, value)
+            self.print_success(f"Добавлен факт: {obj} = {value}")
+        return True
+
+    def _ask_free_form_fact(self) -> bool:
+        """Ввод произвольного факта в формате 'название=значение'"""
         print(f"\n{Colors.DIM}Введите параметр в формате: 'название=значение'{Colors.RESET}")
         print(f"{Colors.DIM}Или наберите 'стоп' для завершения{Colors.RESET}")
 
@@ -326,7 +855,11 @@ class ExpertSystem:
                 if match:
                     obj = match.group(1).strip()
                     value = match.group(2).strip()
-                    self.facts[obj] = value
+                    error = self.domain.validate(obj, value)
+                    if error:
+                        self.print_error(error)
+                        continue
+                    self.add_fact(obj, value)
                     self.print_success(f"Добавлен факт: {obj} = {value}")
                     return True
                 else:
@@ -417,6 +950,10 @@ class ExpertSystem:
         self.print_header("ЭКСПЕРТНАЯ СИСТЕМА 'УМНЫЙ ДОМ'")
 
         while True:
+            expired = self.expire_facts()
+            if expired:
+                self.print_warning(f"Истек срок действия фактов: {', '.join(expired)}")
+
             applied_rules = self.forward_chaining()
 
             self.display_facts()
@@ -494,6 +1031,125 @@ class ExpertSystem:
             if choice != "6":
                 input(f"\n{Colors.DIM}Нажмите Enter для продолжения...{Colors.RESET}")
 
+    def what_if_menu(self):
+        """Меню исследования сценариев «что если»"""
+        while True:
+            self.clear_screen()
+            self.print_header("СЦЕНАРИИ «ЧТО ЕСЛИ»", Colors.BRIGHT_MAGENTA)
+
+            print(f"\n{Colors.BRIGHT_BLUE}🔀 Доступные действия:{Colors.RESET}")
+            print(f"  {Colors.BRIGHT_CYAN}1.{Colors.RESET} Создать сценарий")
+            print(f"  {Colors.BRIGHT_CYAN}2.{Colors.RESET} Показать сценарии")
+            print(f"  {Colors.BRIGHT_CYAN}3.{Colors.RESET} Сравнить два сценария")
+            print(f"  {Colors.BRIGHT_CYAN}4.{Colors.RESET} Удалить сценарий")
+            print(f"  {Colors.BRIGHT_CYAN}5.{Colors.RESET} Вернуться в главное меню")
+
+            choice = input(f"\n{Colors.BRIGHT_WHITE}➤ Выберите действие (1-5): {Colors.RESET}").strip()
+
+            if choice == "1":
+                self.create_scenario()
+            elif choice == "2":
+                self.show_scenarios()
+            elif choice == "3":
+                self.compare_scenarios()
+            elif choice == "4":
+                name = input(f"{Colors.BRIGHT_WHITE}➤ Имя сценария: {Colors.RESET}").strip()
+                if self.scenarios.pop(name, None) is not None:
+                    self.print_success(f"Сценарий '{name}' удален")
+                else:
+                    self.print_error("Сценарий не найден")
+            elif choice == "5":
+                break
+            else:
+                self.print_error("Неверный выбор. Введите число от 1 до 5")
+
+            if choice != "5":
+                input(f"\n{Colors.DIM}Нажмите Enter для продолжения...{Colors.RESET}")
+
+    def create_scenario(self):
+        """Создание сценария из допущений вида 'объект=значение, объект=значение'"""
+        self.print_section("Новый сценарий", Colors.BRIGHT_GREEN)
+        print(f"{Colors.DIM}Пример: присутствие_людей=нет, время_суток=ночь{Colors.RESET}")
+
+        assumptions_input = input(f"\n{Colors.BRIGHT_WHITE}➤ Допущения: {Colors.RESET}").strip()
+        assumptions = {}
+        for part in assumptions_input.split(","):
+            match = re.match(r"(\w+)\s*=\s*(.+)", part.strip())
+            if match:
+                assumptions[match.group(1).strip()] = match.group(2).strip()
+            elif part.strip():
+                self.print_warning(f"Пропущено: '{part.strip()}' (формат 'название=значение')")
+
+        if not assumptions:
+            self.print_error("Допущения не заданы")
+            return
+
+        default_name = f"сценарий_{len(self.scenarios) + 1}"
+        name = input(f"{Colors.BRIGHT_WHITE}➤ Имя сценария [{default_name}]: {Colors.RESET}").strip()
+        name = name or default_name
+
+        branch = self.what_if(assumptions)
+        self.scenarios[name] = branch
+        self.print_success(f"Сценарий '{name}' создан")
+
+        base = self.fork()
+        base.saturate()
+        self._print_fact_diff(base.diff_facts(branch), "Текущее состояние", name)
+
+    def show_scenarios(self):
+        """Список сохраненных сценариев"""
+        self.print_section("Сценарии", Colors.BRIGHT_CYAN)
+        if not self.scenarios:
+            self.print_info("Сценариев пока нет")
+            return
+
+        for name, branch in self.scenarios.items():
+            print(
+                f"  {Colors.BRIGHT_MAGENTA}•{Colors.RESET} {Colors.CYAN}{name}{Colors.RESET}: "
+                f"фактов {len(branch.facts)}, выведено {len(branch.derived_facts)}"
+            )
+
+    def compare_scenarios(self):
+        """Сравнение двух сценариев (или сценария с текущим состоянием)"""
+        self.show_scenarios()
+        if not self.scenarios:
+            return
+
+        print(f"\n{Colors.DIM}Пустое имя - текущее состояние системы{Colors.RESET}")
+        first = input(f"{Colors.BRIGHT_WHITE}➤ Первый сценарий: {Colors.RESET}").strip()
+        second = input(f"{Colors.BRIGHT_WHITE}➤ Второй сценарий: {Colors.RESET}").strip()
+
+        branches = []
+        for name in (first, second):
+            if not name:
+                base = self.fork()
+                base.saturate()
+                branches.append(base)
+            elif name in self.scenarios:
+                branches.append(self.scenarios[name])
+            else:
+                self.print_error(f"Сценарий '{name}' не найден")
+                return
+
+        self._print_fact_diff(
+            branches[0].diff_facts(branches[1]), first or "Текущее состояние", second or "Текущее состояние"
+        )
+
+    def _print_fact_diff(self, diff: Dict[str, Tuple[Optional[str], Optional[str]]], left: str, right: str):
+        """Вывод различий фактов двух ветвей"""
+        self.print_section(f"{left} → {right}", Colors.BRIGHT_BLUE)
+        if not diff:
+            self.print_info("Различий нет")
+            return
+
+        for obj, (old_value, new_value) in diff.items():
+            old_value = old_value if old_value is not None else "—"
+            new_value = new_value if new_value is not None else "—"
+            print(
+                f"  {Colors.CYAN}{obj}{Colors.RESET}: {Colors.DIM}{old_value}{Colors.RESET} → "
+                f"{Colors.BRIGHT_YELLOW}{new_value}{Colors.RESET}"
+            )
+
     def show_rules(self):
         """Отображение всех правил"""
         self.print_section("Текущие правила", Colors.BRIGHT_CYAN)
@@ -535,7 +1191,17 @@ class ExpertSystem:
         rule = self.parse_rule(rule_text)
 
         if rule:
+            status = self.classify_rule(rule)
+            if status == "duplicate":
+                self.print_warning("Такое правило уже есть в базе")
+                return
+            if status == "conflict":
+                self.print_warning("Правило противоречит существующему: при тех же условиях выводится другое значение")
+            for problem in self.domain.check_rules([rule]):
+                self.print_warning(f"Область значений: {problem}")
+
             self.rules.append(rule)
+            self.invalidate_rule_caches()
             self.save_rules()
             self.print_success("Правило добавлено успешно")
 
@@ -580,6 +1246,7 @@ class ExpertSystem:
 
                 if confirm in ["да", "yes", "y"]:
                     self.rules.pop(rule_num)
+                    self.invalidate_rule_caches()
                     self.save_rules()
                     self.print_success("Правило удалено")
                 else:
@@ -597,28 +1264,30 @@ class ExpertSystem:
         filename = input(f"{Colors.BRIGHT_WHITE}➤ Введите имя файла: {Colors.RESET}").strip()
 
         try:
-            with open(filename, "r", encoding="utf-8") as f:
-                imported_rules = []
-                for line_num, line in enumerate(f, 1):
-                    line = line.strip()
-                    if line and not line.startswith("#"):
-                        rule = self.parse_rule(line)
-                        if rule:
-                            imported_rules.append(rule)
-                        else:
-                            self.print_warning(f"Пропущена строка {line_num}: неверный формат")
-
-                if imported_rules:
-                    self.rules.extend(imported_rules)
-                    self.save_rules()
-                    self.print_success(f"Импортировано правил: {len(imported_rules)}")
-                else:
-                    self.print_warning("Не найдено валидных правил для импорта")
-
+            start = time.perf_counter()
+            stats = self.bulk_import_rules(filename)
+            elapsed = time.perf_counter() - start
         except FileNotFoundError:
             self.print_error("Файл не найден")
+            return
         except Exception as e:
             self.print_error(f"Ошибка при импорте: {e}")
+            return
+
+        self.print_section("Статистика импорта", Colors.BRIGHT_CYAN)
+        print(f"  Прочитано правил:     {Colors.BRIGHT_WHITE}{stats['lines']}{Colors.RESET}")
+        print(f"  Добавлено:            {Colors.BRIGHT_GREEN}{stats['added']}{Colors.RESET}")
+        print(f"  Из них конфликтующих: {Colors.BRIGHT_RED}{stats['conflicts']}{Colors.RESET}")
+        print(f"  Дубликатов пропущено: {Colors.BRIGHT_YELLOW}{stats['duplicates']}{Colors.RESET}")
+        print(f"  Неверный формат:      {Colors.BRIGHT_RED}{stats['invalid']}{Colors.RESET}")
+        print(f"  Время импорта:        {Colors.BRIGHT_WHITE}{elapsed:.3f} с{Colors.RESET}")
+
+        if stats["conflicts"]:
+            self.print_warning("Конфликтующие правила при тех же условиях выводят другое значение объекта")
+        if stats["added"]:
+            self.print_success(f"Импортировано правил: {stats['added']}")
+        else:
+            self.print_warning("Не найдено новых правил для импорта")
 
     def export_rules(self):
         """Экспорт правил в файл"""
@@ -1,13 +1,50 @@
+import argparse
+import json
 import time
 
 from colors import Colors
 from expert_system import ExpertSystem
+from session import SessionRecorder, replay_session
 
 
 def main():
     """Главная функция"""
-    system = ExpertSystem()
+    parser = argparse.ArgumentParser(description="Экспертная система 'Умный дом' (прямая цепочка)")
+    parser.add_argument("--record", metavar="ФАЙЛ", help="записать ввод пользователя в файл сеанса")
+    parser.add_argument("--replay", metavar="ФАЙЛ", help="воспроизвести сеанс без участия пользователя")
+    parser.add_argument("--report", metavar="ФАЙЛ", help="сохранить отчет воспроизведения в JSON")
+    args = parser.parse_args()
 
+    if args.replay:
+        report = replay_session(args.replay, ExpertSystem, main_menu, session_outcome)
+        print(f"Воспроизведено вводов: {report['consumed']} из {report['inputs']}")
+        print(f"Время: {report['elapsed']:.3f} с")
+        if not report["rules_match"]:
+            print("Внимание: файл правил или описание области (domain.txt) отличается от записанного в сеансе")
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        return
+
+    if args.record:
+        with SessionRecorder(args.record):
+            main_menu(ExpertSystem())
+    else:
+        main_menu(ExpertSystem())
+
+
+def session_outcome(system: ExpertSystem) -> dict:
+    """Итоговое состояние системы для сравнения воспроизведенных сеансов"""
+    return {
+        "facts": dict(system.facts.items()),
+        "derived_facts": sorted(system.derived_facts),
+        "conclusions": [entry["conclusion"] for entry in system.inference_log],
+        "rules": len(system.rules),
+    }
+
+
+def main_menu(system: ExpertSystem):
+    """Главное меню"""
     while True:
         system.clear_screen()
         system.print_header("ГЛАВНОЕ МЕНЮ", Colors.BRIGHT_CYAN)
@@ -43,10 +80,13 @@ def main():
         print(
             f"  {Colors.BRIGHT_CYAN}5.{Colors.RESET} {Colors.BRIGHT_WHITE}📊 Показать журнал вывода{Colors.RESET}"
         )
-        print(f"  {Colors.BRIGHT_CYAN}6.{Colors.RESET} {Colors.BRIGHT_RED}🚪 Выйти{Colors.RESET}")
+        print(
+            f"  {Colors.BRIGHT_CYAN}6.{Colors.RESET} {Colors.BRIGHT_MAGENTA}🔀 Сценарии «что если»{Colors.RESET}"
+        )
+        print(f"  {Colors.BRIGHT_CYAN}7.{Colors.RESET} {Colors.BRIGHT_RED}🚪 Выйти{Colors.RESET}")
 
         try:
-            choice = input(f"\n{Colors.BRIGHT_WHITE}➤ Ваш выбор (1-6): {Colors.RESET}").strip()
+            choice = input(f"\n{Colors.BRIGHT_WHITE}➤ Ваш выбор (1-7): {Colors.RESET}").strip()
 
             if choice == "1":
                 system.run()
@@ -64,11 +104,13 @@ def main():
                 system.show_inference_log()
                 input(f"\n{Colors.DIM}Нажмите Enter для продолжения...{Colors.RESET}")
             elif choice == "6":
+                system.what_if_menu()
+            elif choice == "7":
                 system.print_section("До свидания!", Colors.BRIGHT_MAGENTA)
                 system.animate_text("🏠 Благодарим за использование системы умного дома!")
                 break
             else:
-                system.print_error("Неверный выбор. Введите число от 1 до 6")
+                system.print_error("Неверный выбор. Введите число от 1 до 7")
                 time.sleep(1)
 
         except KeyboardInterrupt:
@@ -0,0 +1,367 @@
+from collections.abc import MutableMapping, MutableSet
+from typing import Any, Iterable, Iterator, Optional, Tuple
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+_HASH_BITS = 64
+_HASH_MASK = (1 << _HASH_BITS) - 1
+
+_MISSING = object()
+
+
+def _hash(key) -> int:
+    return hash(key) & _HASH_MASK
+
+
+class _BitmapNode:
+    """
+    Узел хэш-дерева (HAMT). Каждый элемент entries - либо пара (ключ, значение),
+    либо дочерний узел. bitmap отмечает, какие из 32 позиций заняты
+    """
+
+    __slots__ = ("bitmap", "entries")
+
+    def __init__(self, bitmap: int, entries: tuple):
+        self.bitmap = bitmap
+        self.entries = entries
+
+
+class _CollisionNode:
+    """Узел для ключей с полностью совпадающими хэшами"""
+
+    __slots__ = ("hash", "entries")
+
+    def __init__(self, key_hash: int, entries: tuple):
+        self.hash = key_hash
+        self.entries = entries
+
+
+_EMPTY_NODE = _BitmapNode(0, ())
+
+
+def _index(bitmap: int, bit: int) -> int:
+    return bin(bitmap & (bit - 1)).count("1")
+
+
+def _find(node, shift: int, key_hash: int, key, default):
+    while True:
+        if isinstance(node, _CollisionNode):
+            for k, v in node.entries:
+                if k == key:
+                    return v
+            return default
+
+        bit = 1 << ((key_hash >> shift) & _MASK)
+        if not node.bitmap & bit:
+            return default
+
+        entry = node.entries[_index(node.bitmap, bit)]
+        if isinstance(entry, tuple):
+            return entry[1] if entry[0] == key else default
+        node = entry
+        shift += _BITS
+
+
+def _merge(shift: int, entry1: tuple, hash1: int, entry2: tuple, hash2: int):
+    """Создание поддерева из двух пар, попавших в одну позицию"""
+    if shift >= _HASH_BITS:
+        return _CollisionNode(hash1, (entry1, entry2))
+
+    idx1 = (hash1 >> shift) & _MASK
+    idx2 = (hash2 >> shift) & _MASK
+    if idx1 == idx2:
+        return _BitmapNode(1 << idx1, (_merge(shift + _BITS, entry1, hash1, entry2, hash2),))
+
+    entries = (entry1, entry2) if idx1 < idx2 else (entry2, entry1)
+    return _BitmapNode((1 << idx1) | (1 << idx2), entries)
+
+
+def _assoc(node, shift: int, key_hash: int, key, value) -> Tuple[Any, bool]:
+    """Копирование пути от корня к ключу с новым значением. Возвращает (узел, добавлен_ли_ключ)"""
+    if isinstance(node, _CollisionNode):
+        for i, (k, _) in enumerate(node.entries):
+            if k == key:
+                entries = node.entries[:i] + ((key, value),) + node.entries[i + 1 :]
+                return _CollisionNode(node.hash, entries), False
+        return _CollisionNode(node.hash, node.entries + ((key, value),)), True
+
+    bit = 1 << ((key_hash >> shift) & _MASK)
+    idx = _index(node.bitmap, bit)
+
+    if not node.bitmap & bit:
+        entries = node.entries[:idx] + ((key, value),) + node.entries[idx:]
+        return _BitmapNode(node.bitmap | bit, entries), True
+
+    entry = node.entries[idx]
+    if isinstance(entry, tuple):
+        if entry[0] == key:
+            if entry[1] is value:
+                return node, False
+            new_entry = (key, value)
+            added = False
+        else:
+            new_entry = _merge(shift + _BITS, entry, _hash(entry[0]), (key, value), key_hash)
+            added = True
+    else:
+        new_entry, added = _assoc(entry, shift + _BITS, key_hash, key, value)
+        if new_entry is entry:
+            return node, False
+
+    entries = node.entries[:idx] + (new_entry,) + node.entries[idx + 1 :]
+    return _BitmapNode(node.bitmap, entries), added
+
+
+def _without(node, shift: int, key_hash: int, key):
+    """Копирование пути без ключа. Возвращает тот же узел, если ключа нет, и None, если узел опустел"""
+    if isinstance(node, _CollisionNode):
+        entries = tuple(e for e in node.entries if e[0] != key)
+        if len(entries) == len(node.entries):
+            return node
+        if len(entries) == 1:
+            return entries[0]
+        return _CollisionNode(node.hash, entries)
+
+    bit = 1 << ((key_hash >> shift) & _MASK)
+    if not node.bitmap & bit:
+        return node
+
+    idx = _index(node.bitmap, bit)
+    entry = node.entries[idx]
+    if isinstance(entry, tuple):
+        if entry[0] != key:
+            return node
+        new_entry = None
+    else:
+        new_entry = _without(entry, shift + _BITS, key_hash, key)
+        if new_entry is entry:
+            return node
+        # Поддерево из одной пары сворачивается обратно в пару
+        if isinstance(new_entry, _BitmapNode) and len(new_entry.entries) == 1:
+            if isinstance(new_entry.entries[0], tuple):
+                new_entry = new_entry.entries[0]
+
+    if new_entry is None:
+        if node.bitmap == bit:
+            return None
+        entries = node.entries[:idx] + node.entries[idx + 1 :]
+        return _BitmapNode(node.bitmap & ~bit, entries)
+
+    entries = node.entries[:idx] + (new_entry,) + node.entries[idx + 1 :]
+    return _BitmapNode(node.bitmap, entries)
+
+
+def _iter_entries(node) -> Iterator[tuple]:
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        for entry in node.entries:
+            if isinstance(entry, tuple):
+                yield entry
+            else:
+                stack.append(entry)
+
+
+def _diff(node1, node2) -> Iterator[Any]:
+    """
+    Ключи, значения которых различаются в двух деревьях.
+    Общие (разделяемые) поддеревья пропускаются по идентичности
+    """
+    if node1 is node2:
+        return
+
+    if isinstance(node1, _BitmapNode) and isinstance(node2, _BitmapNode):
+        for pos in range(_WIDTH):
+            bit = 1 << pos
+            in1 = node1.bitmap & bit
+            in2 = node2.bitmap & bit
+            if not in1 and not in2:
+                continue
+            entry1 = node1.entries[_index(node1.bitmap, bit)] if in1 else None
+            entry2 = node2.entries[_index(node2.bitmap, bit)] if in2 else None
+            if entry1 is entry2:
+                continue
+            if isinstance(entry1, _BitmapNode) and isinstance(entry2, _BitmapNode):
+                yield from _diff(entry1, entry2)
+                continue
+            yield from _diff_flat(entry1, entry2)
+        return
+
+    yield from _diff_flat(node1, node2)
+
+
+def _diff_flat(entry1, entry2) -> Iterator[Any]:
+    """Сравнение двух произвольных элементов дерева через их содержимое"""
+
+    def as_dict(entry) -> dict:
+        if entry is None:
+            return {}
+        if isinstance(entry, tuple):
+            return {entry[0]: entry[1]}
+        return dict(_iter_entries(entry))
+
+    items1 = as_dict(entry1)
+    items2 = as_dict(entry2)
+    for key in items1.keys() | items2.keys():
+        if items1.get(key, _MISSING) != items2.get(key, _MISSING):
+            yield key
+
+
+class PersistentMap:
+    """
+    Неизменяемое отображение с разделением структуры (hash array mapped trie).
+    set/delete возвращают новую версию за O(log32 n), копируя только путь
+    от корня до ключа; остальные узлы разделяются между версиями
+    """
+
+    __slots__ = ("_root", "_size")
+
+    def __init__(self, items: Optional[Iterable[Tuple[Any, Any]]] = None):
+        self._root = _EMPTY_NODE
+        self._size = 0
+        if items is not None:
+            for key, value in items:
+                self._root, added = _assoc(self._root, 0, _hash(key), key, value)
+                self._size += added
+
+    @classmethod
+    def _from_root(cls, root, size: int) -> "PersistentMap":
+        new_map = cls.__new__(cls)
+        new_map._root = root
+        new_map._size = size
+        return new_map
+
+    def get(self, key, default=None):
+        return _find(self._root, 0, _hash(key), key, default)
+
+    def __getitem__(self, key):
+        value = _find(self._root, 0, _hash(key), key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        return _find(self._root, 0, _hash(key), key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Any]:
+        for key, _ in _iter_entries(self._root):
+            yield key
+
+    def items(self) -> Iterator[Tuple[Any, Any]]:
+        return _iter_entries(self._root)
+
+    def set(self, key, value) -> "PersistentMap":
+        root, added = _assoc(self._root, 0, _hash(key), key, value)
+        if root is self._root:
+            return self
+        return self._from_root(root, self._size + added)
+
+    def delete(self, key) -> "PersistentMap":
+        root = _without(self._root, 0, _hash(key), key)
+        if root is self._root:
+            return self
+        if root is None:
+            root = _EMPTY_NODE
+        return self._from_root(root, self._size - 1)
+
+    def diff(self, other: "PersistentMap") -> Iterator[Any]:
+        """Ключи, по которым две версии отображения различаются"""
+        return _diff(self._root, other._root)
+
+
+class FactStore(MutableMapping):
+    """
+    Изменяемая база фактов поверх PersistentMap.
+    fork() создает независимую ветку за O(1): обе ветки разделяют
+    структуру до первой записи. Порядок обхода совпадает с порядком добавления,
+    как у обычного dict
+    """
+
+    def __init__(self, items=None):
+        self._map = PersistentMap()
+        self._next_seq = 0
+        if items is not None:
+            self.update(items)
+
+    def fork(self) -> "FactStore":
+        branch = FactStore.__new__(FactStore)
+        branch._map = self._map
+        branch._next_seq = self._next_seq
+        return branch
+
+    def __getitem__(self, key):
+        return self._map[key][1]
+
+    def __setitem__(self, key, value):
+        entry = self._map.get(key)
+        if entry is None:
+            self._map = self._map.set(key, (self._next_seq, value))
+            self._next_seq += 1
+        elif entry[1] != value:
+            self._map = self._map.set(key, (entry[0], value))
+
+    def __delitem__(self, key):
+        if key not in self._map:
+            raise KeyError(key)
+        self._map = self._map.delete(key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._map
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def __iter__(self) -> Iterator[Any]:
+        for key, _ in sorted(self._map.items(), key=lambda item: item[1][0]):
+            yield key
+
+    def clear(self):
+        self._map = PersistentMap()
+
+    def diff(self, other: "FactStore") -> Iterator[Any]:
+        """Объекты, значения которых различаются в двух ветках"""
+        for key in self._map.diff(other._map):
+            if self.get(key) != other.get(key):
+                yield key
+
+    def __repr__(self) -> str:
+        return f"FactStore({dict(self.items())!r})"
+
+
+class FactSet(MutableSet):
+    """Изменяемое множество поверх PersistentMap с ветвлением за O(1)"""
+
+    def __init__(self, items=None):
+        self._map = PersistentMap()
+        if items is not None:
+            for item in items:
+                self.add(item)
+
+    def fork(self) -> "FactSet":
+        branch = FactSet.__new__(FactSet)
+        branch._map = self._map
+        return branch
+
+    def add(self, value):
+        self._map = self._map.set(value, True)
+
+    def discard(self, value):
+        self._map = self._map.delete(value)
+
+    def __contains__(self, value) -> bool:
+        return value in self._map
+
+    def __len__(self) -> int:
+        return len(self._map)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._map)
+
+    def clear(self):
+        self._map = PersistentMap()
+
+    def __repr__(self) -> str:
+        return f"FactSet({set(self)!r})"
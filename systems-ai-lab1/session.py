@@ -0,0 +1,193 @@
+import builtins
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from domain import DOMAIN_FILE
+
+ANSI_PATTERN = re.compile(r"\x1b\[[0-9;]*m")
+
+
+def file_sha256(path: str) -> Optional[str]:
+    """Хэш файла правил или описания области (None, если файла нет)"""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+class SessionRecorder:
+    """
+    Запись всего пользовательского ввода (выбор в меню, факты, ответы)
+    в JSONL-файл. Используется как контекстный менеджер вокруг сеанса.
+    options - параметры создания системы, с которыми сеанс будет воспроизведен
+    """
+
+    def __init__(self, path: str, rules_file: str = "rules.txt", options: Optional[Dict] = None):
+        self.path = path
+        self.rules_file = rules_file
+        self.options = options or {}
+        self._file = None
+        self._original_input = None
+
+    def __enter__(self) -> "SessionRecorder":
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._write(
+            {
+                "type": "header",
+                "started": datetime.now().isoformat(timespec="seconds"),
+                "rules_file": self.rules_file,
+                "rules_sha256": file_sha256(self.rules_file),
+                "domain_sha256": file_sha256(domain_path(self.rules_file)),
+                "options": self.options,
+            }
+        )
+        self._original_input = builtins.input
+        builtins.input = self._recording_input
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        builtins.input = self._original_input
+        self._file.close()
+        return False
+
+    def _write(self, event: Dict):
+        self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def _recording_input(self, prompt: str = "") -> str:
+        plain_prompt = ANSI_PATTERN.sub("", str(prompt)).strip()
+        try:
+            value = self._original_input(prompt)
+        except (KeyboardInterrupt, EOFError) as e:
+            self._write({"type": "interrupt", "prompt": plain_prompt, "error": type(e).__name__})
+            raise
+        self._write({"type": "input", "prompt": plain_prompt, "value": value})
+        return value
+
+
+def domain_path(rules_file: str) -> str:
+    """Описание предметной области лежит рядом с файлом правил"""
+    return os.path.join(os.path.dirname(rules_file), DOMAIN_FILE)
+
+
+def load_session(path: str) -> List[Dict]:
+    """Чтение записанного сеанса"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay_session(
+    path: str,
+    create: Callable[..., object],
+    run: Callable[[object], None],
+    outcome: Callable[[object], Dict],
+) -> Dict:
+    """
+    Воспроизведение сеанса без участия пользователя: ввод берется из записи,
+    задержки и очистка экрана отключены, вывод подавляется.
+    create(**options) создает систему с параметрами из заголовка записи, run(system) выполняет сеанс, outcome(system) - итоговое состояние.
+    Сеанс выполняется во временной копии рабочего каталога с файлом правил
+    и описанием предметной области, чтобы правки базы правил при воспроизведении не затрагивали исходный файл
+    """
+    events = load_session(path)
+    header = events[0] if events and events[0].get("type") == "header" else {}
+    inputs = [e for e in events if e.get("type") in ("input", "interrupt")]
+
+    rules_file = header.get("rules_file", "rules.txt")
+    options = header.get("options") or {}
+    step_times = []
+    position = 0
+    last_mark = time.perf_counter()
+
+    def replay_input(prompt: str = "") -> str:
+        nonlocal position, last_mark
+        now = time.perf_counter()
+        step_times.append(now - last_mark)
+        last_mark = now
+
+        if position >= len(inputs):
+            raise EOFError("Запись сеанса закончилась")
+        event = inputs[position]
+        position += 1
+        if event["type"] == "interrupt":
+            raise KeyboardInterrupt if event.get("error") == "KeyboardInterrupt" else EOFError
+        return event["value"]
+
+    original_cwd = os.getcwd()
+    original_input, original_sleep, original_system = builtins.input, time.sleep, os.system
+    output = io.StringIO()
+    system = None
+    exhausted = False
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if os.path.exists(rules_file):
+            shutil.copy(rules_file, os.path.join(workdir, os.path.basename(rules_file)))
+        rules_sha256 = file_sha256(rules_file)
+        domain_file = domain_path(rules_file)
+        if os.path.exists(domain_file):
+            shutil.copy(domain_file, os.path.join(workdir, DOMAIN_FILE))
+        domain_sha256 = file_sha256(domain_file)
+
+        builtins.input = replay_input
+        time.sleep = lambda seconds: None
+        os.system = lambda command: 0
+        start = time.perf_counter()
+        try:
+            os.chdir(workdir)
+            with contextlib.redirect_stdout(output):
+                system = create(**options)
+                run(system)
+        except EOFError:
+            exhausted = True
+        finally:
+            elapsed = time.perf_counter() - start
+            os.chdir(original_cwd)
+            builtins.input, time.sleep, os.system = original_input, original_sleep, original_system
+
+    return {
+        "session": path,
+        "options": options,
+        "inputs": len(inputs),
+        "consumed": position,
+        "exhausted": exhausted,
+        "rules_match": header.get("rules_sha256") in (None, rules_sha256)
+        and header.get("domain_sha256", domain_sha256) == domain_sha256,
+        "elapsed": elapsed,
+        "step_times": step_times,
+        "output_lines": output.getvalue().count("\n"),
+        "outcome": outcome(system) if system is not None else None,
+    }
+
+
+def compare_reports(old: Dict, new: Dict) -> Dict:
+    """Сравнение двух отчетов воспроизведения одного сеанса (например, разных версий)"""
+    return {
+        "elapsed_old": old["elapsed"],
+        "elapsed_new": new["elapsed"],
+        "speedup": old["elapsed"] / new["elapsed"] if new["elapsed"] else None,
+        "same_outcome": old["outcome"] == new["outcome"],
+        "same_inputs_consumed": old["consumed"] == new["consumed"],
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Использование: python session.py старый_отчет.json новый_отчет.json")
+        sys.exit(1)
+
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        old_report = json.load(f)
+    with open(sys.argv[2], "r", encoding="utf-8") as f:
+        new_report = json.load(f)
+    print(json.dumps(compare_reports(old_report, new_report), ensure_ascii=False, indent=2))
@@ -0,0 +1,118 @@
+"""
+Проверка срока жизни фактов на детерминированных часах (SimulatedClock).
+
+    python -m unittest test_expiry
+"""
+
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from clock import SimulatedClock
+from expert_system import ExpertSystem
+
+RULES = """
+ЕСЛИ движение_на_входе=да ТО свет_на_входе=да
+ЕСЛИ свет_на_входе=да И время_суток=вечер ТО экономия_энергии=нет
+ЕСЛИ дым=да ТО тревога=да
+ЕСЛИ утечка_газа=да ТО тревога=да
+ЕСЛИ время_суток=вечер ТО режим=вечерний
+ЕСЛИ время_суток=ночь ТО режим=ночной
+ЕСЛИ окно=открыто И отопление=да ТО проветривание=да
+ЕСЛИ форточка=открыта ТО проветривание=да
+"""
+
+
+class ExpiryTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        rules_file = os.path.join(cls.directory.name, "rules.txt")
+        with open(rules_file, "w", encoding="utf-8") as f:
+            f.write(RULES)
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.base = ExpertSystem(rules_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.directory.cleanup()
+
+    def setUp(self):
+        # Ветвь стартовой ситуации со своими часами (инициализация системы идет с анимацией)
+        self.clock = SimulatedClock()
+        self.system = self.base.fork()
+        self.system.clock = self.clock
+        self.system.fact_ttls = {}
+
+    def test_facts_expire_in_deadline_order(self):
+        self.system.add_fact("дым", "нет", ttl=10)
+        self.system.add_fact("утечка_газа", "нет", ttl=30)
+        self.system.add_fact("движение_на_входе", "нет", ttl=20)
+
+        self.clock.advance(15)
+        self.assertEqual(self.system.expire_facts(), ["дым"])
+        self.clock.advance(10)
+        self.assertEqual(self.system.expire_facts(), ["движение_на_входе"])
+        self.clock.advance(10)
+        self.assertEqual(self.system.expire_facts(), ["утечка_газа"])
+        self.assertEqual(self.system.expire_facts(), [])
+
+    def test_refreshed_fact_keeps_new_deadline(self):
+        self.system.add_fact("дым", "нет", ttl=10)
+        self.clock.advance(5)
+        self.system.add_fact("дым", "нет", ttl=10)
+
+        self.clock.advance(6)
+        self.assertEqual(self.system.expire_facts(), [])
+        self.assertIn("дым", self.system.facts)
+        self.clock.advance(5)
+        self.assertEqual(self.system.expire_facts(), ["дым"])
+        self.assertNotIn("дым", self.system.facts)
+
+    def test_expiry_retracts_dependent_conclusions(self):
+        self.system.add_fact("движение_на_входе", "да", ttl=60)
+        self.system.saturate()
+        self.assertEqual(self.system.facts["свет_на_входе"], "да")
+        self.assertEqual(self.system.facts["экономия_энергии"], "нет")
+
+        self.clock.advance(61)
+        self.assertEqual(self.system.expire_facts(), ["движение_на_входе"])
+        self.assertNotIn("свет_на_входе", self.system.facts)
+        self.assertNotIn("экономия_энергии", self.system.facts)
+        self.assertEqual(self.system.facts["время_суток"], "вечер")
+
+    def test_conclusion_rederived_from_remaining_facts(self):
+        self.system.add_fact("дым", "да", ttl=300)
+        self.system.add_fact("утечка_газа", "да")
+        self.system.saturate()
+
+        self.clock.advance(301)
+        self.assertEqual(self.system.expire_facts(), ["дым"])
+        self.assertEqual(self.system.facts["тревога"], "да")
+        self.assertIn("тревога", self.system.derived_facts)
+
+    def test_overwrite_rederives_dependents(self):
+        self.system.saturate()
+        self.assertEqual(self.system.facts["режим"], "вечерний")
+
+        self.system.add_fact("время_суток", "ночь")
+        self.assertEqual(self.system.facts["режим"], "ночной")
+
+    def test_rederived_fact_drops_stale_premises(self):
+        self.system.add_fact("окно", "открыто")
+        self.system.add_fact("отопление", "да")
+        self.system.add_fact("форточка", "открыта")
+        self.system.saturate()
+
+        # Вывод из окна и отопления отозван, проветривание выведено заново из форточки
+        self.system.add_fact("окно", "закрыто")
+        self.assertEqual(self.system.facts["проветривание"], "да")
+
+        self.assertEqual(self.system.retract_facts(["отопление"]), ["отопление"])
+        self.assertEqual(self.system.facts["проветривание"], "да")
+
+
+if __name__ == "__main__":
+    unittest.main()
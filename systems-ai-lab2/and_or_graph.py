@@ -0,0 +1,205 @@
+import sys
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+Literal = Tuple[str, str]
+SupportSet = FrozenSet[Literal]
+
+DEFAULT_MAX_SETS = 256
+
+
+class AndOrGraph:
+    """
+    База знаний, представленная как AND-OR граф: цель (объект, значение) - OR-узел
+    над своими правилами, правило - AND-узел над условиями.
+
+    Для каждой цели вычисляются и кэшируются опорные наборы - минимальные
+    непротиворечивые наборы листовых фактов, при которых правила доказывают цель.
+    Наборы считаются неподвижной точкой по конусу цели, поэтому циклы в правилах
+    допустимы. Если наборов больше max_sets, результат считается неизвестным (None)
+    и не используется для отсечения.
+
+    Граф строится лениво и сбрасывается при изменении базы (по KnowledgeBase.version)
+    """
+
+    def __init__(self, kb, max_sets: int = DEFAULT_MAX_SETS):
+        self.kb = kb
+        self.max_sets = max_sets
+        self._version = getattr(kb, "version", None)
+        # (цель, с промежуточными объектами) -> наборы или None при переполнении
+        self._cache: Dict[Tuple[Literal, bool], Optional[List[SupportSet]]] = {}
+
+    def support_sets(self, goal: Literal) -> Optional[List[SupportSet]]:
+        """Минимальные наборы листовых фактов, доказывающие цель (по возрастанию размера)"""
+        if not self.kb.concludes(goal[0]):
+            return [frozenset([goal])]
+        return self._family(goal, extended=False)
+
+    def needed_facts(self, goal: Literal) -> Optional[Set[str]]:
+        """Листовые объекты, от которых зависит доказательство цели"""
+        sets = self.support_sets(goal)
+        if sets is None:
+            return None
+        return {obj for support in sets for obj, _ in support}
+
+    def remaining_support(
+        self, goal: Literal, facts: Dict[str, str], asked: Iterable[str] = ()
+    ) -> Optional[List[SupportSet]]:
+        """
+        Что еще нужно узнать: наборы, не опровергнутые известными фактами,
+        без уже подтвержденных фактов. Пустой набор в результате означает,
+        что известных фактов уже достаточно
+        """
+        sets = self.support_sets(goal)
+        if sets is None:
+            return None
+
+        asked = set(asked)
+        remaining = []
+        for support in sets:
+            if any(_refuted(literal, facts, asked) for literal in support):
+                continue
+            remaining.append(frozenset(lit for lit in support if facts.get(lit[0]) != lit[1]))
+        return _minimize(remaining)
+
+    def is_ruled_out(self, goal: Literal, facts: Dict[str, str], asked: Iterable[str] = ()) -> bool:
+        """
+        Могут ли правила цели еще ее доказать. Цель исключается, только если
+        каждый набор опровергнут фактами. Здесь наборы учитывают и промежуточные
+        объекты: выводимый объект может оказаться в фактах или быть спрошен,
+        и тогда его правила не важны. Поэтому наличие промежуточного факта
+        в конусе цели не дает ее ошибочно исключить
+        """
+        if not self.kb.concludes(goal[0]):
+            return False
+        sets = self._family(goal, extended=True)
+        if sets is None:
+            return False
+
+        asked = set(asked)
+        return all(any(_refuted(literal, facts, asked) for literal in support) for support in sets)
+
+    def _check_version(self):
+        version = getattr(self.kb, "version", None)
+        if version != self._version:
+            self._cache.clear()
+            self._version = version
+
+    def _family(self, goal: Literal, extended: bool) -> Optional[List[SupportSet]]:
+        self._check_version()
+        key = (goal, extended)
+        if key not in self._cache:
+            self._solve_cone(goal, extended)
+        return self._cache[key]
+
+    def _solve_cone(self, goal: Literal, extended: bool):
+        """Неподвижная точка наборов для всех выводимых целей конуса"""
+        cone: List[Literal] = []
+        seen = {goal}
+        queue = [goal]
+        while queue:
+            literal = queue.pop()
+            cone.append(literal)
+            for rule in self.kb.rules_for(literal):
+                for condition in rule["conditions"]:
+                    if condition not in seen and self.kb.concludes(condition[0]):
+                        seen.add(condition)
+                        queue.append(condition)
+
+        families: Dict[Literal, Optional[List[SupportSet]]] = {}
+        for literal in cone:
+            cached = self._cache.get((literal, extended), _UNSOLVED)
+            families[literal] = [] if cached is _UNSOLVED else cached
+        pending = [literal for literal in cone if (literal, extended) not in self._cache]
+        rules = {literal: self.kb.rules_for(literal) for literal in pending}
+
+        changed = True
+        while changed:
+            changed = False
+            for literal in pending:
+                if families[literal] is None:
+                    continue
+                family = self._rules_family(rules[literal], families, extended)
+                if family is None or set(family) != set(families[literal]):
+                    families[literal] = family
+                    changed = True
+
+        for literal in pending:
+            family = families[literal]
+            if family is not None:
+                family.sort(key=lambda support: (len(support), sorted(support)))
+            self._cache[(literal, extended)] = family
+
+    def _rules_family(self, rules, families, extended: bool) -> Optional[List[SupportSet]]:
+        result: List[SupportSet] = []
+        for rule in rules:
+            product: List[SupportSet] = [frozenset()]
+            for condition in rule["conditions"]:
+                if condition in families:
+                    options = families[condition]
+                    if options is None:
+                        return None
+                    if extended:
+                        options = options + [frozenset([condition])]
+                else:
+                    options = [frozenset([condition])]
+
+                product = [
+                    combined
+                    for partial in product
+                    for option in options
+                    for combined in (partial | option,)
+                    if _consistent(combined)
+                ]
+                product = _minimize(product)
+                if len(product) > self.max_sets:
+                    return None
+                if not product:
+                    break
+            result.extend(product)
+
+        result = _minimize(result)
+        if len(result) > self.max_sets:
+            return None
+        return result
+
+
+_UNSOLVED = object()
+
+
+def _refuted(literal: Literal, facts: Dict[str, str], asked: Set[str]) -> bool:
+    """Факт опровергнут: известно другое значение или вопрос уже задан без ответа"""
+    obj, value = literal
+    if obj in facts:
+        return facts[obj] != value
+    return obj in asked
+
+
+def _consistent(support: SupportSet) -> bool:
+    """В наборе нет двух разных значений одного объекта"""
+    objects = [obj for obj, _ in support]
+    return len(objects) == len(set(objects))
+
+
+def _minimize(sets: List[SupportSet]) -> List[SupportSet]:
+    """Удаление повторов и надмножеств"""
+    unique = sorted(set(sets), key=len)
+    result: List[SupportSet] = []
+    for candidate in unique:
+        if not any(kept <= candidate for kept in result):
+            result.append(candidate)
+    return result
+
+
+if __name__ == "__main__":
+    from expert_system_backward import BackwardExpertSystem
+
+    system = BackwardExpertSystem(sys.argv[1] if len(sys.argv) > 1 else "rules.txt", interactive=False)
+    graph = system.and_or_graph
+    for goal in dict.fromkeys(rule["conclusion"] for rule in system.kb):
+        sets = graph.support_sets(goal)
+        print(f"{goal[0]} = {goal[1]}")
+        if sets is None:
+            print(f"  наборов больше {graph.max_sets}")
+            continue
+        for support in sets:
+            print("  ИЛИ " + " И ".join(f"{obj}={value}" for obj, value in sorted(support)))
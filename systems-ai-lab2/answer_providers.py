@@ -0,0 +1,190 @@
+import csv
+import json
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+from colors import Colors
+
+SKIP_ANSWERS = ("нет", "no", "skip", "")
+
+
+class AnswerProvider(ABC):
+    """
+    Источник значений фактов, которые не удалось вывести по правилам.
+    answer() возвращает значение факта или None, если значение неизвестно.
+    indent - текущий отступ трассировки (используется консольным источником)
+    """
+
+    @abstractmethod
+    def answer(self, fact_name: str, indent: str = "") -> Optional[str]:
+        """Значение факта или None"""
+
+    def ask_batch(self, fact_names: List[str], indent: str = "") -> Dict[str, Optional[str]]:
+        """
+        Значения сразу нескольких фактов (в порядке важности) - одним обращением
+        к источнику, если он это умеет. По умолчанию - по одному вопросу
+        """
+        return {fact_name: self.answer(fact_name, indent) for fact_name in fact_names}
+
+
+class ConsoleAnswerProvider(AnswerProvider):
+    """
+    Интерактивный запрос значения у пользователя. С областью значений (domain.DomainRegistry)
+    подсказка берется из нее, а недопустимое значение запрашивается повторно
+    """
+
+    def __init__(self, domain=None):
+        self.domain = domain
+
+    def answer(self, fact_name: str, indent: str = "") -> Optional[str]:
+        print(f"\n{indent}{Colors.BRIGHT_YELLOW}❓ Требуется информация:{Colors.RESET}")
+        print(f"{indent}{Colors.CYAN}   {fact_name}{Colors.RESET}")
+
+        hint = self._hint(fact_name)
+        if hint:
+            print(f"{indent}{Colors.DIM}   Возможные значения: {hint}{Colors.RESET}")
+
+        return self._read_value(fact_name, indent, "Введите значение")
+
+    def ask_batch(self, fact_names: List[str], indent: str = "") -> Dict[str, Optional[str]]:
+        """Одна форма со всеми вопросами: сначала список, затем значения по порядку"""
+        if not fact_names:
+            return {}
+
+        print(f"\n{indent}{Colors.BRIGHT_YELLOW}❓ Для доказательства может понадобиться ({len(fact_names)}):{Colors.RESET}")
+        for fact_name in fact_names:
+            hint = self._hint(fact_name)
+            hint = f" ({hint})" if hint else ""
+            print(f"{indent}{Colors.CYAN}   {fact_name}{Colors.DIM}{hint}{Colors.RESET}")
+
+        return {fact_name: self._read_value(fact_name, indent, fact_name) for fact_name in fact_names}
+
+    def _hint(self, fact_name: str) -> str:
+        return self.domain.hint(fact_name) if self.domain else ""
+
+    def _read_value(self, fact_name: str, indent: str, prompt: str) -> Optional[str]:
+        """Ввод значения с повтором при значении вне области; None - факт пропущен"""
+        while True:
+            user_input = input(
+                f"{indent}{Colors.BRIGHT_WHITE}   ➤ {prompt} (или 'нет' для пропуска): {Colors.RESET}"
+            ).strip()
+
+            if user_input.lower() in SKIP_ANSWERS:
+                print(f"{indent}{Colors.DIM}   ⊗ Факт пропущен{Colors.RESET}")
+                return None
+
+            error = self.domain.validate(fact_name, user_input) if self.domain else None
+            if not error:
+                break
+            print(f"{indent}{Colors.BRIGHT_RED}   ✗ {error}{Colors.RESET}")
+
+        print(f"{indent}{Colors.BRIGHT_GREEN}   ✓ Добавлено: {fact_name} = {user_input}{Colors.RESET}")
+        return user_input
+
+
+class StaticAnswerProvider(AnswerProvider):
+    """Ответы из готового словаря объект -> значение"""
+
+    def __init__(self, answers: Optional[Dict[str, str]] = None):
+        self.answers = dict(answers or {})
+
+    def answer(self, fact_name: str, indent: str = "") -> Optional[str]:
+        return self.answers.get(fact_name)
+
+
+class FileAnswerProvider(StaticAnswerProvider):
+    """
+    Ответы из файла фактов: JSON-объект {"объект": "значение"}
+    или CSV со строками "объект,значение" (формат определяется по расширению)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        super().__init__(self.load(path))
+
+    @staticmethod
+    def load(path: str) -> Dict[str, str]:
+        with open(path, "r", encoding="utf-8") as f:
+            if path.lower().endswith(".json"):
+                return {str(obj): str(value) for obj, value in json.load(f).items()}
+
+            answers = {}
+            for row in csv.reader(f):
+                if len(row) < 2 or not row[0].strip() or row[0].lstrip().startswith("#"):
+                    continue
+                answers[row[0].strip()] = row[1].strip()
+            return answers
+
+
+class CallbackAnswerProvider(AnswerProvider):
+    """Ответ вычисляется функцией callback(объект) -> значение или None"""
+
+    def __init__(self, callback: Callable[[str], Optional[str]]):
+        self.callback = callback
+
+    def answer(self, fact_name: str, indent: str = "") -> Optional[str]:
+        return self.callback(fact_name)
+
+
+class BatchCallbackAnswerProvider(AnswerProvider):
+    """
+    Источник с пакетным запросом (например, форма удаленного интерфейса):
+    callback(список объектов) -> {объект: значение}. round_trips - число обращений
+    """
+
+    def __init__(self, callback: Callable[[List[str]], Dict[str, Optional[str]]]):
+        self.callback = callback
+        self.round_trips = 0
+
+    def answer(self, fact_name: str, indent: str = "") -> Optional[str]:
+        return self.ask_batch([fact_name], indent).get(fact_name)
+
+    def ask_batch(self, fact_names: List[str], indent: str = "") -> Dict[str, Optional[str]]:
+        if not fact_names:
+            return {}
+        self.round_trips += 1
+        answers = self.callback(list(fact_names))
+        return {fact_name: answers.get(fact_name) for fact_name in fact_names}
+
+
+class SensorStubProvider(AnswerProvider):
+    """
+    Заглушка датчиков: фиксированные показания из readings, а для остальных
+    спрашиваемых объектов области значений (domain.DomainRegistry) - случайное
+    допустимое значение (воспроизводимое при заданном seed).
+    delay имитирует время опроса датчика
+    """
+
+    def __init__(
+        self,
+        readings: Optional[Dict[str, str]] = None,
+        seed: Optional[int] = None,
+        delay: float = 0.0,
+        domain=None,
+    ):
+        self.readings = dict(readings or {})
+        self.domain = domain
+        self.delay = delay
+        self.queries = 0
+        self._random = random.Random(seed)
+
+    def answer(self, fact_name: str, indent: str = "") -> Optional[str]:
+        if self.delay:
+            time.sleep(self.delay)
+        return self._read(fact_name)
+
+    def ask_batch(self, fact_names: List[str], indent: str = "") -> Dict[str, Optional[str]]:
+        """Один опрос всех датчиков: задержка - как у одного запроса"""
+        if self.delay and fact_names:
+            time.sleep(self.delay)
+        return {fact_name: self._read(fact_name) for fact_name in fact_names}
+
+    def _read(self, fact_name: str) -> Optional[str]:
+        self.queries += 1
+        if fact_name in self.readings:
+            return self.readings[fact_name]
+        if self.domain and self.domain.is_askable(fact_name):
+            return self._random.choice(self.domain.values(fact_name))
+        return None
@@ -0,0 +1,230 @@
+import asyncio
+import sys
+import time
+from datetime import datetime
+from typing import Dict, FrozenSet, Optional, Tuple
+
+
+class MockSensorService:
+    """
+    Локальная заглушка сервиса датчиков. read() отвечает через delay секунд
+    (или через delays[объект]), показания берутся из readings; для неизвестных
+    объектов возвращается None. Счетчики queries и cancelled позволяют проверить,
+    что лишние запросы действительно отменяются
+    """
+
+    def __init__(
+        self,
+        readings: Optional[Dict[str, str]] = None,
+        delay: float = 0.05,
+        delays: Optional[Dict[str, float]] = None,
+    ):
+        self.readings = dict(readings or {})
+        self.delay = delay
+        self.delays = dict(delays or {})
+        self.queries = 0
+        self.cancelled = 0
+        self.completed = 0
+
+    async def read(self, obj: str) -> Optional[str]:
+        self.queries += 1
+        try:
+            await asyncio.sleep(self.delays.get(obj, self.delay))
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        self.completed += 1
+        return self.readings.get(obj)
+
+
+class AsyncBackwardProver:
+    """
+    Асинхронный режим обратной цепочки для систем, где листовые факты
+    поступают от медленных датчиков.
+
+    Все условия правила проверяются одновременно: листовые факты запрашиваются
+    у датчиков параллельно (каждый не дольше timeout секунд), выводимые -
+    доказываются в отдельных задачах. Как только одно условие не выполнено,
+    остальные проверки правила отменяются. Запрос к датчику разделяется
+    между всеми правилами, которым нужен этот объект, и отменяется только тогда,
+    когда он больше никому не нужен.
+
+    Факты, ответы датчиков и журнал вывода записываются в переданную систему
+    (BackwardExpertSystem), поэтому результаты видны и синхронному режиму.
+    Область значений системы действует так же, как в синхронном режиме:
+    недостижимые цели и правила с условиями вне области не проверяются,
+    а показание датчика вне области отбрасывается
+    """
+
+    def __init__(self, system, sensors, timeout: float = 1.0):
+        self.system = system
+        self.sensors = sensors
+        self.timeout = timeout
+        self._queries: Dict[str, asyncio.Task] = {}
+        self._interest: Dict[str, int] = {}
+
+    def prove(self, goal: Tuple[str, str]) -> bool:
+        """Синхронная обертка над prove_async"""
+        return asyncio.run(self.prove_async(goal))
+
+    async def prove_async(self, goal: Tuple[str, str]) -> bool:
+        try:
+            return await self._prove(goal, frozenset())
+        finally:
+            for task in self._queries.values():
+                task.cancel()
+            self._queries.clear()
+            self._interest.clear()
+
+    async def _prove(self, goal: Tuple[str, str], path: FrozenSet[Tuple[str, str]]) -> bool:
+        goal_obj, goal_value = goal
+        facts = self.system.facts
+
+        if goal_obj in facts:
+            return facts[goal_obj] == goal_value
+        if goal in path:
+            return False
+
+        if self.system._impossible_goal(goal):
+            return False
+
+        path = path | {goal}
+        rules = self.system.kb.rules_for(goal)
+        if self.system.domain:
+            rules = [rule for rule in rules if self.system._rule_possible(rule)]
+        for rule in rules:
+            if await self._prove_conditions(rule["conditions"], path):
+                # Пока проверялись условия, значение могли получить от датчика
+                if goal_obj in facts:
+                    return facts[goal_obj] == goal_value
+                facts[goal_obj] = goal_value
+                self.system.inference_log.append(
+                    {
+                        "rule": rule["text"],
+                        "goal": f"{goal_obj} = {goal_value}",
+                        "timestamp": datetime.now().strftime("%H:%M:%S"),
+                    }
+                )
+                return True
+
+        if goal_obj in facts:
+            return facts[goal_obj] == goal_value
+        if self.system.kb.concludes(goal_obj):
+            # Выводимые объекты датчики не измеряют
+            return False
+        value = await self._read(goal_obj)
+        return value == goal_value
+
+    async def _prove_conditions(self, conditions, path: FrozenSet[Tuple[str, str]]) -> bool:
+        """Одновременная проверка условий; при первом невыполненном остальные отменяются"""
+        facts = self.system.facts
+        if any(obj in facts and facts[obj] != value for obj, value in conditions):
+            return False
+
+        pending = [
+            asyncio.ensure_future(self._prove((obj, value), path)) for obj, value in conditions if obj not in facts
+        ]
+        if not pending:
+            return True
+
+        try:
+            while pending:
+                done, rest = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                pending = list(rest)
+                if not all(task.result() for task in done):
+                    return False
+            return True
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _read(self, obj: str) -> Optional[str]:
+        """Значение листового факта от датчика (общий запрос для всех ожидающих)"""
+        facts = self.system.facts
+        if obj in facts:
+            return facts[obj]
+        if obj in self.system.asked_facts and obj not in self._queries:
+            return None
+
+        task = self._queries.get(obj)
+        if task is None:
+            task = asyncio.ensure_future(self._query(obj))
+            self._queries[obj] = task
+            self.system.asked_facts.add(obj)
+
+        self._interest[obj] = self._interest.get(obj, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            self._interest[obj] -= 1
+            if not self._interest[obj] and not task.done():
+                # Запрос больше никому не нужен - отменяем его и разрешаем повторный
+                task.cancel()
+                del self._queries[obj]
+                self.system.asked_facts.discard(obj)
+            raise
+
+    async def _query(self, obj: str) -> Optional[str]:
+        try:
+            value = await asyncio.wait_for(self.sensors.read(obj), self.timeout)
+        except asyncio.TimeoutError:
+            value = None
+        if value is not None and self.system.domain.validate(obj, value):
+            value = None
+        self.system._answers[obj] = value
+        if value is not None and obj not in self.system.facts:
+            self.system.facts[obj] = value
+        return value
+
+
+if __name__ == "__main__":
+    from answer_providers import CallbackAnswerProvider
+    from expert_system_backward import BackwardExpertSystem
+
+    delay = float(sys.argv[1]) if len(sys.argv) > 1 else 0.2
+    readings = {
+        "движение_на_входе": "да",
+        "движение_в_коридоре": "нет",
+        "дым": "нет",
+        "утечка_газа": "нет",
+        "температура_внутренняя": "нормально",
+    }
+    goals = [
+        ("сигнал_тревоги", "да"),
+        ("включить_ночник", "да"),
+        ("пожарная_тревога", "да"),
+        ("перекрыть_газ", "да"),
+        ("уменьшить_отопление", "да"),
+    ]
+
+    def slow_sensor(obj: str) -> Optional[str]:
+        time.sleep(delay)
+        return readings.get(obj)
+
+    scenarios = [
+        ("день, дома никого", {"время_суток": "день", "присутствие_людей": "нет"}),
+        ("ночь", {"время_суток": "ночь"}),
+    ]
+    for name, facts in scenarios:
+        sequential = BackwardExpertSystem(interactive=False, answer_provider=CallbackAnswerProvider(slow_sensor))
+        sequential.facts = dict(facts)
+        start = time.perf_counter()
+        expected = [sequential.prove(goal, trace=False) for goal in goals]
+        sequential_time = time.perf_counter() - start
+
+        sensors = MockSensorService(readings, delay=delay)
+        system = BackwardExpertSystem(interactive=False)
+        system.facts = dict(facts)
+        prover = AsyncBackwardProver(system, sensors, timeout=delay * 5)
+        start = time.perf_counter()
+        results = [prover.prove(goal) for goal in goals]
+        elapsed = time.perf_counter() - start
+
+        print(f"Сценарий: {name}")
+        for goal, result in zip(goals, results):
+            print(f"  {goal[0]} = {goal[1]}: {'доказано' if result else 'не доказано'}")
+        print(f"  совпадает с последовательным режимом: {'да' if results == expected else 'нет'}")
+        print(f"  запросов к датчикам: {sensors.queries}, отменено: {sensors.cancelled}")
+        print(f"  время: {elapsed:.3f} с (последовательно: {sequential_time:.3f} с)")
@@ -0,0 +1,162 @@
+"""
+Пакетное доказательство целей для многих домов в пуле процессов.
+
+    python batch_prove.py дома.jsonl [--goal сигнал_тревоги=да ...] [--workers 4] [--chunk 64]
+                          [--shared-rules] [--output результаты.jsonl]
+
+Строка входного файла - факты одного дома: {"id": ..., "facts": {"объект": "значение"}}
+или просто {"объект": "значение"}. Факты дома служат ответами на вопросы вместо input().
+Без --goal проверяются все заключения базы правил.
+
+База правил загружается один раз в каждом процессе-обработчике; с --shared-rules она
+компилируется (compiled_rules) в разделяемую память, и обработчики подключаются к ней
+без копирования. Результаты выводятся в JSONL в порядке входного файла по мере готовности,
+статистика производительности - в stderr
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from answer_providers import StaticAnswerProvider
+from compiled_rules import CompiledRuleBase
+from expert_system_backward import BackwardExpertSystem
+
+# Состояние процесса-обработчика: система с загруженной базой правил и цели
+_worker: Dict = {}
+
+
+def parse_goal(text: str) -> Tuple[str, str]:
+    obj, sep, value = text.partition("=")
+    if not sep or not obj.strip() or not value.strip():
+        raise ValueError(f"цель должна иметь вид объект=значение: {text}")
+    return obj.strip(), value.strip()
+
+
+def iter_homes(path: str) -> Iterator[Tuple[object, Dict[str, str]]]:
+    """Пары (идентификатор, факты) из JSONL; без поля id идентификатор - номер строки"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_num, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            facts = record.get("facts")
+            if isinstance(facts, dict):
+                yield record.get("id", line_num), facts
+            else:
+                yield line_num, record
+
+
+def _init_worker(rules_file: str, goals: List[Tuple[str, str]], shared_name: Optional[str]):
+    # С разделяемой базой файл правил не разбирается: область значений читается рядом с ним
+    rules = CompiledRuleBase.attach(shared_name) if shared_name else None
+    system = BackwardExpertSystem(rules_file, answer_provider=StaticAnswerProvider(), interactive=False, rules=rules)
+    _worker["system"] = system
+    _worker["goals"] = goals
+
+
+def prove_home(task: Tuple[object, Dict[str, str]]) -> Dict:
+    """Все цели для одного дома с общей таблицей подцелей"""
+    home_id, facts = task
+    system = _worker["system"]
+    system.answer_provider = StaticAnswerProvider(facts)
+    system.initialize_facts()
+    system.facts = {}
+
+    results = system.prove_set(_worker["goals"])
+    return {
+        "id": home_id,
+        "results": {f"{obj}={value}": result for (obj, value), result in results.items()},
+        "questions": len(system.asked_facts),
+        "answered": sum(1 for obj in system.asked_facts if system.known_answer(obj) is not None),
+    }
+
+
+def run_batch(
+    homes_path: str,
+    goals: List[Tuple[str, str]],
+    rules_file: str = "rules.txt",
+    workers: int = 1,
+    chunk: int = 64,
+    shared_name: Optional[str] = None,
+) -> Iterator[Dict]:
+    """Результаты по домам в порядке входного файла; workers <= 1 - в текущем процессе"""
+    homes = iter_homes(homes_path)
+    if workers <= 1:
+        _init_worker(rules_file, goals, shared_name)
+        yield from map(prove_home, homes)
+        return
+
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(rules_file, goals, shared_name)) as pool:
+        yield from pool.imap(prove_home, homes, chunksize=chunk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетное доказательство целей для домов из JSONL")
+    parser.add_argument("homes", help="JSONL с фактами домов")
+    parser.add_argument("--goal", action="append", default=[], help="цель объект=значение (можно повторять)")
+    parser.add_argument("--rules", default="rules.txt", help="файл правил")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="число процессов")
+    parser.add_argument("--chunk", type=int, default=64, help="домов в одном задании обработчика")
+    parser.add_argument(
+        "--shared-rules",
+        action="store_true",
+        help="одна скомпилированная база в разделяемой памяти (меньше памяти, правила декодируются при каждом поиске)",
+    )
+    parser.add_argument("--output", metavar="ФАЙЛ", help="файл результатов (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    system = BackwardExpertSystem(args.rules, interactive=False)
+    try:
+        goals = [parse_goal(text) for text in args.goal]
+    except ValueError as e:
+        parser.error(str(e))
+    if not goals:
+        goals = list(dict.fromkeys(rule["conclusion"] for rule in system.kb))
+
+    compiled = shm = None
+    if args.shared_rules:
+        compiled = CompiledRuleBase.from_rules(list(system.kb))
+        shm = compiled.to_shared_memory()
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    homes = proven = questions = answered = 0
+    started = time.perf_counter()
+    try:
+        for record in run_batch(
+            args.homes, goals, args.rules, args.workers, args.chunk, shm.name if shm else None
+        ):
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            homes += 1
+            proven += sum(record["results"].values())
+            questions += record["questions"]
+            answered += record["answered"]
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if shm is not None:
+            compiled.close()
+            shm.close()
+            shm.unlink()
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Домов: {homes}, целей: {len(goals)}, доказано: {proven} из {homes * len(goals)}, "
+        f"вопросов: {questions}, из них с ответом из файла: {answered}",
+        file=sys.stderr,
+    )
+    if elapsed > 0:
+        print(
+            f"Время: {elapsed:.2f} с, процессов: {max(args.workers, 1)}, домов/с: {homes / elapsed:.0f}, "
+            f"доказательств/с: {homes * len(goals) / elapsed:.0f}",
+            file=sys.stderr,
+        )
+
+
+if __name__ == "__main__":
+    main()
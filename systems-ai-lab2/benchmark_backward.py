@@ -0,0 +1,204 @@
+"""
+Бенчмарк обратной цепочки на синтетических базах правил.
+
+Формы баз:
+    chain   - глубокая линейная цепочка ц_0 <- ц_1 <- ... <- ц_N
+    wide_or - одно заключение, много правил; подходит только последнее
+    diamond - слои ромбов: каждая вершина зависит от двух вершин следующего слоя,
+              поэтому подцели общие
+    cycle   - кольцо правил к_i <- к_(i+1) и выход из каждой вершины через лист
+
+На вопросы отвечает оракул по сценарию базы. Для каждой формы измеряются задержка
+доказательства (медиана повторов), число проверок правил, подцелей и вопросов,
+пиковая память (tracemalloc). Результаты можно сохранить в JSON и сравнить
+с прежним отчетом:
+
+    python benchmark_backward.py [--scale 1.0] [--repeat 5] [--json отчет.json] [--compare прежний.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+from answer_providers import CallbackAnswerProvider
+from colors import Colors
+from expert_system_backward import BackwardExpertSystem
+from tracing import TraceSink
+
+METRICS = ("latency_ms", "rule_attempts", "subgoals", "questions", "peak_kb")
+
+
+class CountingTraceSink(TraceSink):
+    """Подсчет событий доказательства по видам"""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def emit(self, event):
+        self.counts[event["event"]] += 1
+
+
+def chain_base(size):
+    """Цепочка глубины size; лист отвечает 'да'"""
+    rules = [f"ЕСЛИ ц_{i + 1}=да ТО ц_{i}=да" for i in range(size)]
+    return rules, ("ц_0", "да"), {f"ц_{size}": "да"}
+
+
+def wide_or_base(size):
+    """size правил одного заключения; подходит только последнее"""
+    rules = [f"ЕСЛИ режим=авто И вход_{i}=да ТО цель=да" for i in range(size)]
+    answers = {"режим": "авто", **{f"вход_{i}": "нет" for i in range(size - 1)}, f"вход_{size - 1}": "да"}
+    return rules, ("цель", "да"), answers
+
+
+def diamond_base(size):
+    """size слоев по 8 вершин: вершина зависит от двух соседних вершин следующего слоя"""
+    width = 8
+    rules = []
+    for layer in range(size):
+        for j in range(width):
+            rules.append(
+                f"ЕСЛИ р_{layer + 1}_{j}=да И р_{layer + 1}_{(j + 1) % width}=да ТО р_{layer}_{j}=да"
+            )
+    answers = {f"р_{size}_{j}": "да" for j in range(width)}
+    return rules, ("р_0_0", "да"), answers
+
+
+def cycle_base(size):
+    """Кольцо из size вершин; из кольца выводит только лист последней вершины"""
+    rules = []
+    for i in range(size):
+        rules.append(f"ЕСЛИ к_{(i + 1) % size}=да ТО к_{i}=да")
+        rules.append(f"ЕСЛИ лист_{i}=да ТО к_{i}=да")
+    answers = {f"лист_{i}": "нет" for i in range(size - 1)}
+    answers[f"лист_{size - 1}"] = "да"
+    return rules, ("к_0", "да"), answers
+
+
+# (название, построитель базы, размер при scale=1)
+SHAPES = [
+    ("chain", chain_base, 2000),
+    ("wide_or", wide_or_base, 1000),
+    ("diamond", diamond_base, 200),
+    ("cycle", cycle_base, 500),
+]
+
+
+def make_system(directory, name, rules, answers, counters):
+    rules_path = os.path.join(directory, f"{name}.txt")
+    with open(rules_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(rules) + "\n")
+
+    def oracle(obj):
+        counters["questions"] += 1
+        return answers.get(obj)
+
+    return BackwardExpertSystem(rules_path, answer_provider=CallbackAnswerProvider(oracle), interactive=False)
+
+
+def prove_once(system, goal, sink=None):
+    system.facts = {}
+    system.asked_facts = set()
+    system.inference_log = []
+    system.trace_sink = sink
+    started = time.perf_counter()
+    result = system.prove(goal, trace=False)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def run_shape(directory, name, build, size, repeat):
+    rules, goal, answers = build(size)
+    counters = {"questions": 0}
+    system = make_system(directory, name, rules, answers, counters)
+
+    latencies = []
+    result = None
+    for _ in range(repeat):
+        result, elapsed = prove_once(system, goal)
+        latencies.append(elapsed)
+
+    counters["questions"] = 0
+    sink = CountingTraceSink()
+    prove_once(system, goal, sink)
+    questions = counters["questions"]
+
+    tracemalloc.start()
+    prove_once(system, goal)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "shape": name,
+        "size": size,
+        "rules": len(rules),
+        "result": result,
+        "latency_ms": round(statistics.median(latencies), 3),
+        "rule_attempts": sink.counts["rule_try"],
+        "subgoals": sink.counts["goal_enter"],
+        "questions": questions,
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def run_benchmark(scale=1.0, repeat=5, shapes=None):
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, build, size in SHAPES:
+            if shapes and name not in shapes:
+                continue
+            rows.append(run_shape(directory, name, build, max(2, int(size * scale)), repeat))
+    return rows
+
+
+def print_report(rows, baseline=None):
+    previous = {row["shape"]: row for row in baseline or []}
+    header = (
+        f"{'Форма':<10}{'размер':>8}{'правил':>8}{'итог':>6}{'задержка, мс':>14}"
+        f"{'правила':>10}{'подцели':>10}{'вопросы':>10}{'память, КБ':>12}"
+    )
+    print(header)
+    print("─" * len(header))
+    for row in rows:
+        print(
+            f"{row['shape']:<10}{row['size']:>8}{row['rules']:>8}{'да' if row['result'] else 'нет':>6}"
+            f"{row['latency_ms']:>14.3f}{row['rule_attempts']:>10}{row['subgoals']:>10}"
+            f"{row['questions']:>10}{row['peak_kb']:>12.1f}"
+        )
+        old = previous.get(row["shape"])
+        if old is None or old["size"] != row["size"]:
+            continue
+        changes = []
+        for metric in METRICS:
+            if old[metric]:
+                changes.append(f"{metric} {100 * (row[metric] / old[metric] - 1):+.1f}%")
+            elif row[metric] != old[metric]:
+                changes.append(f"{metric} {old[metric]} → {row[metric]}")
+        if old["result"] != row["result"]:
+            changes.append("РЕЗУЛЬТАТ ИЗМЕНИЛСЯ")
+        print(f"{'':<10}{Colors.DIM}к прежнему: {', '.join(changes)}{Colors.RESET}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк обратной цепочки на синтетических базах правил")
+    parser.add_argument("--scale", type=float, default=1.0, help="множитель размеров баз")
+    parser.add_argument("--repeat", type=int, default=5, help="повторов для замера задержки")
+    parser.add_argument("--shape", action="append", choices=[name for name, _, _ in SHAPES], help="только эти формы")
+    parser.add_argument("--json", metavar="ФАЙЛ", help="сохранить результаты в JSON")
+    parser.add_argument("--compare", metavar="ФАЙЛ", help="сравнить с прежним JSON-отчетом")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    report = run_benchmark(args.scale, args.repeat, args.shape)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,169 @@
+"""
+Отсечение недостижимых целей областью значений фактов.
+
+Цели с опечаткой в значении или объекте и цели, которые не выводит ни одно правило,
+доказываются дважды: без области значений и с областью из domain.txt.
+Ответы дает оракул с полным состоянием дома. Считаются подцели, проверенные
+правила и вопросы. Объект с опечаткой не описан в области и не выводится правилами,
+поэтому цель с ним отклоняется сразу, без вопроса. Вторая часть - синтетическая база, где правила широкого ИЛИ
+ссылаются на значения с опечатками: без области каждая ветвь заканчивается вопросом.
+
+    python benchmark_domain.py [--width 200] [--json отчет.json]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from answer_providers import CallbackAnswerProvider
+from domain import DomainRegistry
+from expert_system_backward import BackwardExpertSystem
+from tracing import ListTraceSink
+
+HOME = {
+    "время_суток": "вечер",
+    "день_недели": "выходной",
+    "присутствие_людей": "да",
+    "температура_внешняя": "холодно",
+    "температура_внутренняя": "нормально",
+    "освещенность": "темно",
+    "движение_в_коридоре": "нет",
+    "движение_на_входе": "нет",
+    "дым": "нет",
+    "утечка_газа": "нет",
+}
+
+# (описание, цель)
+GOALS = [
+    ("значение с опечаткой", ("сигнал_тревоги", "включено")),
+    ("объект с опечаткой", ("включить_освещение", "да")),
+    ("значение вне области датчика", ("дым", "возможно")),
+    ("не выводится правилами", ("выключить_все_освещение", "нет")),
+    ("не выводится правилами", ("включить_охрану", "нет")),
+    ("достижимая цель", ("приглушить_освещение", "да")),
+    ("достижимая цель", ("пожарная_тревога", "да")),
+]
+
+
+def run_goal(system, goal):
+    """Одно доказательство: результат, подцели, проверенные правила, вопросы, время (мс)"""
+    sink = ListTraceSink()
+    system.trace_sink = sink
+    system.facts = {}
+    system.asked_facts = set()
+
+    started = time.perf_counter()
+    result = system.prove(goal, trace=False)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    counts = {"goal_enter": 0, "rule_try": 0, "ask": 0}
+    for event in sink.events:
+        if event["event"] in counts:
+            counts[event["event"]] += 1
+    return {
+        "result": result,
+        "subgoals": counts["goal_enter"],
+        "rules": counts["rule_try"],
+        "questions": counts["ask"],
+        "ms": elapsed,
+    }
+
+
+def make_system(rules_file, domain, truth):
+    provider = CallbackAnswerProvider(truth.get)
+    system = BackwardExpertSystem(rules_file, answer_provider=provider, interactive=False)
+    system.domain = domain
+    return system
+
+
+def compare(rules_file, goals, truth):
+    """Пары прогонов без области и с областью значений для каждой цели"""
+    domain = DomainRegistry.for_rules_file(rules_file)
+    plain = make_system(rules_file, DomainRegistry(), truth)
+    checked = make_system(rules_file, domain, truth)
+
+    rows = []
+    for description, goal in goals:
+        rows.append(
+            {
+                "case": description,
+                "goal": f"{goal[0]} = {goal[1]}",
+                "without_domain": run_goal(plain, goal),
+                "with_domain": run_goal(checked, goal),
+            }
+        )
+    return rows
+
+
+def write_wide_or(directory, width):
+    """
+    Синтетическая база: цель с width правилами, каждое через промежуточный объект
+    ссылается на значение с опечаткой. Без области все ветви проверяются до вопроса
+    """
+    rules_path = os.path.join(directory, "rules.txt")
+    with open(rules_path, "w", encoding="utf-8") as f:
+        for i in range(width):
+            f.write(f"ЕСЛИ датчик_{i}=вкл ТО узел_{i}=да\n")
+            f.write(f"ЕСЛИ узел_{i}=да И режим=авто ТО цель=да\n")
+
+    with open(os.path.join(directory, "domain.txt"), "w", encoding="utf-8") as f:
+        f.write("ВОПРОС режим = авто/ручной\n")
+        for i in range(width):
+            f.write(f"ВОПРОС датчик_{i} = да/нет\n")
+            f.write(f"ВЫВОД узел_{i} = да/нет\n")
+        f.write("ВЫВОД цель = да/нет\n")
+    return rules_path
+
+
+def run_benchmark(width):
+    rows = compare("rules.txt", GOALS, HOME)
+    with tempfile.TemporaryDirectory() as directory:
+        rules_path = write_wide_or(directory, width)
+        truth = {"режим": "авто", **{f"датчик_{i}": "да" for i in range(width)}}
+        rows += compare(rules_path, [(f"широкое ИЛИ ({width} правил)", ("цель", "да"))], truth)
+    return rows
+
+
+def print_report(rows):
+    header = (
+        f"{'Цель':<44}{'результат':>10}{'подцели: без':>14}{'с обл.':>8}"
+        f"{'правила: без':>14}{'с обл.':>8}{'вопросы: без':>14}{'с обл.':>8}"
+    )
+    print(header)
+    print("─" * len(header))
+
+    totals = {"without_domain": [0, 0, 0], "with_domain": [0, 0, 0]}
+    mismatches = 0
+    for row in rows:
+        plain, checked = row["without_domain"], row["with_domain"]
+        if plain["result"] != checked["result"]:
+            mismatches += 1
+        for key in totals:
+            for i, metric in enumerate(("subgoals", "rules", "questions")):
+                totals[key][i] += row[key][metric]
+        print(
+            f"{row['goal'][:43]:<44}{'да' if checked['result'] else 'нет':>10}"
+            f"{plain['subgoals']:>14}{checked['subgoals']:>8}"
+            f"{plain['rules']:>14}{checked['rules']:>8}"
+            f"{plain['questions']:>14}{checked['questions']:>8}"
+        )
+
+    print("─" * len(header))
+    plain, checked = totals["without_domain"], totals["with_domain"]
+    print(f"Подцелей: {plain[0]} → {checked[0]}, правил: {plain[1]} → {checked[1]}, вопросов: {plain[2]} → {checked[2]}")
+    print(f"Расхождений в результатах: {mismatches}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк отсечения целей по области значений фактов")
+    parser.add_argument("--width", type=int, default=200, help="число ветвей в синтетической базе")
+    parser.add_argument("--json", metavar="ФАЙЛ", help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.width)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
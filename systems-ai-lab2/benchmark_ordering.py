@@ -0,0 +1,174 @@
+"""
+Сравнение порядка проверки правил: порядок файла против модели стоимости вопросов.
+
+Каждый сценарий из documentation/test_scenarios.md проверяется во всех вариантах,
+где часть начальных фактов неизвестна системе и должна быть спрошена: ответы
+дает оракул, знающий полное состояние дома. Считаются вопросы и подцели.
+
+    python benchmark_ordering.py [--json отчет.json]
+"""
+
+import argparse
+import itertools
+import json
+
+from answer_providers import CallbackAnswerProvider
+from cost_model import QuestionCostModel
+from expert_system_backward import BackwardExpertSystem
+
+# (название, начальные факты, цель, ответы пользователя из описания сценария)
+SCENARIOS = [
+    (
+        "1. Простое доказательство",
+        {
+            "время_суток": "вечер",
+            "день_недели": "рабочий",
+            "присутствие_людей": "да",
+            "температура_внешняя": "холодно",
+            "освещенность": "темно",
+        },
+        ("включить_основное_освещение", "да"),
+        {},
+    ),
+    (
+        "2. Многоуровневое доказательство",
+        {
+            "время_суток": "день",
+            "день_недели": "рабочий",
+            "присутствие_людей": "нет",
+            "температура_внешняя": "холодно",
+            "освещенность": "светло",
+        },
+        ("сигнал_тревоги", "да"),
+        {"движение_на_входе": "да"},
+    ),
+    (
+        "3. Глубокая цепочка",
+        {"время_суток": "вечер", "день_недели": "выходной", "присутствие_людей": "да"},
+        ("приглушить_освещение", "да"),
+        {},
+    ),
+    (
+        "4. Цель опровергнута",
+        {
+            "время_суток": "вечер",
+            "день_недели": "рабочий",
+            "присутствие_людей": "да",
+            "температура_внешняя": "холодно",
+            "освещенность": "темно",
+        },
+        ("выключить_все_освещение", "да"),
+        {},
+    ),
+    ("5. Недостаточно данных", {"время_суток": "ночь"}, ("включить_ночник", "да"), {"движение_в_коридоре": "да"}),
+    (
+        "6. Аварийная ситуация",
+        {"время_суток": "вечер", "присутствие_людей": "да"},
+        ("пожарная_тревога", "да"),
+        {"дым": "да"},
+    ),
+    (
+        "7. Альтернативные пути",
+        {"время_суток": "вечер", "присутствие_людей": "да", "освещенность": "темно"},
+        ("включить_основное_освещение", "да"),
+        {},
+    ),
+    (
+        "8. Комплексная энергосистема",
+        {"время_суток": "день", "день_недели": "рабочий", "присутствие_людей": "нет"},
+        ("отключить_неприоритетные_устройства", "да"),
+        {},
+    ),
+]
+
+
+def run_variant(known, truth, goal, cost_model=None):
+    """Одно доказательство: возвращает (результат, вопросов, подцелей)"""
+    counters = {"questions": 0, "subgoals": 0}
+
+    def oracle(obj):
+        counters["questions"] += 1
+        return truth.get(obj)
+
+    system = BackwardExpertSystem(
+        interactive=False, answer_provider=CallbackAnswerProvider(oracle), cost_model=cost_model
+    )
+    system.facts = dict(known)
+
+    enter_goal = system._enter_goal
+
+    def counting_enter_goal(*args):
+        counters["subgoals"] += 1
+        return enter_goal(*args)
+
+    system._enter_goal = counting_enter_goal
+    result = system.prove(goal, trace=False)
+    return result, counters["questions"], counters["subgoals"]
+
+
+def run_benchmark():
+    shared_model = QuestionCostModel()
+    rows = []
+    for name, facts, goal, answers in SCENARIOS:
+        truth = {**facts, **answers}
+        totals = {"variants": 0, "mismatches": 0}
+        for key in ("file", "cold", "learned"):
+            totals[f"{key}_questions"] = 0
+            totals[f"{key}_subgoals"] = 0
+
+        for size in range(len(facts) + 1):
+            for hidden in itertools.combinations(facts, size):
+                known = {obj: value for obj, value in facts.items() if obj not in hidden}
+                results = {
+                    "file": run_variant(known, truth, goal),
+                    "cold": run_variant(known, truth, goal, QuestionCostModel()),
+                    "learned": run_variant(known, truth, goal, shared_model),
+                }
+                totals["variants"] += 1
+                if len({result for result, _, _ in results.values()}) != 1:
+                    totals["mismatches"] += 1
+                for key, (_, questions, subgoals) in results.items():
+                    totals[f"{key}_questions"] += questions
+                    totals[f"{key}_subgoals"] += subgoals
+
+        rows.append({"scenario": name, **totals})
+    return rows
+
+
+def print_report(rows):
+    header = (
+        f"{'Сценарий':<36}{'вариантов':>10}{'вопросы: файл':>15}{'модель':>9}{'обуч.':>8}"
+        f"{'подцели: файл':>15}{'модель':>9}"
+    )
+    print(header)
+    print("─" * len(header))
+    for row in rows:
+        print(
+            f"{row['scenario']:<36}{row['variants']:>10}{row['file_questions']:>15}{row['cold_questions']:>9}"
+            f"{row['learned_questions']:>8}{row['file_subgoals']:>15}{row['cold_subgoals']:>9}"
+        )
+
+    file_questions = sum(row["file_questions"] for row in rows)
+    learned_questions = sum(row["learned_questions"] for row in rows)
+    cold_questions = sum(row["cold_questions"] for row in rows)
+    print("─" * len(header))
+    print(
+        f"Вопросов всего: порядок файла {file_questions}, модель {cold_questions}, "
+        f"обученная модель {learned_questions}"
+    )
+    if file_questions:
+        print(f"Сокращение вопросов: {100 * (1 - learned_questions / file_questions):.1f}%")
+    mismatches = sum(row["mismatches"] for row in rows)
+    print(f"Расхождений в результатах: {mismatches}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк порядка проверки условий обратной цепочки")
+    parser.add_argument("--json", metavar="ФАЙЛ", help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    report = run_benchmark()
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
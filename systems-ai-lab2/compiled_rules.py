@@ -0,0 +1,297 @@
+import mmap
+import struct
+import sys
+from array import array
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, List, Optional, Tuple
+
+MAGIC = b"RBC1"
+HEADER_FORMAT = "=4s11i"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+INT_SIZE = array("i").itemsize
+
+
+class CompiledRuleBase:
+    """
+    Скомпилированная база правил в одном непрерывном буфере:
+    интернированные символы (объекты и значения), массивы заключений и условий,
+    индекс правил по заключению и тексты правил.
+
+    Буфер можно разместить в multiprocessing.shared_memory или в файле,
+    отображенном через mmap. Процессы-обработчики подключаются к нему без
+    копирования: правила декодируются из буфера по запросу и не хранятся
+    в памяти процесса, поэтому собственная память обработчика не зависит
+    от размера базы. Объект реализует интерфейс базы знаний (rules_for, concludes)
+    и ведет себя как последовательность правил, поэтому его можно присвоить
+    BackwardExpertSystem.rules.
+
+    Раскладка буфера (все целые - int32):
+      заголовок
+      sym_offsets[n_symbols + 1]  - смещения символов в блоке строк (символы отсортированы)
+      rules[n_rules * 4]          - объект и значение заключения, начало и число условий
+      conds[n_conditions * 2]     - объект и значение условия
+      by_conclusion[n_rules]      - номера правил, упорядоченные по заключению
+      text_offsets[n_rules + 1]   - смещения текстов правил
+      блок строк символов (UTF-8)
+      блок текстов правил (UTF-8)
+    """
+
+    def __init__(self, buffer, owner=None):
+        self._owner = owner
+        self._buffer = memoryview(buffer)
+
+        header = struct.unpack_from(HEADER_FORMAT, self._buffer, 0)
+        if header[0] != MAGIC:
+            raise ValueError("Буфер не содержит скомпилированную базу правил")
+        (
+            _,
+            self.n_symbols,
+            self.n_rules,
+            self.n_conditions,
+            sym_offsets_pos,
+            rules_pos,
+            conds_pos,
+            index_pos,
+            text_offsets_pos,
+            ints_len,
+            sym_data_len,
+            text_data_len,
+        ) = header
+
+        ints = self._buffer[HEADER_SIZE : HEADER_SIZE + ints_len * INT_SIZE].cast("i")
+        self._ints = ints
+        self._sym_offsets = ints[sym_offsets_pos:rules_pos]
+        self._rules = ints[rules_pos:conds_pos]
+        self._conds = ints[conds_pos:index_pos]
+        self._by_conclusion = ints[index_pos:text_offsets_pos]
+        self._text_offsets = ints[text_offsets_pos:ints_len]
+
+        data_pos = HEADER_SIZE + ints_len * INT_SIZE
+        self._sym_data = self._buffer[data_pos : data_pos + sym_data_len]
+        self._text_data = self._buffer[data_pos + sym_data_len : data_pos + sym_data_len + text_data_len]
+
+    @staticmethod
+    def compile(rules: List[Dict]) -> bytes:
+        """Компиляция разобранных правил (формат parse_rule) в буфер"""
+        symbols = set()
+        for rule in rules:
+            symbols.update(rule["conclusion"])
+            for obj, value in rule["conditions"]:
+                symbols.add(obj)
+                symbols.add(value)
+
+        encoded_symbols = sorted(symbol.encode("utf-8") for symbol in symbols)
+        symbol_ids = {symbol.decode("utf-8"): i for i, symbol in enumerate(encoded_symbols)}
+
+        sym_offsets = array("i", [0])
+        for symbol in encoded_symbols:
+            sym_offsets.append(sym_offsets[-1] + len(symbol))
+
+        rule_table = array("i")
+        conds = array("i")
+        text_offsets = array("i", [0])
+        texts = []
+        for rule in rules:
+            concl_obj, concl_value = rule["conclusion"]
+            rule_table.extend(
+                (symbol_ids[concl_obj], symbol_ids[concl_value], len(conds) // 2, len(rule["conditions"]))
+            )
+            for obj, value in rule["conditions"]:
+                conds.extend((symbol_ids[obj], symbol_ids[value]))
+            text = rule["text"].encode("utf-8")
+            texts.append(text)
+            text_offsets.append(text_offsets[-1] + len(text))
+
+        by_conclusion = array(
+            "i", sorted(range(len(rules)), key=lambda i: (rule_table[i * 4], rule_table[i * 4 + 1], i))
+        )
+
+        ints = array("i")
+        sym_offsets_pos = len(ints)
+        ints.extend(sym_offsets)
+        rules_pos = len(ints)
+        ints.extend(rule_table)
+        conds_pos = len(ints)
+        ints.extend(conds)
+        index_pos = len(ints)
+        ints.extend(by_conclusion)
+        text_offsets_pos = len(ints)
+        ints.extend(text_offsets)
+
+        sym_data = b"".join(encoded_symbols)
+        text_data = b"".join(texts)
+        header = struct.pack(
+            HEADER_FORMAT,
+            MAGIC,
+            len(encoded_symbols),
+            len(rules),
+            len(conds) // 2,
+            sym_offsets_pos,
+            rules_pos,
+            conds_pos,
+            index_pos,
+            text_offsets_pos,
+            len(ints),
+            len(sym_data),
+            len(text_data),
+        )
+        return header + ints.tobytes() + sym_data + text_data
+
+    @classmethod
+    def from_rules(cls, rules: List[Dict]) -> "CompiledRuleBase":
+        """База в собственном (не разделяемом) буфере"""
+        return cls(cls.compile(rules))
+
+    def to_shared_memory(self, name: Optional[str] = None) -> shared_memory.SharedMemory:
+        """
+        Копирование буфера в разделяемую память. Возвращенный блок должен
+        оставаться открытым, пока к нему подключены обработчики; по завершении
+        владелец вызывает close() и unlink()
+        """
+        shm = shared_memory.SharedMemory(name=name, create=True, size=len(self._buffer))
+        shm.buf[: len(self._buffer)] = self._buffer
+        return shm
+
+    @classmethod
+    def attach(cls, name: str) -> "CompiledRuleBase":
+        """Подключение к базе в разделяемой памяти по имени блока (без копирования)"""
+        shm = shared_memory.SharedMemory(name=name)
+        return cls(shm.buf, owner=shm)
+
+    def save(self, path: str):
+        """Сохранение буфера в файл для последующего отображения через mmap"""
+        with open(path, "wb") as f:
+            f.write(self._buffer)
+
+    @classmethod
+    def open(cls, path: str) -> "CompiledRuleBase":
+        """Отображение скомпилированного файла в память только для чтения"""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, owner=mapped)
+
+    def close(self):
+        """Освобождение представлений буфера (перед закрытием shared memory/mmap)"""
+        for view in (
+            self._sym_offsets,
+            self._rules,
+            self._conds,
+            self._by_conclusion,
+            self._text_offsets,
+            self._ints,
+            self._sym_data,
+            self._text_data,
+            self._buffer,
+        ):
+            view.release()
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+
+    def symbol(self, symbol_id: int) -> str:
+        """Текст символа по номеру"""
+        return str(self._sym_data[self._sym_offsets[symbol_id] : self._sym_offsets[symbol_id + 1]], "utf-8")
+
+    def symbol_id(self, text: str) -> Optional[int]:
+        """Номер символа (двоичный поиск по отсортированной таблице) или None"""
+        key = text.encode("utf-8")
+        lo, hi = 0, self.n_symbols
+        while lo < hi:
+            mid = (lo + hi) // 2
+            candidate = bytes(self._sym_data[self._sym_offsets[mid] : self._sym_offsets[mid + 1]])
+            if candidate < key:
+                lo = mid + 1
+            elif candidate > key:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def rule(self, rule_id: int) -> Dict:
+        """Правило в формате parse_rule, декодированное из буфера"""
+        base = rule_id * 4
+        concl_obj, concl_value, cond_start, cond_count = self._rules[base : base + 4]
+        conditions = [
+            (self.symbol(self._conds[i * 2]), self.symbol(self._conds[i * 2 + 1]))
+            for i in range(cond_start, cond_start + cond_count)
+        ]
+        text = str(self._text_data[self._text_offsets[rule_id] : self._text_offsets[rule_id + 1]], "utf-8")
+        return {
+            "conditions": conditions,
+            "conclusion": (self.symbol(concl_obj), self.symbol(concl_value)),
+            "text": text,
+        }
+
+    def __len__(self) -> int:
+        return self.n_rules
+
+    def __getitem__(self, rule_id: int) -> Dict:
+        if not 0 <= rule_id < self.n_rules:
+            raise IndexError(rule_id)
+        return self.rule(rule_id)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for rule_id in range(self.n_rules):
+            yield self.rule(rule_id)
+
+    def _conclusion_key(self, position: int) -> Tuple[int, int]:
+        rule_id = self._by_conclusion[position]
+        return self._rules[rule_id * 4], self._rules[rule_id * 4 + 1]
+
+    def concludes(self, obj: str) -> bool:
+        """Выводится ли объект хотя бы одним правилом"""
+        obj_id = self.symbol_id(obj)
+        if obj_id is None:
+            return False
+
+        lo, hi = 0, self.n_rules
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._conclusion_key(mid)[0] < obj_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo < self.n_rules and self._conclusion_key(lo)[0] == obj_id
+
+    def rules_for(self, goal: Tuple[str, str]) -> List[Dict]:
+        """Правила с заключением goal = (объект, значение) в порядке файла"""
+        obj_id = self.symbol_id(goal[0])
+        value_id = self.symbol_id(goal[1])
+        if obj_id is None or value_id is None:
+            return []
+
+        key = (obj_id, value_id)
+        lo, hi = 0, self.n_rules
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._conclusion_key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        result = []
+        while lo < self.n_rules and self._conclusion_key(lo) == key:
+            result.append(self.rule(self._by_conclusion[lo]))
+            lo += 1
+        return result
+
+
+if __name__ == "__main__":
+    from expert_system_backward import BackwardExpertSystem
+
+    if len(sys.argv) != 3:
+        print("Использование: python compiled_rules.py rules.txt rules.rbc")
+        sys.exit(1)
+
+    rules = []
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                rule = BackwardExpertSystem.parse_rule(line)
+                if rule:
+                    rules.append(rule)
+
+    compiled = CompiledRuleBase.from_rules(rules)
+    compiled.save(sys.argv[2])
+    print(f"Скомпилировано правил: {len(compiled)}, символов: {compiled.n_symbols}")
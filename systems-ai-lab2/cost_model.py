@@ -0,0 +1,167 @@
+import json
+from typing import Dict, List, Optional, Tuple
+
+# Стоимость проверки условия без вопроса (чтение факта, попытка правила)
+WORK_COST = 0.01
+# Глубина, до которой оценивается стоимость выводимых подцелей
+DEFAULT_HORIZON = 4
+
+
+class QuestionCostModel:
+    """
+    Модель стоимости вопросов для упорядочивания обратной цепочки.
+
+    Для каждого спрашиваемого объекта хранится стоимость вопроса (costs, по умолчанию
+    default_cost) и наблюдаемая доля ответов, не подтвердивших нужное значение.
+    Условие оценивается парой (ожидаемая стоимость, вероятность неуспеха):
+    известный факт - бесплатно и с известным исходом, листовой объект - цена вопроса,
+    выводимый - ожидаемая стоимость его правил (до глубины horizon).
+
+    Условия правила упорядочиваются по возрастанию стоимость / вероятность неуспеха
+    (сначала дешевые и часто опровергающие проверки), правила цели - по возрастанию
+    стоимость / вероятность успеха. Для независимых проверок такой порядок минимизирует
+    ожидаемое число вопросов.
+
+    Оценки подцелей запоминаются по (цель, глубина), пока не изменится состояние
+    доказательства (факты, таблица подцелей, заданные вопросы, статистика ответов).
+    Поэтому на широких базах каждая подцель оценивается один раз на глубину,
+    а не по разу на каждый путь к ней
+    """
+
+    def __init__(
+        self,
+        costs: Optional[Dict[str, float]] = None,
+        default_cost: float = 1.0,
+        horizon: int = DEFAULT_HORIZON,
+    ):
+        self.costs = dict(costs or {})
+        self.default_cost = default_cost
+        self.horizon = horizon
+        # (объект, значение) -> [число вопросов, число неподтверждений]
+        self.stats: Dict[Tuple[str, str], List[int]] = {}
+        self._memo: Dict[Tuple[Tuple[str, str], int], Tuple[float, float]] = {}
+        self._memo_state = None
+        self._stats_version = 0
+
+    def question_cost(self, obj: str) -> float:
+        return self.costs.get(obj, self.default_cost)
+
+    def failure_rate(self, obj: str, value: str) -> float:
+        """Оценка вероятности, что ответ не подтвердит obj = value (со сглаживанием Лапласа)"""
+        asked, failed = self.stats.get((obj, value), (0, 0))
+        return (failed + 1) / (asked + 2)
+
+    def record(self, obj: str, expected_value: str, answer: Optional[str]):
+        """Учет ответа на вопрос, заданный ради подцели obj = expected_value"""
+        entry = self.stats.setdefault((obj, expected_value), [0, 0])
+        self._stats_version += 1
+        entry[0] += 1
+        if answer != expected_value:
+            entry[1] += 1
+
+    def estimate(self, system, goal: Tuple[str, str], depth: int = 0, visiting=None) -> Tuple[float, float]:
+        """(ожидаемая стоимость, вероятность неуспеха) доказательства цели в текущем состоянии системы"""
+        self._check_memo(system)
+        key = (goal, depth)
+        estimate = self._memo.get(key)
+        if estimate is None:
+            estimate = self._memo[key] = self._estimate(system, goal, depth, visiting)
+        return estimate
+
+    def _estimate(self, system, goal: Tuple[str, str], depth: int, visiting) -> Tuple[float, float]:
+        obj, value = goal
+        if obj in system.facts:
+            return WORK_COST, 0.0 if system.facts[obj] == value else 1.0
+        if goal in system.proof_table:
+            return WORK_COST, 0.0 if system.proof_table[goal] else 1.0
+
+        # Вопрос задается, если правила не доказали цель; повторно об объекте не спрашивают
+        if obj in system.asked_facts:
+            answer = system.known_answer(obj)
+            ask_cost, ask_failure = WORK_COST, 0.0 if answer == value else 1.0
+        else:
+            ask_cost, ask_failure = self.question_cost(obj), self.failure_rate(obj, value)
+
+        if not system.kb.concludes(obj):
+            return ask_cost, ask_failure
+
+        visiting = visiting or frozenset()
+        if depth >= self.horizon or goal in visiting:
+            # За горизонтом оценки - нейтральная оценка вместо полного обхода конуса
+            return ask_cost, 0.5
+
+        visiting = visiting | {goal}
+        cost, failure = 0.0, 1.0
+        for rule_cost, rule_failure, _ in self._rank_rules(system, system.kb.rules_for(goal), depth, visiting):
+            cost += failure * rule_cost
+            failure *= rule_failure
+        return cost + failure * ask_cost, failure * ask_failure
+
+    def _check_memo(self, system):
+        """
+        Сброс запомненных оценок при изменении состояния доказательства. Факты и таблица
+        подцелей в ходе доказательства только пополняются, поэтому достаточно сравнить
+        сами объекты (новое доказательство - новая таблица) и их размеры
+        """
+        facts, table = system.facts, system.proof_table
+        state = self._memo_state
+        if (
+            state is None
+            or state[0] is not facts
+            or state[1] is not table
+            or state[2:] != (len(facts), len(table), len(system.asked_facts), self._stats_version)
+        ):
+            self._memo.clear()
+            self._memo_state = (facts, table, len(facts), len(table), len(system.asked_facts), self._stats_version)
+
+    def order_conditions(self, system, conditions: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Условия правила в порядке минимальной ожидаемой стоимости"""
+        return [cond for _, _, cond in self._rank_conditions(system, conditions, 0, frozenset())]
+
+    def order_rules(self, system, rules: List[Dict]) -> List[Dict]:
+        """Правила-кандидаты в порядке минимальной ожидаемой стоимости доказательства"""
+        if len(rules) < 2:
+            return rules
+        return [rule for _, _, rule in self._rank_rules(system, rules, 0, frozenset())]
+
+    def _rank_conditions(self, system, conditions, depth: int, visiting) -> List[Tuple[float, float, Tuple]]:
+        ranked = [self.estimate(system, cond, depth + 1, visiting) + (cond,) for cond in conditions]
+        ranked.sort(key=lambda item: _ratio(item[0], item[1]))
+        return ranked
+
+    def _rank_rules(self, system, rules, depth: int, visiting) -> List[Tuple[float, float, Dict]]:
+        ranked = []
+        for rule in rules:
+            cost, success = WORK_COST, 1.0
+            for cond_cost, cond_failure, _ in self._rank_conditions(system, rule["conditions"], depth, visiting):
+                cost += success * cond_cost
+                success *= 1.0 - cond_failure
+            ranked.append((cost, 1.0 - success, rule))
+        ranked.sort(key=lambda item: _ratio(item[0], 1.0 - item[1]))
+        return ranked
+
+    def save(self, path: str):
+        """Сохранение стоимостей и накопленной статистики ответов в JSON"""
+        data = {
+            "costs": self.costs,
+            "default_cost": self.default_cost,
+            "stats": [[obj, value, asked, failed] for (obj, value), (asked, failed) in self.stats.items()],
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "QuestionCostModel":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        model = cls(data.get("costs"), data.get("default_cost", 1.0))
+        for obj, value, asked, failed in data.get("stats", []):
+            model.stats[(obj, value)] = [asked, failed]
+        return model
+
+
+def _ratio(cost: float, probability: float) -> float:
+    """Ключ сортировки стоимость / вероятность (нулевая вероятность - в конец)"""
+    if probability <= 0.0:
+        return float("inf")
+    return cost / probability
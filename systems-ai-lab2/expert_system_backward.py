@@ -1,10 +1,20 @@
 import re
 import time
 import os
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional, Set
+from typing import Dict, Iterable, List, Tuple, Optional, Set
 
+from and_or_graph import AndOrGraph
+from answer_providers import AnswerProvider, ConsoleAnswerProvider, StaticAnswerProvider
 from colors import Colors
+from cost_model import QuestionCostModel
+from domain import DomainRegistry
+from fact_overlay import FactOverlay
+from forward_closure import ForwardClosure
+from knowledge_base import KnowledgeBase
+from proof_cache import ProofCache
+from tracing import ConsoleTraceSink, TeeTraceSink, TraceSink
 
 
 class BackwardExpertSystem:
@@ -13,18 +23,103 @@ class BackwardExpertSystem:
     для предметной области "Умный дом"
     """
 
-    def __init__(self, rules_file: str = "rules.txt"):
+    def __init__(
+        self,
+        rules_file: str = "rules.txt",
+        answer_provider: Optional[AnswerProvider] = None,
+        interactive: bool = True,
+        cost_model: Optional[QuestionCostModel] = None,
+        short_circuit: bool = False,
+        hybrid: bool = False,
+        proof_cache: Optional[ProofCache] = None,
+        prefetch: bool = False,
+        rules=None,
+    ):
+        """
+        answer_provider - источник значений листовых фактов. Без него интерактивная
+        система спрашивает пользователя, а неинтерактивная считает факты неизвестными.
+        interactive=False отключает анимацию и сообщения при инициализации (пакетный режим).
+        cost_model - модель стоимости вопросов; с ней правила и условия проверяются
+        в порядке минимального ожидаемого числа вопросов, а не в порядке файла.
+        short_circuit=True - не проверять правила цели, если известные факты опровергают
+        все ее опорные наборы (см. and_or_graph).
+        hybrid=True - гибридный режим: цели, которые следуют из известных фактов по прямой
+        цепочке, берутся из кэшированного замыкания, а поиск и вопросы нужны только для остальных.
+        proof_cache - кэш ответов и доказательств между сеансами (см. proof_cache).
+        prefetch=True - перед доказательством все листовые вопросы, которые могут понадобиться,
+        задаются одним пакетом (answer_provider.ask_batch), затем доказательство идет локально.
+        rules - готовая база правил (например, CompiledRuleBase из разделяемой памяти);
+        с ней файл правил не читается.
+        Область значений фактов читается из domain.txt рядом с файлом правил (см. domain)
+        """
         self.rules_file = rules_file
-        self.rules = []
+        self.interactive = interactive
+        self.domain = self.load_domain()
+        if answer_provider is None:
+            answer_provider = ConsoleAnswerProvider(self.domain) if interactive else StaticAnswerProvider()
+        self.answer_provider = answer_provider
+        self.cost_model = cost_model
+        self.short_circuit = short_circuit
+        self.hybrid = hybrid
+        self._and_or_graph: Optional[AndOrGraph] = None
+        self._forward_closure: Optional[ForwardClosure] = None
+        self._derived: Dict[Tuple[str, str], str] = {}
+        self.proof_cache = proof_cache
+        # Число вопросов без ответа: доказательства, зависящие от них, не кэшируются
+        self._unanswered = 0
+        self.prefetch = prefetch
+        # Ответы, полученные пакетом заранее: используются, когда доказательство дойдет до вопроса
+        self._prefetched: Dict[str, Optional[str]] = {}
+        self.kb = KnowledgeBase()
         self.facts = {}
         self.asked_facts = set()
+        # Полученные ответы: переживают отброшенные транзакции, поэтому вопрос не повторяется
+        self._answers: Dict[str, Optional[str]] = {}
         self.inference_log = []
         self.animation_speed = 0.05
         self.recursion_depth = 0
-        self.max_depth = 50
-        self.load_rules()
+        # Бюджет памяти доказательства: максимум одновременно открытых кадров стека целей
+        self.max_proof_frames = 100_000
+        self.proof_table: Dict[Tuple[str, str], bool] = {}
+        self._goals_in_progress: Set[Tuple[str, str]] = set()
+        self._cycle_hits: List[Tuple[str, str]] = []
+        self._share_proof_table = False
+        # Дополнительный приемник событий доказательства (например, ChromeTraceSink)
+        self.trace_sink: Optional[TraceSink] = None
+        self._console_sink: Optional[ConsoleTraceSink] = None
+        if rules is None:
+            self.load_rules()
+        else:
+            self.rules = rules
         self.initialize_facts()
 
+    @property
+    def rules(self):
+        """Правила базы знаний (только для просмотра; изменения - через self.kb)"""
+        return self.kb
+
+    @rules.setter
+    def rules(self, rules):
+        """
+        Замена базы правил. Объекты с интерфейсом базы знаний (rules_for, concludes),
+        например CompiledRuleBase, используются как есть, остальные индексируются
+        """
+        self.kb = rules if hasattr(rules, "rules_for") else KnowledgeBase(rules)
+
+    @property
+    def and_or_graph(self) -> AndOrGraph:
+        """AND-OR граф текущей базы правил с кэшем опорных наборов целей"""
+        if self._and_or_graph is None or self._and_or_graph.kb is not self.kb:
+            self._and_or_graph = AndOrGraph(self.kb)
+        return self._and_or_graph
+
+    @property
+    def forward_closure(self) -> ForwardClosure:
+        """Прямое замыкание известных фактов для гибридного режима"""
+        if self._forward_closure is None or self._forward_closure.kb is not self.kb:
+            self._forward_closure = ForwardClosure(self.kb)
+        return self._forward_closure
+
     def clear_screen(self):
         """Очистка экрана"""
         os.system("cls" if os.name == "nt" else "clear")
@@ -72,7 +167,7 @@ class BackwardExpertSystem:
         print()
 
     def print_depth_indent(self):
-        """Печать отступа в зависимости от глубины рекурсии"""
+        """Печать отступа в зависимости от глубины цели в стеке доказательства"""
         return "  " * self.recursion_depth
 
     def initialize_facts(self):
@@ -85,23 +180,26 @@ class BackwardExpertSystem:
             "освещенность": "темно",
         }
 
-        self.print_section("Инициализация системы", Colors.BRIGHT_MAGENTA)
-        self.animate_text("🏠 Загружаю параметры умного дома...")
-        time.sleep(0.5)
+        if self.interactive:
+            self.print_section("Инициализация системы", Colors.BRIGHT_MAGENTA)
+            self.animate_text("🏠 Загружаю параметры умного дома...")
+            time.sleep(0.5)
 
-        print(f"\n{Colors.BRIGHT_CYAN}📋 Известные факты:{Colors.RESET}")
-        for key, value in self.facts.items():
-            self.print_fact(key, value)
+            print(f"\n{Colors.BRIGHT_CYAN}📋 Известные факты:{Colors.RESET}")
+            for key, value in self.facts.items():
+                self.print_fact(key, value)
 
-        print(f"\n{Colors.DIM}{'─' * 50}{Colors.RESET}")
+            print(f"\n{Colors.DIM}{'─' * 50}{Colors.RESET}")
         self.asked_facts.clear()
+        self._answers.clear()
+        self._prefetched.clear()
         self.inference_log.clear()
 
     def load_rules(self):
         """Загрузка правил из файла"""
         try:
             with open(self.rules_file, "r", encoding="utf-8") as f:
-                self.rules = []
+                self.kb = KnowledgeBase()
                 rule_count = 0
                 for line_num, line in enumerate(f, 1):
                     line = line.strip()
@@ -109,21 +207,35 @@ class BackwardExpertSystem:
                         try:
                             rule = self.parse_rule(line)
                             if rule:
-                                self.rules.append(rule)
+                                self.kb.add_rule(rule)
                                 rule_count += 1
                         except Exception as e:
                             self.print_error(f"Ошибка в строке {line_num}: {e}")
 
                 if rule_count > 0:
-                    self.print_success(f"Загружено правил: {rule_count}")
+                    if self.interactive:
+                        self.print_success(f"Загружено правил: {rule_count}")
                 else:
                     self.print_warning("Правила не найдены")
 
+                if self.interactive:
+                    for problem in self.domain.check_rules(self.kb):
+                        self.print_warning(f"Область значений: {problem}")
+
         except FileNotFoundError:
             self.print_warning(f"Файл {self.rules_file} не найден")
-            self.animate_text("📝 Создаю новый файл с базовыми правилами...")
+            if self.interactive:
+                self.animate_text("📝 Создаю новый файл с базовыми правилами...")
             self.create_default_rules()
 
+    def load_domain(self) -> DomainRegistry:
+        """Загрузка области значений фактов (без файла области ограничений нет)"""
+        try:
+            return DomainRegistry.for_rules_file(self.rules_file)
+        except ValueError as e:
+            self.print_error(f"Ошибка в области значений: {e}")
+            return DomainRegistry()
+
     def create_default_rules(self):
         """Создание файла с базовыми правилами для умного дома"""
         default_rules = [
@@ -161,7 +273,8 @@ class BackwardExpertSystem:
             f.write("\n".join(default_rules))
         self.load_rules()
 
-    def parse_rule(self, rule_text: str) -> Optional[Dict]:
+    @staticmethod
+    def parse_rule(rule_text: str) -> Optional[Dict]:
         """Парсинг правила вида: ЕСЛИ условие ТО заключение"""
         rule_text = " ".join(rule_text.split())
 
@@ -198,165 +311,497 @@ class BackwardExpertSystem:
         }
 
     def ask_user(self, fact_name: str) -> Optional[str]:
-        """Запрос значения факта у пользователя"""
+        """Запрос значения факта у источника ответов (по умолчанию - у пользователя)"""
         if fact_name in self.asked_facts:
-            return None
+            value = self._answers.get(fact_name)
+            if value is None:
+                self._unanswered += 1
+            return value
 
         self.asked_facts.add(fact_name)
+        cached = self._cached_answer(fact_name)
+        if cached is not None:
+            self._answers[fact_name] = cached
+            return cached
 
-        print(f"\n{self.print_depth_indent()}{Colors.BRIGHT_YELLOW}❓ Требуется информация:{Colors.RESET}")
-        print(f"{self.print_depth_indent()}{Colors.CYAN}   {fact_name}{Colors.RESET}")
-
-        possible_values = {
-            "движение_в_коридоре": "да/нет",
-            "движение_на_входе": "да/нет",
-            "температура_внутренняя": "жарко/нормально/холодно",
-            "дым": "да/нет",
-            "утечка_газа": "да/нет",
-            "время_суток": "утро/день/вечер/ночь",
-            "день_недели": "рабочий/выходной",
-            "освещенность": "светло/темно",
-        }
-
-        if fact_name in possible_values:
-            print(
-                f"{self.print_depth_indent()}{Colors.DIM}   Возможные значения: {possible_values[fact_name]}{Colors.RESET}"
-            )
+        if fact_name in self._prefetched:
+            value = self._prefetched.pop(fact_name)
+        else:
+            value = self.answer_provider.answer(fact_name, self.print_depth_indent())
+        error = None if value is None else self.domain.validate(fact_name, value)
+        if error:
+            self.print_warning(f"Ответ отклонен: {error}")
+            value = None
+
+        self._answers[fact_name] = value
+        if value is None:
+            self._unanswered += 1
+        elif self.proof_cache is not None:
+            self.proof_cache.record_answer(fact_name, value)
+        return value
+
+    def known_answer(self, fact_name: str) -> Optional[str]:
+        """Полученный ответ на заданный вопрос или None (ответы переживают отброшенные транзакции)"""
+        if fact_name not in self.asked_facts:
+            return None
+        return self._answers.get(fact_name)
 
-        user_input = input(
-            f"{self.print_depth_indent()}{Colors.BRIGHT_WHITE}   ➤ Введите значение (или 'нет' для пропуска): {Colors.RESET}"
-        ).strip()
+    def unanswered_facts(self) -> Set[str]:
+        """
+        Объекты, о которых вопрос задан, но ответа нет. После отброшенной транзакции
+        ответ есть в памяти, но не в фактах - такой объект не считается опровергнутым
+        """
+        return {obj for obj in self.asked_facts if self._answers.get(obj) is None}
 
-        if user_input.lower() in ["нет", "no", "skip", ""]:
-            print(f"{self.print_depth_indent()}{Colors.DIM}   ⊗ Факт пропущен{Colors.RESET}")
+    def _cached_answer(self, fact_name: str) -> Optional[str]:
+        """Действующий ответ из кэша; ответ вне области значений удаляется из кэша"""
+        if self.proof_cache is None:
+            return None
+        value = self.proof_cache.answer(fact_name)
+        if value is not None and self.domain.validate(fact_name, value):
+            self.proof_cache.forget(fact_name)
             return None
+        return value
 
-        print(
-            f"{self.print_depth_indent()}{Colors.BRIGHT_GREEN}   ✓ Добавлено: {fact_name} = {user_input}{Colors.RESET}"
-        )
-        return user_input
+    def prove(self, goal: Tuple[str, str], trace: bool = True) -> bool:
+        """
+        Доказательство цели с новой таблицей подцелей.
+        В пределах одного доказательства каждая подцель (доказанная или
+        окончательно опровергнутая) исследуется один раз.
+        С кэшем доказательств результат для того же снимка фактов берется из кэша
+        """
+        self.recursion_depth = 0
+        if self.proof_cache is None:
+            if self.prefetch:
+                self.prefetch_answers([goal])
+            return self.backward_chaining(goal, trace)
 
-    def backward_chaining(self, goal: Tuple[str, str], trace: bool = True) -> bool:
+        try:
+            cached = self.proof_cache.lookup(self.kb, goal, self.facts)
+            if cached is not None:
+                return self._cached_proof(goal, cached, trace)
+
+            if self.prefetch:
+                self.prefetch_answers([goal])
+            start_facts = dict(self.facts)
+            unanswered = self._unanswered
+            result = self.backward_chaining(goal, trace)
+            if self._unanswered == unanswered:
+                self.proof_cache.store(self.kb, goal, start_facts, result)
+            return result
+        finally:
+            self.proof_cache.flush()
+
+    def _cached_proof(self, goal: Tuple[str, str], result: bool, trace: bool) -> bool:
+        """Результат из кэша доказательств: доказанная цель становится фактом, как после поиска"""
+        sink = self._active_sink(trace)
+        if sink is not None:
+            sink.emit({"event": "goal_enter", "goal": goal, "depth": 1})
+            sink.emit({"event": "cached", "goal": goal, "depth": 1, "result": result})
+        if result and goal[0] not in self.facts:
+            self._record_proof(goal, "(из кэша доказательств)")
+        if sink is not None:
+            sink.emit({"event": "goal_exit", "goal": goal, "depth": 1, "result": result})
+        return result
+
+    @contextmanager
+    def transaction(self, dry_run: bool = False):
         """
-        Обратная цепочка рассуждений
-        Пытается доказать цель goal = (объект, значение)
+        Транзакция над фактами: внутри блока self.facts - слой FactOverlay поверх прежних
+        фактов, а журнал вывода ведется отдельно. При выходе из блока изменения и журнал
+        фиксируются, а при исключении, dry_run или overlay.discard() отбрасываются за O(1).
+        Ответы на вопросы запоминаются и после отказа (повторно не спрашиваются)
+        """
+        facts, inference_log = self.facts, self.inference_log
+        overlay = FactOverlay(facts)
+        self.facts, self.inference_log = overlay, []
+        committed = False
+        try:
+            yield overlay
+            committed = not dry_run and not overlay.discarded
+        finally:
+            transaction_log = self.inference_log
+            self.facts, self.inference_log = facts, inference_log
+            if committed:
+                overlay.commit()
+                inference_log.extend(transaction_log)
+
+    def try_prove(self, goal: Tuple[str, str], trace: bool = False, dry_run: bool = False) -> bool:
         """
-        self.recursion_depth += 1
+        Доказательство в транзакции: выводы и ответы становятся фактами только при успехе.
+        dry_run=True - только узнать результат, не меняя факты
+        """
+        with self.transaction(dry_run) as overlay:
+            result = self.prove(goal, trace)
+            if not result:
+                overlay.discard()
+        return result
 
-        if self.recursion_depth > self.max_depth:
-            self.recursion_depth -= 1
-            self.print_warning("Достигнута максимальная глубина рекурсии")
-            return False
+    def can_prove(self, goal: Tuple[str, str]) -> bool:
+        """Можно ли доказать цель сейчас (пробное доказательство без изменения фактов)"""
+        return self.try_prove(goal, dry_run=True)
 
-        goal_obj, goal_value = goal
+    def prove_set(self, goals: Iterable[Tuple[str, str]], trace: bool = False) -> Dict[Tuple[str, str], bool]:
+        """
+        Доказательство набора целей с общей таблицей подцелей.
+        Общие подцели исследуются один раз для всех целей, каждый вопрос
+        задается не более одного раза. Возвращает результат для каждой цели
+        """
+        self.recursion_depth = 0
+        goals = list(goals)
+        if self.prefetch:
+            self.prefetch_answers(goals)
+        self.reset_proof_table()
+        self._share_proof_table = True
+        results = {}
+        try:
+            for goal in goals:
+                if goal not in results:
+                    results[goal] = self.backward_chaining(goal, trace)
+        finally:
+            self._share_proof_table = False
+            if self.proof_cache is not None:
+                self.proof_cache.flush()
+        return results
+
+    def prove_all(self, trace: bool = False) -> Dict[Tuple[str, str], bool]:
+        """Проверка всех заключений базы правил (всех управляющих действий) для текущего дома"""
+        return self.prove_set(dict.fromkeys(rule["conclusion"] for rule in self.kb), trace)
+
+    def prefetch_questions(self, goals: Iterable[Tuple[str, str]]) -> List[str]:
+        """
+        Листовые объекты, о которых доказательство целей может спросить, по убыванию важности.
+        Учитываются все правила конуса цели, не опровергнутые известными фактами.
+        Важность - по опорным наборам: объект из набора размера k добавляет 1/k
+        (малые наборы решают цель быстрее)
+        """
+        scores: Dict[str, float] = {}
+        for goal in goals:
+            for obj in self._cone_questions(goal):
+                scores.setdefault(obj, 0.0)
+            support = self.and_or_graph.remaining_support(goal, self.facts, self.unanswered_facts())
+            for literals in support or ():
+                for obj, _ in literals:
+                    if obj in scores:
+                        scores[obj] += 1.0 / len(literals)
+        return sorted(scores, key=lambda obj: (-scores[obj], obj))
+
+    def _cone_questions(self, goal: Tuple[str, str]) -> List[str]:
+        """Листовые объекты конуса цели, до вопроса о которых может дойти поиск"""
+        # В гибридном режиме цели из прямого замыкания доказываются без вопросов
+        derived = self.forward_closure.derived(self.facts) if self.hybrid else {}
+        questions = []
+        seen = {goal}
+        stack = [goal]
+        while stack:
+            literal = stack.pop()
+            obj = literal[0]
+            if obj in self.facts or literal in derived or self._impossible_goal(literal):
+                continue
+            if not self.kb.concludes(obj):
+                if obj not in self.asked_facts and obj not in self._prefetched and obj not in questions:
+                    if self._cached_answer(obj) is None:
+                        questions.append(obj)
+                continue
+            for rule in self.kb.rules_for(literal):
+                if self.domain and not self._rule_possible(rule):
+                    continue
+                if any(self.facts.get(cond_obj, value) != value for cond_obj, value in rule["conditions"]):
+                    continue
+                for condition in rule["conditions"]:
+                    if condition not in seen:
+                        seen.add(condition)
+                        stack.append(condition)
+        return questions
+
+    def prefetch_answers(self, goals: Iterable[Tuple[str, str]]) -> Dict[str, Optional[str]]:
+        """Один пакетный вопрос обо всех листовых фактах, которые могут понадобиться целям"""
+        questions = self.prefetch_questions(goals)
+        if not questions:
+            return {}
+        answers = self.answer_provider.ask_batch(questions, self.print_depth_indent())
+        for obj in questions:
+            self._prefetched[obj] = answers.get(obj)
+        return answers
+
+    def reset_proof_table(self):
+        """Очистка таблицы подцелей (перед новым доказательством)"""
+        self.proof_table = {}
+        self._goals_in_progress = set()
+        self._cycle_hits = []
 
-        if trace:
-            print(
-                f"\n{self.print_depth_indent()}{Colors.BRIGHT_MAGENTA}🎯 Цель: {Colors.CYAN}{goal_obj} = {goal_value}{Colors.RESET}"
-            )
+    def backward_chaining(self, goal: Tuple[str, str], trace: bool = True) -> bool:
+        """
+        Обратная цепочка рассуждений
+        Пытается доказать цель goal = (объект, значение)
 
-        if goal_obj in self.facts:
-            result = self.facts[goal_obj] == goal_value
-            if trace:
+        Доказательство выполняется без рекурсии: подцели хранятся в явном стеке
+        кадров, поэтому глубина цепочки ограничена не стеком Python, а бюджетом
+        max_proof_frames. Цели из стека образуют множество _goals_in_progress,
+        по которому обнаруживаются циклы.
+
+        Ход доказательства передается событиями в приемник трассировки:
+        trace=True - в консоль, self.trace_sink - в подключенный приемник.
+        Без приемника события не создаются
+        """
+        if self.recursion_depth == 0 and not self._share_proof_table:
+            self.reset_proof_table()
+        if self.hybrid:
+            self._derived = self.forward_closure.derived(self.facts)
+
+        sink = self._active_sink(trace)
+        base_depth = self.recursion_depth
+        stack: List[Dict] = []
+        result = self._enter_goal(goal, stack, base_depth + 1, sink)
+
+        while stack:
+            frame = stack[-1]
+            self.recursion_depth = base_depth + len(stack)
+
+            if result is not None:
+                # Возврат из подцели текущего условия
                 if result:
-                    print(
-                        f"{self.print_depth_indent()}{Colors.BRIGHT_GREEN}✓ Найдено в базе фактов: {goal_obj} = {self.facts[goal_obj]}{Colors.RESET}"
-                    )
+                    frame["cond_index"] += 1
                 else:
-                    print(
-                        f"{self.print_depth_indent()}{Colors.BRIGHT_RED}✗ Противоречие: {goal_obj} = {self.facts[goal_obj]} ≠ {goal_value}{Colors.RESET}"
+                    if sink is not None:
+                        sink.emit({"event": "rule_fail", "goal": frame["goal"], "depth": self.recursion_depth})
+                    frame["rule_index"] += 1
+                    frame["cond_index"] = 0
+                    frame["rule_started"] = False
+                result = None
+
+            rules = frame["rules"]
+            if frame["rule_index"] < len(rules):
+                rule = rules[frame["rule_index"]]
+
+                if not frame["rule_started"]:
+                    frame["rule_started"] = True
+                    frame["conditions"] = rule["conditions"]
+                    if self.cost_model is not None:
+                        frame["conditions"] = self.cost_model.order_conditions(self, rule["conditions"])
+                    if sink is not None:
+                        sink.emit(
+                            {
+                                "event": "rule_try",
+                                "goal": frame["goal"],
+                                "depth": self.recursion_depth,
+                                "rule": rule["text"],
+                                "index": frame["rule_index"] + 1,
+                            }
+                        )
+
+                conditions = frame["conditions"]
+                if frame["cond_index"] < len(conditions):
+                    condition = conditions[frame["cond_index"]]
+                    if sink is not None:
+                        sink.emit({"event": "subgoal", "goal": condition, "depth": self.recursion_depth})
+                    result = self._enter_goal(condition, stack, self.recursion_depth + 1, sink)
+                    continue
+
+                self._record_proof(frame["goal"], rule["text"])
+                if sink is not None:
+                    sink.emit(
+                        {
+                            "event": "goal_proved",
+                            "goal": frame["goal"],
+                            "depth": self.recursion_depth,
+                            "rule": rule["text"],
+                        }
                     )
-            self.recursion_depth -= 1
-            return result
 
-        applicable_rules = []
-        for rule in self.rules:
-            concl_obj, concl_value = rule["conclusion"]
-            if concl_obj == goal_obj and concl_value == goal_value:
-                applicable_rules.append(rule)
+                result = self._leave_goal(stack, True, sink)
+                continue
 
-        if trace and applicable_rules:
-            print(
-                f"{self.print_depth_indent()}{Colors.BRIGHT_BLUE}📚 Найдено правил для проверки: {len(applicable_rules)}{Colors.RESET}"
-            )
+            result = self._leave_goal(stack, self._ask_for_goal(frame["goal"], sink), sink)
 
-        for i, rule in enumerate(applicable_rules, 1):
-            if trace:
-                print(
-                    f"\n{self.print_depth_indent()}{Colors.BRIGHT_YELLOW}🔍 Проверяю правило #{i}:{Colors.RESET}"
-                )
-                print(f"{self.print_depth_indent()}{Colors.DIM}   {rule['text']}{Colors.RESET}")
+        self.recursion_depth = base_depth
+        return result
 
-            all_conditions_proved = True
+    def _active_sink(self, trace: bool) -> Optional[TraceSink]:
+        """Приемник событий для доказательства: консоль при trace=True и/или self.trace_sink"""
+        if not trace:
+            return self.trace_sink
+        if self._console_sink is None:
+            self._console_sink = ConsoleTraceSink()
+        if self.trace_sink is None:
+            return self._console_sink
+        return TeeTraceSink(self._console_sink, self.trace_sink)
 
-            for cond_obj, cond_value in rule["conditions"]:
-                subgoal = (cond_obj, cond_value)
+    def _enter_goal(
+        self, goal: Tuple[str, str], stack: List[Dict], depth: int, sink: Optional[TraceSink]
+    ) -> Optional[bool]:
+        """
+        Начало доказательства цели. Возвращает результат, если цель решается сразу
+        (известный факт, таблица, цикл, исчерпан бюджет), иначе кладет кадр в стек
+        и возвращает None
+        """
+        self.recursion_depth = depth
+        goal_obj = goal[0]
 
-                if trace:
-                    print(
-                        f"{self.print_depth_indent()}{Colors.DIM}├─ Подцель: {cond_obj} = {cond_value}{Colors.RESET}"
-                    )
+        if sink is not None:
+            sink.emit({"event": "goal_enter", "goal": goal, "depth": depth})
 
-                if not self.backward_chaining(subgoal, trace):
-                    all_conditions_proved = False
-                    if trace:
-                        print(
-                            f"{self.print_depth_indent()}{Colors.BRIGHT_RED}└─ ✗ Подцель не доказана{Colors.RESET}"
-                        )
-                    break
+        if goal_obj in self.facts:
+            return self._goal_resolved(goal, self._check_known_fact(goal, sink), sink)
+
+        if self.hybrid and goal in self._derived:
+            rule_text = self._derived[goal]
+            self._record_proof(goal, rule_text)
+            if sink is not None:
+                sink.emit({"event": "derived", "goal": goal, "depth": depth, "rule": rule_text})
+            return self._goal_resolved(goal, True, sink)
+
+        reason = self._impossible_goal(goal)
+        if reason:
+            if sink is not None:
+                sink.emit({"event": "impossible", "goal": goal, "depth": depth, "reason": reason})
+            return self._goal_resolved(goal, False, sink)
+
+        if goal in self.proof_table:
+            result = self.proof_table[goal]
+            if sink is not None:
+                sink.emit({"event": "table_hit", "goal": goal, "depth": depth, "result": result})
+            return self._goal_resolved(goal, result, sink)
+
+        if goal in self._goals_in_progress:
+            # Рекурсивная цель: на этом пути считается недоказанной,
+            # но такой неуспех не заносится в таблицу как окончательный
+            self._cycle_hits.append(goal)
+            if sink is not None:
+                sink.emit({"event": "cycle", "goal": goal, "depth": depth})
+            return self._goal_resolved(goal, False, sink)
+
+        if len(self._goals_in_progress) >= self.max_proof_frames:
+            self.print_warning("Исчерпан бюджет памяти доказательства")
+            self._cycle_hits.append(goal)
+            return self._goal_resolved(goal, False, sink)
+
+        applicable_rules = self.kb.rules_for(goal)
+        if self.domain:
+            # Правило с условием вне области значений не сработает ни при каких ответах
+            applicable_rules = [rule for rule in applicable_rules if self._rule_possible(rule)]
+        if (
+            applicable_rules
+            and self.short_circuit
+            and self.and_or_graph.is_ruled_out(goal, self.facts, self.unanswered_facts())
+        ):
+            if sink is not None:
+                sink.emit({"event": "pruned", "goal": goal, "depth": depth})
+            applicable_rules = []
+        if self.cost_model is not None:
+            applicable_rules = self.cost_model.order_rules(self, applicable_rules)
+
+        if sink is not None and applicable_rules:
+            sink.emit({"event": "rules_found", "goal": goal, "depth": depth, "count": len(applicable_rules)})
+
+        self._goals_in_progress.add(goal)
+        stack.append(
+            {
+                "goal": goal,
+                "rules": applicable_rules,
+                "rule_index": 0,
+                "cond_index": 0,
+                "rule_started": False,
+                "conditions": None,
+                "hits_before": len(self._cycle_hits),
+            }
+        )
+        return None
+
+    def _record_proof(self, goal: Tuple[str, str], rule_text: str):
+        """Доказанная цель становится фактом и попадает в журнал вывода"""
+        goal_obj, goal_value = goal
+        self.facts[goal_obj] = goal_value
+        log_entry = {
+            "rule": rule_text,
+            "goal": f"{goal_obj} = {goal_value}",
+            "timestamp": datetime.now().strftime("%H:%M:%S"),
+        }
+        self.inference_log.append(log_entry)
 
-            if all_conditions_proved:
-                self.facts[goal_obj] = goal_value
+    def _impossible_goal(self, goal: Tuple[str, str]) -> Optional[str]:
+        """
+        Причина, по которой цель недостижима при любых ответах, или None.
+        Проверяется только при загруженной области значений
+        """
+        if not self.domain:
+            return None
+        goal_obj, goal_value = goal
+        if not self.domain.allows(goal_obj, goal_value):
+            return f"значение вне области ({self.domain.hint(goal_obj)})"
+        askable = self.domain.is_askable(goal_obj)
+        if askable is None and not self.kb.concludes(goal_obj):
+            # Неописанный объект не спрашивается, а правил для него нет (например, опечатка в имени)
+            return "объект не описан в области и не выводится правилами"
+        if askable is False and not any(map(self._rule_possible, self.kb.rules_for(goal))):
+            return "ни одно правило не выводит это значение"
+        return None
+
+    def _rule_possible(self, rule: Dict) -> bool:
+        """Условия правила не выходят за область значений (иначе правило никогда не сработает)"""
+        return self.domain.rule_possible(rule)
+
+    def _goal_resolved(self, goal: Tuple[str, str], result: bool, sink: Optional[TraceSink]) -> bool:
+        if sink is not None:
+            sink.emit({"event": "goal_exit", "goal": goal, "depth": self.recursion_depth, "result": result})
+        return result
+
+    def _check_known_fact(self, goal: Tuple[str, str], sink: Optional[TraceSink]) -> bool:
+        """Сравнение цели с уже известным значением объекта"""
+        value = self.facts[goal[0]]
+        result = value == goal[1]
+        if sink is not None:
+            sink.emit({"event": "fact", "goal": goal, "depth": self.recursion_depth, "value": value, "result": result})
+        return result
+
+    def _leave_goal(self, stack: List[Dict], result: bool, sink: Optional[TraceSink]) -> bool:
+        """Снятие кадра со стека и запись результата в таблицу подцелей"""
+        frame = stack.pop()
+        goal = frame["goal"]
+        hits_before = frame["hits_before"]
+
+        self._goals_in_progress.discard(goal)
+        new_hits = self._cycle_hits[hits_before:]
+        if result:
+            self.proof_table[goal] = True
+        elif not any(hit in self._goals_in_progress for hit in new_hits):
+            # Неуспех не зависит от незавершенных целей - он окончательный
+            self.proof_table[goal] = False
+            del self._cycle_hits[hits_before:]
 
-                log_entry = {
-                    "rule": rule["text"],
-                    "goal": f"{goal_obj} = {goal_value}",
-                    "timestamp": datetime.now().strftime("%H:%M:%S"),
-                }
-                self.inference_log.append(log_entry)
+        return self._goal_resolved(goal, result, sink)
 
-                if trace:
-                    print(
-                        f"\n{self.print_depth_indent()}{Colors.BRIGHT_GREEN}✓✓✓ ЦЕЛЬ ДОКАЗАНА: {goal_obj} = {goal_value}{Colors.RESET}"
-                    )
-                    print(
-                        f"{self.print_depth_indent()}{Colors.BRIGHT_GREEN}    Использовано правило: {rule['text']}{Colors.RESET}"
-                    )
+    def _ask_for_goal(self, goal: Tuple[str, str], sink: Optional[TraceSink]) -> bool:
+        """Вопрос пользователю, когда правила не доказали цель"""
+        goal_obj, goal_value = goal
 
-                self.recursion_depth -= 1
-                return True
+        if goal_obj in self.facts:
+            # Значение стало известно, пока проверялись правила (например, ответом внутри цикла)
+            return self._check_known_fact(goal, sink)
 
-        if trace:
-            print(
-                f"\n{self.print_depth_indent()}{Colors.BRIGHT_YELLOW}💭 Не удалось доказать через правила{Colors.RESET}"
-            )
+        if self.domain.is_askable(goal_obj) is False:
+            # Выводимый объект не спрашивается: правила его не доказали
+            if sink is not None:
+                sink.emit({"event": "unproven", "goal": goal, "depth": self.recursion_depth})
+            return False
+
+        if sink is not None:
+            sink.emit({"event": "ask", "goal": goal, "depth": self.recursion_depth})
 
+        first_question = goal_obj not in self.asked_facts
         user_value = self.ask_user(goal_obj)
+        if first_question and self.cost_model is not None:
+            self.cost_model.record(goal_obj, goal_value, user_value)
 
+        result = user_value == goal_value
         if user_value is not None:
             self.facts[goal_obj] = user_value
-            result = user_value == goal_value
-
-            if trace:
-                if result:
-                    print(
-                        f"{self.print_depth_indent()}{Colors.BRIGHT_GREEN}✓ Цель подтверждена пользователем{Colors.RESET}"
-                    )
-                else:
-                    print(
-                        f"{self.print_depth_indent()}{Colors.BRIGHT_RED}✗ Цель опровергнута пользователем{Colors.RESET}"
-                    )
-
-            self.recursion_depth -= 1
-            return result
 
-        if trace:
-            print(
-                f"{self.print_depth_indent()}{Colors.BRIGHT_RED}✗✗✗ ЦЕЛЬ НЕ ДОКАЗАНА: {goal_obj} = {goal_value}{Colors.RESET}"
+        if sink is not None:
+            sink.emit(
+                {"event": "answer", "goal": goal, "depth": self.recursion_depth, "value": user_value, "result": result}
             )
-
-        self.recursion_depth -= 1
-        return False
+        return result
 
     def show_inference_log(self):
         """Показать лог вывода"""
@@ -418,8 +863,7 @@ class BackwardExpertSystem:
         self.animate_text("🧠 Запускаю обратную цепочку рассуждений...")
         time.sleep(0.5)
 
-        self.recursion_depth = 0
-        result = self.backward_chaining(goal, trace=True)
+        result = self.prove(goal, trace=True)
 
         self.print_section("Результат", Colors.BRIGHT_GREEN if result else Colors.BRIGHT_RED)
 
@@ -438,3 +882,25 @@ class BackwardExpertSystem:
             self.show_inference_log()
 
         input(f"\n{Colors.DIM}Нажмите Enter для продолжения...{Colors.RESET}")
+
+    def run_all(self):
+        """Проверка всех целей базы правил для текущего состояния дома"""
+        self.clear_screen()
+        self.print_header("ПРОВЕРКА ВСЕХ ЦЕЛЕЙ")
+
+        self.print_section("Процесс доказательства", Colors.BRIGHT_BLUE)
+        self.animate_text("🧠 Проверяю все заключения базы правил...")
+
+        asked_before = len(self.asked_facts)
+        results = self.prove_all(trace=False)
+
+        self.print_section("Результаты", Colors.BRIGHT_GREEN)
+        for (goal_obj, goal_value), result in results.items():
+            mark = f"{Colors.BRIGHT_GREEN}✓" if result else f"{Colors.BRIGHT_RED}✗"
+            print(f"  {mark} {Colors.CYAN}{goal_obj}{Colors.RESET} = {goal_value}")
+
+        proven = sum(results.values())
+        print(f"\n{Colors.BRIGHT_BLUE}📊 Доказано целей: {proven} из {len(results)}{Colors.RESET}")
+        print(f"{Colors.BRIGHT_BLUE}💬 Задано вопросов: {len(self.asked_facts) - asked_before}{Colors.RESET}")
+
+        input(f"\n{Colors.DIM}Нажмите Enter для продолжения...{Colors.RESET}")
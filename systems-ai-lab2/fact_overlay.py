@@ -0,0 +1,77 @@
+from collections.abc import MutableMapping
+from typing import Dict, Iterator
+
+# Отметка удаленного в слое объекта (в базе он остается до фиксации)
+_DELETED = object()
+
+
+class FactOverlay(MutableMapping):
+    """
+    Слой изменений поверх хранилища фактов (транзакция доказательства).
+
+    Чтение идет сначала из слоя, затем из базы; запись и удаление затрагивают
+    только слой, база не меняется. commit() переносит изменения в базу,
+    discard() отбрасывает слой за O(1) - копировать базу не нужно.
+    Базой может быть другой FactOverlay (вложенная транзакция)
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.changes: Dict[str, object] = {}
+        self.discarded = False
+
+    def __getitem__(self, obj: str) -> str:
+        if obj in self.changes:
+            value = self.changes[obj]
+            if value is _DELETED:
+                raise KeyError(obj)
+            return value
+        return self.base[obj]
+
+    def __contains__(self, obj) -> bool:
+        if obj in self.changes:
+            return self.changes[obj] is not _DELETED
+        return obj in self.base
+
+    def get(self, obj, default=None):
+        if obj in self.changes:
+            value = self.changes[obj]
+            return default if value is _DELETED else value
+        return self.base.get(obj, default)
+
+    def __setitem__(self, obj: str, value: str):
+        self.changes[obj] = value
+
+    def __delitem__(self, obj: str):
+        if obj not in self:
+            raise KeyError(obj)
+        self.changes[obj] = _DELETED
+
+    def __iter__(self) -> Iterator[str]:
+        """Порядок как у словаря: объекты базы, затем новые объекты слоя"""
+        for obj in self.base:
+            if self.changes.get(obj) is not _DELETED:
+                yield obj
+        for obj, value in self.changes.items():
+            if value is not _DELETED and obj not in self.base:
+                yield obj
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"FactOverlay({dict(self)!r})"
+
+    def commit(self):
+        """Перенос изменений слоя в базу"""
+        for obj, value in self.changes.items():
+            if value is _DELETED:
+                self.base.pop(obj, None)
+            else:
+                self.base[obj] = value
+        self.changes = {}
+
+    def discard(self):
+        """Отказ от изменений: слой просто заменяется пустым"""
+        self.changes = {}
+        self.discarded = True
@@ -0,0 +1,110 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+Literal = Tuple[str, str]
+
+
+class ForwardClosure:
+    """
+    Прямое замыкание известных фактов: все заключения (объект, значение),
+    которые правила выводят из фактов без вопросов пользователю.
+
+    Вывод выполняется подсчетом невыполненных условий каждого правила, поэтому
+    каждое правило срабатывает не более одного раза, а время линейно по размеру
+    базы. Выводятся только значения объектов, которых нет среди фактов.
+
+    Если правила выводят для объекта разные значения, обратная цепочка запишет в факты
+    то, которое будет доказано первым, и результат зависит от порядка целей. Такие
+    объекты и все, что выведено через них, в замыкание не попадают - их доказывает
+    обычный поиск.
+
+    Замыкание кэшируется до изменения фактов. Добавление в факты значений из самого
+    замыкания (так доказательство записывает доказанные цели) изменением не считается
+    """
+
+    def __init__(self, kb):
+        self.kb = kb
+        self._version = None
+        # Индекс условий: факт-условие -> номера правил; число различных условий правила
+        self._rules: List[Dict] = []
+        self._by_condition: Dict[Literal, List[int]] = {}
+        self._condition_counts: List[int] = []
+        self._base: Optional[Dict[str, str]] = None
+        self._derived: Dict[Literal, str] = {}
+
+    def derived(self, facts: Dict[str, str]) -> Dict[Literal, str]:
+        """Выведенные значения: (объект, значение) -> текст правила, которое его вывело"""
+        self._check_version()
+        if self._base is None or not self._unchanged(facts):
+            self._derived = self._saturate(facts)
+            self._base = dict(facts)
+        return self._derived
+
+    def _check_version(self):
+        version = (id(self.kb), getattr(self.kb, "version", None))
+        if version == self._version:
+            return
+        self._version = version
+        self._base = None
+        self._rules = list(self.kb)
+        self._by_condition = {}
+        self._condition_counts = []
+        for index, rule in enumerate(self._rules):
+            conditions = set(rule["conditions"])
+            self._condition_counts.append(len(conditions))
+            for condition in conditions:
+                self._by_condition.setdefault(condition, []).append(index)
+
+    def _unchanged(self, facts: Dict[str, str]) -> bool:
+        base = self._base
+        if len(facts) < len(base):
+            return False
+        for obj, value in base.items():
+            if facts.get(obj) != value:
+                return False
+        if len(facts) == len(base):
+            return True
+        return all(obj in base or (obj, value) in self._derived for obj, value in facts.items())
+
+    def _saturate(self, facts: Dict[str, str]) -> Dict[Literal, str]:
+        fired = self._fire_all(facts, set())
+        values: Dict[str, Set[str]] = {}
+        for obj, value in fired:
+            values.setdefault(obj, set()).add(value)
+        conflicting = {obj for obj, obj_values in values.items() if len(obj_values) > 1}
+        if conflicting:
+            # Повторный вывод без противоречивых объектов: отбрасываются и выводы через них
+            fired = self._fire_all(facts, conflicting)
+        return {conclusion: self._rules[index]["text"] for conclusion, index in fired.items()}
+
+    def _fire_all(self, facts: Dict[str, str], blocked: Set[str]) -> Dict[Literal, int]:
+        missing = list(self._condition_counts)
+        # Заключение -> номер правила; из нескольких сработавших правил берется первое по порядку базы
+        fired: Dict[Literal, int] = {}
+        queue: List[Literal] = list(facts.items())
+
+        for index, count in enumerate(missing):
+            if not count:
+                queue.append(self._fire(index, facts, fired, blocked))
+
+        while queue:
+            literal = queue.pop()
+            if literal is None:
+                continue
+            for index in self._by_condition.get(literal, ()):
+                missing[index] -= 1
+                if not missing[index]:
+                    queue.append(self._fire(index, facts, fired, blocked))
+        return fired
+
+    def _fire(
+        self, index: int, facts: Dict[str, str], fired: Dict[Literal, int], blocked: Set[str]
+    ) -> Optional[Literal]:
+        """Срабатывание правила: новое заключение или None, если оно уже известно или исключено"""
+        conclusion = self._rules[index]["conclusion"]
+        if conclusion[0] in facts or conclusion[0] in blocked:
+            return None
+        if conclusion in fired:
+            fired[conclusion] = min(fired[conclusion], index)
+            return None
+        fired[conclusion] = index
+        return conclusion
@@ -0,0 +1,101 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class KnowledgeBase:
+    """
+    Индексированная база знаний для обратной цепочки рассуждений.
+
+    Поддерживает индекс (объект, значение) -> правила с таким заключением
+    и множество спрашиваемых (листовых) объектов - тех, что встречаются в условиях,
+    но не выводятся ни одним правилом. Оба индекса обновляются инкрементально
+    при добавлении и удалении правил, поэтому поиск правил-кандидатов для цели
+    не зависит от размера базы.
+    """
+
+    def __init__(self, rules: Optional[Iterable[Dict]] = None):
+        self._rules: Dict[int, Dict] = {}
+        self._next_id = 0
+        self._by_conclusion: Dict[Tuple[str, str], Dict[int, Dict]] = {}
+        self._conclusion_counts: Dict[str, int] = {}
+        self._condition_counts: Dict[str, int] = {}
+        self._askable: Set[str] = set()
+        # Номер версии базы: увеличивается при каждом изменении (для сброса производных кэшей)
+        self.version = 0
+
+        if rules is not None:
+            for rule in rules:
+                self.add_rule(rule)
+
+    def add_rule(self, rule: Dict) -> int:
+        """Добавление правила. Возвращает его номер для последующего удаления"""
+        rule_id = self._next_id
+        self._next_id += 1
+        self.version += 1
+        self._rules[rule_id] = rule
+
+        conclusion = rule["conclusion"]
+        self._by_conclusion.setdefault(conclusion, {})[rule_id] = rule
+
+        concl_obj = conclusion[0]
+        self._conclusion_counts[concl_obj] = self._conclusion_counts.get(concl_obj, 0) + 1
+        self._askable.discard(concl_obj)
+
+        for obj, _ in rule["conditions"]:
+            self._condition_counts[obj] = self._condition_counts.get(obj, 0) + 1
+            if obj not in self._conclusion_counts:
+                self._askable.add(obj)
+
+        return rule_id
+
+    def remove_rule(self, rule_id: int) -> Dict:
+        """Удаление правила по номеру"""
+        rule = self._rules.pop(rule_id)
+        self.version += 1
+
+        conclusion = rule["conclusion"]
+        same_conclusion = self._by_conclusion[conclusion]
+        del same_conclusion[rule_id]
+        if not same_conclusion:
+            del self._by_conclusion[conclusion]
+
+        concl_obj = conclusion[0]
+        self._conclusion_counts[concl_obj] -= 1
+        if not self._conclusion_counts[concl_obj]:
+            del self._conclusion_counts[concl_obj]
+            if concl_obj in self._condition_counts:
+                self._askable.add(concl_obj)
+
+        for obj, _ in rule["conditions"]:
+            self._condition_counts[obj] -= 1
+            if not self._condition_counts[obj]:
+                del self._condition_counts[obj]
+                self._askable.discard(obj)
+
+        return rule
+
+    def rules_for(self, goal: Tuple[str, str]) -> List[Dict]:
+        """Правила, заключение которых совпадает с целью, в порядке добавления"""
+        return list(self._by_conclusion.get(goal, {}).values())
+
+    def concludes(self, obj: str) -> bool:
+        """Выводится ли объект хотя бы одним правилом"""
+        return obj in self._conclusion_counts
+
+    def is_askable(self, obj: str) -> bool:
+        """Является ли объект листовым (его значение можно только спросить)"""
+        return obj in self._askable
+
+    @property
+    def askable_facts(self) -> Set[str]:
+        """Листовые объекты базы знаний"""
+        return set(self._askable)
+
+    def rule_ids(self) -> Iterator[Tuple[int, Dict]]:
+        """Пары (номер, правило) в порядке добавления"""
+        return iter(self._rules.items())
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self._rules.values())
@@ -0,0 +1,238 @@
+"""
+Пакетные запросы целей снизу вверх (магические множества).
+
+Для набора целей запрос компилируется один раз: магическое множество - факты
+(объект, значение), до которых обратный поиск может дойти от целей, и только
+правила с заключением из этого множества. Такое переписывание соответствует
+преобразованию магических множеств для базы без переменных: правило
+"ЕСЛИ A И B ТО C" получает охранное условие magic(C), а magic(C) порождает magic(A)
+и magic(B). Остальные правила при вычислении не участвуют.
+
+Затем запрос вычисляется сразу для всех домов: значение каждого факта - битовое
+множество домов (целое число), где он истинен, и правило - AND условий,
+заключение - OR правил. Семантика совпадает с backward_chaining без вопросов:
+известный факт дома важнее правил, правила с условиями вне области значений
+не действуют.
+
+    python magic_sets.py [--homes 2000] [--facts дома.jsonl]
+"""
+
+import argparse
+import random
+import time
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from answer_providers import StaticAnswerProvider
+
+Literal = Tuple[str, str]
+
+
+class MagicSetQuery:
+    """Скомпилированный запрос набора целей для вычисления по множеству домов"""
+
+    def __init__(self, kb, goals: Iterable[Literal], domain=None):
+        self.goals: List[Literal] = list(dict.fromkeys(goals))
+        # Магическое множество в порядке обхода и правила его выводимых фактов (условия правил)
+        self.magic: List[Literal] = []
+        self.rules: Dict[Literal, List[Tuple[Literal, ...]]] = {}
+        self._compile(kb, domain)
+
+    def _compile(self, kb, domain):
+        seen = set(self.goals)
+        stack = list(reversed(self.goals))
+        while stack:
+            literal = stack.pop()
+            self.magic.append(literal)
+            rules = [rule for rule in kb.rules_for(literal) if _rule_possible(rule, domain)]
+            if not rules:
+                continue
+            self.rules[literal] = [tuple(rule["conditions"]) for rule in rules]
+            for rule in rules:
+                for condition in rule["conditions"]:
+                    if condition not in seen:
+                        seen.add(condition)
+                        stack.append(condition)
+
+        # Обратный поиск записывает доказанную цель в факты, поэтому при двух выводимых
+        # значениях одного объекта результат зависит от порядка проверки
+        concluded: Dict[str, str] = {}
+        for obj, value in self.rules:
+            if concluded.setdefault(obj, value) != value:
+                raise ValueError(f"объект {obj} выводится с разными значениями: {concluded[obj]} и {value}")
+
+        self.objects = {obj for obj, _ in self.magic}
+        self._order = self._evaluation_order()
+
+    def _evaluation_order(self) -> List[Literal]:
+        """Выводимые факты в порядке обратного обхода в глубину: условия раньше заключений"""
+        order: List[Literal] = []
+        visited = set()
+        for root in self.rules:
+            if root in visited:
+                continue
+            visited.add(root)
+            stack = [(root, iter(self._dependencies(root)))]
+            while stack:
+                literal, children = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    order.append(literal)
+                elif child not in visited and child in self.rules:
+                    visited.add(child)
+                    stack.append((child, iter(self._dependencies(child))))
+        return order
+
+    def _dependencies(self, literal: Literal) -> List[Literal]:
+        return [condition for conditions in self.rules[literal] for condition in conditions]
+
+    def rewritten_rules(self) -> List[str]:
+        """Переписанные правила с магическими условиями (для просмотра)"""
+        lines = []
+        for literal in self.magic:
+            for conditions in self.rules.get(literal, ()):
+                body = " И ".join(f"{obj}={value}" for obj, value in conditions)
+                lines.append(f"ЕСЛИ magic({literal[0]}={literal[1]}) И {body} ТО {literal[0]}={literal[1]}")
+                for obj, value in conditions:
+                    if (obj, value) in self.rules:
+                        lines.append(f"ЕСЛИ magic({literal[0]}={literal[1]}) ТО magic({obj}={value})")
+        return lines
+
+    def evaluate(self, homes: Sequence[Dict[str, str]]) -> Dict[Literal, List[bool]]:
+        """Результат каждой цели для каждого дома (в порядке homes)"""
+        bits = self.evaluate_bits(homes)
+        size = len(homes)
+        results = {}
+        for goal in self.goals:
+            flags = format(bits[goal], f"0{size}b")[::-1] if size else ""
+            results[goal] = [flag == "1" for flag in flags]
+        return results
+
+    def evaluate_bits(self, homes: Sequence[Dict[str, str]]) -> Dict[Literal, int]:
+        """Битовые множества домов, где истинен каждый факт магического множества"""
+        size = len(homes)
+        everyone = (1 << size) - 1
+        fact_bits, known_bits = self._fact_bitsets(homes)
+        values = {literal: fact_bits.get(literal, 0) for literal in self.magic}
+
+        changed = True
+        while changed:
+            changed = False
+            for literal in self._order:
+                # Правила действуют только в домах, где значение объекта не известно
+                unknown = everyone & ~known_bits.get(literal[0], 0)
+                derived = 0
+                for conditions in self.rules[literal]:
+                    homes_bits = unknown
+                    for condition in conditions:
+                        homes_bits &= values[condition]
+                        if not homes_bits:
+                            break
+                    derived |= homes_bits
+                value = fact_bits.get(literal, 0) | derived
+                if value != values[literal]:
+                    values[literal] = value
+                    changed = True
+        return values
+
+    def _fact_bitsets(self, homes: Sequence[Dict[str, str]]) -> Tuple[Dict[Literal, int], Dict[str, int]]:
+        facts: Dict[Literal, List[int]] = {}
+        known: Dict[str, List[int]] = {}
+        magic = set(self.magic)
+        for index, home in enumerate(homes):
+            for obj, value in home.items():
+                if obj not in self.objects:
+                    continue
+                known.setdefault(obj, []).append(index)
+                if (obj, value) in magic:
+                    facts.setdefault((obj, value), []).append(index)
+
+        size = len(homes)
+        return (
+            {literal: _bitset(indices, size) for literal, indices in facts.items()},
+            {obj: _bitset(indices, size) for obj, indices in known.items()},
+        )
+
+
+def _rule_possible(rule: Dict, domain) -> bool:
+    """Правило с условием вне области значений не действует (как в обратной цепочке)"""
+    if not domain:
+        return True
+    return domain.rule_possible(rule)
+
+
+def _bitset(indices: List[int], size: int) -> int:
+    buffer = bytearray((size + 7) // 8)
+    for index in indices:
+        buffer[index >> 3] |= 1 << (index & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def compile_query(system, goals: Iterable[Literal]) -> MagicSetQuery:
+    """Запрос по базе правил и области значений системы"""
+    return MagicSetQuery(system.kb, goals, system.domain)
+
+
+def prove_homes_backward(system, goals: Sequence[Literal], homes: Sequence[Dict[str, str]]):
+    """Те же запросы обратной цепочкой: каждая цель доказывается с фактами дома, без вопросов"""
+    provider = system.answer_provider
+    system.answer_provider = StaticAnswerProvider()
+    results = {goal: [] for goal in goals}
+    try:
+        for home in homes:
+            for goal in goals:
+                system.facts = dict(home)
+                system.asked_facts = set()
+                results[goal].append(system.prove(goal, trace=False))
+    finally:
+        system.answer_provider = provider
+    return results
+
+
+def random_homes(domain, count: int, seed: int = 0, missing: float = 0.3) -> List[Dict[str, str]]:
+    """Случайные дома по области значений: каждый спрашиваемый объект известен с вероятностью 1 - missing"""
+    rng = random.Random(seed)
+    askable = [obj for obj in domain if domain.is_askable(obj)]
+    return [
+        {obj: rng.choice(domain.values(obj)) for obj in askable if rng.random() >= missing} for _ in range(count)
+    ]
+
+
+def load_homes(path: str) -> List[Dict[str, str]]:
+    """Дома из JSONL: строка - объект фактов или {"facts": {...}}"""
+    from batch_prove import iter_homes
+
+    return [facts for _, facts in iter_homes(path)]
+
+
+if __name__ == "__main__":
+    from expert_system_backward import BackwardExpertSystem
+
+    parser = argparse.ArgumentParser(description="Пакетные запросы целей по магическим множествам")
+    parser.add_argument("--homes", type=int, default=2000, help="число случайных домов")
+    parser.add_argument("--facts", metavar="ФАЙЛ", help="дома из JSONL вместо случайных")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    system = BackwardExpertSystem(interactive=False)
+    homes = load_homes(args.facts) if args.facts else random_homes(system.domain, args.homes, args.seed)
+    goals = list(dict.fromkeys(rule["conclusion"] for rule in system.kb))
+
+    started = time.perf_counter()
+    query = compile_query(system, goals)
+    compiled = time.perf_counter()
+    magic_results = query.evaluate(homes)
+    evaluated = time.perf_counter()
+    backward_results = prove_homes_backward(system, goals, homes)
+    finished = time.perf_counter()
+
+    mismatches = sum(
+        expected != actual
+        for goal in goals
+        for expected, actual in zip(backward_results[goal], magic_results[goal])
+    )
+    print(f"Домов: {len(homes)}, целей: {len(goals)}, магическое множество: {len(query.magic)} фактов")
+    print(f"Компиляция: {1000 * (compiled - started):.2f} мс")
+    print(f"Снизу вверх: {1000 * (evaluated - compiled):.2f} мс")
+    print(f"Обратная цепочка: {1000 * (finished - evaluated):.2f} мс")
+    print(f"Расхождений: {mismatches}")
@@ -1,13 +1,104 @@
+import argparse
+import json
+import os
+import shutil
 import time
 
+from answer_providers import FileAnswerProvider
 from colors import Colors
 from expert_system_backward import BackwardExpertSystem
+from proof_cache import ProofCache
+from session import SessionRecorder, replay_session
+from tracing import ChromeTraceSink
 
 
 def main():
     """Главная функция"""
-    system = BackwardExpertSystem()
+    parser = argparse.ArgumentParser(description="Экспертная система 'Умный дом' (обратная цепочка)")
+    parser.add_argument("--record", metavar="ФАЙЛ", help="записать ввод пользователя в файл сеанса")
+    parser.add_argument("--replay", metavar="ФАЙЛ", help="воспроизвести сеанс без участия пользователя")
+    parser.add_argument("--report", metavar="ФАЙЛ", help="сохранить отчет воспроизведения в JSON")
+    parser.add_argument("--answers", metavar="ФАЙЛ", help="брать значения фактов из JSON/CSV вместо вопросов")
+    parser.add_argument("--trace", metavar="ФАЙЛ", help="сохранить трассировку доказательств (Chrome trace JSON)")
+    parser.add_argument(
+        "--hybrid", action="store_true", help="гибридный режим: сначала прямое замыкание известных фактов"
+    )
+    parser.add_argument("--cache", metavar="ФАЙЛ", help="хранить ответы и доказательства между сеансами в файле")
+    parser.add_argument("--prefetch", action="store_true", help="задавать вопросы для цели одним пакетом заранее")
+    args = parser.parse_args()
+
+    if args.replay:
+        report = replay_session(args.replay, build_replay_system, main_menu, session_outcome)
+        print(f"Воспроизведено вводов: {report['consumed']} из {report['inputs']}")
+        print(f"Время: {report['elapsed']:.3f} с")
+        if not report["rules_match"]:
+            print("Внимание: файл правил или описание области (domain.txt) отличается от записанного в сеансе")
+        if args.report:
+            with open(args.report, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        return
+
+    # Пути к файлам абсолютные: воспроизведение идет во временном каталоге
+    options = {
+        "answers": os.path.abspath(args.answers) if args.answers else None,
+        "hybrid": args.hybrid,
+        "cache": os.path.abspath(args.cache) if args.cache else None,
+        "prefetch": args.prefetch,
+    }
+    if args.record:
+        with SessionRecorder(args.record, options=options):
+            run_session(options, args.trace)
+    else:
+        run_session(options, args.trace)
+
+
+def build_system(answers=None, hybrid=False, cache=None, prefetch=False) -> BackwardExpertSystem:
+    """Система с параметрами командной строки (одна и та же для сеанса и его воспроизведения)"""
+    return BackwardExpertSystem(
+        answer_provider=FileAnswerProvider(answers) if answers else None,
+        hybrid=hybrid,
+        proof_cache=ProofCache(cache) if cache else None,
+        prefetch=prefetch,
+    )
+
+
+def build_replay_system(cache=None, **options) -> BackwardExpertSystem:
+    """Система для воспроизведения: кэш копируется в рабочий каталог, чтобы не менять исходный файл"""
+    if cache:
+        replay_cache = os.path.basename(cache)
+        if os.path.exists(cache):
+            shutil.copy(cache, replay_cache)
+        cache = replay_cache
+    return build_system(cache=cache, **options)
+
+
+def run_session(options=None, trace_path=None):
+    """Интерактивный сеанс; при заданном файле события доказательств сохраняются в Chrome trace"""
+    system = build_system(**(options or {}))
+    if trace_path:
+        system.trace_sink = ChromeTraceSink()
+    try:
+        main_menu(system)
+    finally:
+        if system.proof_cache is not None:
+            system.proof_cache.flush()
+        if trace_path:
+            system.trace_sink.save(trace_path)
+            print(f"Трассировка сохранена: {trace_path}")
+
+
+def session_outcome(system: BackwardExpertSystem) -> dict:
+    """Итоговое состояние системы для сравнения воспроизведенных сеансов"""
+    return {
+        "facts": dict(system.facts),
+        "asked_facts": sorted(system.asked_facts),
+        "proven_goals": [entry["goal"] for entry in system.inference_log],
+        "rules": len(system.rules),
+    }
 
+
+def main_menu(system: BackwardExpertSystem):
+    """Главное меню"""
     while True:
         system.clear_screen()
         system.print_header("ГЛАВНОЕ МЕНЮ", Colors.BRIGHT_CYAN)
@@ -43,10 +134,13 @@ def main():
         print(
             f"  {Colors.BRIGHT_CYAN}5.{Colors.RESET} {Colors.BRIGHT_YELLOW}📚 Показать все правила{Colors.RESET}"
         )
-        print(f"  {Colors.BRIGHT_CYAN}6.{Colors.RESET} {Colors.BRIGHT_RED}🚪 Выйти{Colors.RESET}")
+        print(
+            f"  {Colors.BRIGHT_CYAN}6.{Colors.RESET} {Colors.BRIGHT_GREEN}🎯 Проверить все цели{Colors.RESET}"
+        )
+        print(f"  {Colors.BRIGHT_CYAN}7.{Colors.RESET} {Colors.BRIGHT_RED}🚪 Выйти{Colors.RESET}")
 
         try:
-            choice = input(f"\n{Colors.BRIGHT_WHITE}➤ Ваш выбор (1-6): {Colors.RESET}").strip()
+            choice = input(f"\n{Colors.BRIGHT_WHITE}➤ Ваш выбор (1-7): {Colors.RESET}").strip()
 
             if choice == "1":
                 system.run()
@@ -65,11 +159,13 @@ def main():
                 show_all_rules(system)
                 input(f"\n{Colors.DIM}Нажмите Enter для продолжения...{Colors.RESET}")
             elif choice == "6":
+                system.run_all()
+            elif choice == "7":
                 system.print_section("До свидания!", Colors.BRIGHT_MAGENTA)
                 system.animate_text("🏠 Благодарим за использование системы умного дома!")
                 break
             else:
-                system.print_error("Неверный выбор. Введите число от 1 до 6")
+                system.print_error("Неверный выбор. Введите число от 1 до 7")
                 time.sleep(1)
 
         except KeyboardInterrupt:
@@ -0,0 +1,255 @@
+import hashlib
+import json
+import os
+import time
+from typing import Callable, Dict, Optional, Set, Tuple
+
+Literal = Tuple[str, str]
+
+# Время жизни ответов по объектам (в секундах): показания датчиков устаревают быстро
+DEFAULT_TTLS = {
+    "движение_в_коридоре": 60,
+    "движение_на_входе": 60,
+    "дым": 300,
+    "утечка_газа": 300,
+    "температура_внутренняя": 900,
+    "освещенность": 900,
+    "присутствие_людей": 600,
+    "температура_внешняя": 1800,
+    "время_суток": 3600,
+}
+DEFAULT_TTL = 24 * 3600
+# Снимков одной цели в кэше: при переполнении вытесняется давно не использованный
+DEFAULT_MAX_SNAPSHOTS = 64
+
+
+class ProofCache:
+    """
+    Кэш ответов и доказательств между сеансами (JSON-файл).
+
+    Ответы пользователя и датчиков хранятся со временем получения и устаревают
+    по времени жизни своего объекта. Результат доказательства цели хранится под
+    ключом снимка фактов, от которых цель зависит: значений всех объектов ее конуса
+    правил (известные факты и действующие ответы из кэша). Пока снимок тот же,
+    повторное доказательство не нужно. Изменение или устаревание ответа удаляет
+    зависящие от объекта доказательства (по обратным ребрам зависимостей).
+    Вместе с результатом хранится отпечаток текстов правил конуса: если правила
+    изменились между сеансами, запись не используется и удаляется.
+
+    Доказательства, где на вопрос не было ответа, не кэшируются: при следующем
+    доказательстве ответ может появиться. Снимки из одних известных фактов не зависят
+    от ответов и не устаревают, поэтому на цель хранится не больше max_snapshots снимков.
+
+    Изменения копятся в памяти и записываются в файл методом flush() (система вызывает
+    его после каждого доказательства), а не при каждом ответе
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = DEFAULT_TTL,
+        clock: Optional[Callable[[], float]] = None,
+        max_snapshots: int = DEFAULT_MAX_SNAPSHOTS,
+    ):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.clock = clock or time.time
+        self.max_snapshots = max_snapshots
+        self.answers: Dict[str, Dict] = {}
+        # "объект=значение" -> ключ снимка -> {"result", "snapshot", "rules", "time", "used"}
+        self.proofs: Dict[str, Dict[str, Dict]] = {}
+        self._dependents: Dict[str, Set[Tuple[str, str]]] = {}
+        # Цель -> (объекты конуса, отпечаток правил конуса)
+        self._cones: Dict[Literal, Tuple[Tuple[str, ...], str]] = {}
+        self._kb_version = None
+        self.hits = 0
+        self.misses = 0
+        self._dirty = False
+
+        if path and os.path.exists(path):
+            self.load()
+
+    def ttl(self, obj: str) -> float:
+        return self.ttls.get(obj, self.default_ttl)
+
+    def answer(self, obj: str) -> Optional[str]:
+        """Действующий ответ из кэша или None (устаревший ответ удаляется)"""
+        entry = self.answers.get(obj)
+        if entry is None:
+            return None
+        if self.clock() - entry["time"] > self.ttl(obj):
+            self.forget(obj)
+            return None
+        return entry["value"]
+
+    def record_answer(self, obj: str, value: str):
+        """Сохранение ответа. Новое значение объекта сбрасывает зависящие от него доказательства"""
+        old = self.answers.get(obj)
+        if old is not None and old["value"] != value:
+            self._invalidate(obj)
+        self.answers[obj] = {"value": value, "time": self.clock()}
+        self._dirty = True
+
+    def forget(self, obj: str):
+        """Удаление ответа и зависящих от объекта доказательств"""
+        self.answers.pop(obj, None)
+        self._invalidate(obj)
+        self._dirty = True
+
+    def lookup(self, kb, goal: Literal, facts: Dict[str, str]) -> Optional[bool]:
+        """Результат доказательства для текущего снимка фактов или None"""
+        snapshot = self.snapshot(kb, goal, facts)
+        goal_key = _goal_key(goal)
+        snapshot_key = _snapshot_key(snapshot)
+        entry = self.proofs.get(goal_key, {}).get(snapshot_key)
+        if entry is not None and entry.get("rules") != self.rules_fingerprint(kb, goal):
+            # Результат получен по другим правилам
+            self._drop(goal_key, snapshot_key)
+            self._dirty = True
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        entry["used"] = self.clock()
+        self._dirty = True
+        return entry["result"]
+
+    def store(self, kb, goal: Literal, facts: Dict[str, str], result: bool):
+        """
+        Сохранение результата. facts - факты на момент начала доказательства:
+        снимок составляется из них и ответов, полученных (и закэшированных) за доказательство
+        """
+        snapshot = self.snapshot(kb, goal, facts)
+        goal_key = _goal_key(goal)
+        snapshot_key = _snapshot_key(snapshot)
+        entries = self.proofs.setdefault(goal_key, {})
+        now = self.clock()
+        entries[snapshot_key] = {
+            "result": result,
+            "snapshot": snapshot,
+            "rules": self.rules_fingerprint(kb, goal),
+            "time": now,
+            "used": now,
+        }
+        for obj in snapshot:
+            self._dependents.setdefault(obj, set()).add((goal_key, snapshot_key))
+        self._evict(goal_key)
+        self._dirty = True
+
+    def snapshot(self, kb, goal: Literal, facts: Dict[str, str]) -> Dict[str, Optional[str]]:
+        """Значения объектов конуса цели: факт, иначе действующий ответ из кэша, иначе None"""
+        snapshot = {}
+        for obj in self._cone(kb, goal)[0]:
+            value = facts.get(obj)
+            snapshot[obj] = value if value is not None else self.answer(obj)
+        return snapshot
+
+    def rules_fingerprint(self, kb, goal: Literal) -> str:
+        """sha256 текстов правил, от которых зависит доказательство цели"""
+        return self._cone(kb, goal)[1]
+
+    def clear(self):
+        self.answers.clear()
+        self.proofs.clear()
+        self._dependents.clear()
+        self._dirty = True
+
+    def _cone(self, kb, goal: Literal) -> Tuple[Tuple[str, ...], str]:
+        """Объекты, от которых зависит доказательство цели (включая ее объект), и отпечаток правил конуса"""
+        version = (id(kb), getattr(kb, "version", None))
+        if version != self._kb_version:
+            self._cones.clear()
+            self._kb_version = version
+
+        cone = self._cones.get(goal)
+        if cone is None:
+            objects = {goal[0]}
+            texts = set()
+            seen = {goal}
+            stack = [goal]
+            while stack:
+                for rule in kb.rules_for(stack.pop()):
+                    texts.add(rule["text"])
+                    for condition in rule["conditions"]:
+                        objects.add(condition[0])
+                        if condition not in seen:
+                            seen.add(condition)
+                            stack.append(condition)
+            fingerprint = hashlib.sha256("\n".join(sorted(texts)).encode("utf-8")).hexdigest()
+            cone = self._cones[goal] = (tuple(sorted(objects)), fingerprint)
+        return cone
+
+    def _evict(self, goal_key: str):
+        """Вытеснение давно не использованных снимков цели сверх max_snapshots"""
+        entries = self.proofs[goal_key]
+        excess = len(entries) - self.max_snapshots
+        if excess <= 0:
+            return
+        for snapshot_key in sorted(entries, key=lambda key: entries[key].get("used", entries[key]["time"]))[:excess]:
+            self._drop(goal_key, snapshot_key)
+
+    def _drop(self, goal_key: str, snapshot_key: str):
+        """Удаление одного снимка цели вместе с обратными ребрами"""
+        entries = self.proofs.get(goal_key, {})
+        entry = entries.pop(snapshot_key, None)
+        if entry is not None:
+            for obj in entry["snapshot"]:
+                dependents = self._dependents.get(obj)
+                if dependents is not None:
+                    dependents.discard((goal_key, snapshot_key))
+        if not entries:
+            self.proofs.pop(goal_key, None)
+
+    def _invalidate(self, obj: str):
+        for goal_key, snapshot_key in self._dependents.pop(obj, ()):
+            entries = self.proofs.get(goal_key)
+            if entries is None:
+                continue
+            entries.pop(snapshot_key, None)
+            if not entries:
+                del self.proofs[goal_key]
+
+    def load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        self.answers = data.get("answers", {})
+        self.proofs = data.get("proofs", {})
+        self._dependents = {}
+        for goal_key, entries in self.proofs.items():
+            for snapshot_key, entry in entries.items():
+                for obj in entry["snapshot"]:
+                    self._dependents.setdefault(obj, set()).add((goal_key, snapshot_key))
+        for goal_key in list(self.proofs):
+            self._evict(goal_key)
+        self._dirty = False
+
+    def flush(self):
+        """Запись накопленных изменений в файл (если они есть)"""
+        if self._dirty:
+            self.save()
+
+    def save(self):
+        """
+        Запись во временный файл и атомарная замена: при сбое в файле остается прежнее
+        или новое содержимое целиком (без файла кэш живет только в памяти)
+        """
+        self._dirty = False
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"answers": self.answers, "proofs": self.proofs}, f, ensure_ascii=False, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def _goal_key(goal: Literal) -> str:
+    return f"{goal[0]}={goal[1]}"
+
+
+def _snapshot_key(snapshot: Dict[str, Optional[str]]) -> str:
+    return json.dumps(sorted(snapshot.items()), ensure_ascii=False)
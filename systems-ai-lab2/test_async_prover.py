@@ -0,0 +1,112 @@
+"""
+Проверка асинхронного режима: запросы к датчикам идут параллельно,
+а результаты совпадают с последовательным доказательством (prove).
+
+    python -m unittest test_async_prover
+"""
+
+import os
+import time
+import unittest
+
+from answer_providers import StaticAnswerProvider
+from async_prover import AsyncBackwardProver, MockSensorService
+from expert_system_backward import BackwardExpertSystem
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.txt")
+
+READINGS = {
+    "движение_на_входе": "да",
+    "движение_в_коридоре": "нет",
+    "дым": "нет",
+    "утечка_газа": "нет",
+    "температура_внутренняя": "нормально",
+}
+GOALS = [
+    ("сигнал_тревоги", "да"),
+    ("включить_ночник", "да"),
+    ("пожарная_тревога", "да"),
+    ("перекрыть_газ", "да"),
+    ("уменьшить_отопление", "да"),
+]
+SCENARIOS = [
+    {},
+    {"время_суток": "день", "присутствие_людей": "нет"},
+    {"время_суток": "ночь"},
+    {"время_суток": "вечер", "присутствие_людей": "да"},
+]
+
+
+class ConcurrencySensorService(MockSensorService):
+    """Заглушка датчиков, которая считает одновременно выполняемые запросы"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.active = 0
+        self.max_active = 0
+
+    async def read(self, obj):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            return await super().read(obj)
+        finally:
+            self.active -= 1
+
+
+class AsyncProverTest(unittest.TestCase):
+    def make_system(self, facts, answers=None):
+        system = BackwardExpertSystem(
+            RULES_FILE, answer_provider=StaticAnswerProvider(answers or {}), interactive=False
+        )
+        system.facts = dict(facts)
+        return system
+
+    def test_results_match_sequential_prove(self):
+        for facts in SCENARIOS:
+            sequential = self.make_system(facts, READINGS)
+            expected = [sequential.prove(goal, trace=False) for goal in GOALS]
+
+            system = self.make_system(facts)
+            prover = AsyncBackwardProver(system, MockSensorService(READINGS, delay=0.01), timeout=1.0)
+            results = [prover.prove(goal) for goal in GOALS]
+            self.assertEqual(results, expected, facts)
+
+    def test_sensor_queries_overlap(self):
+        delay = 0.05
+        sensors = ConcurrencySensorService(READINGS, delay=delay)
+        # Без стартовых фактов у правил по несколько неизвестных листовых условий
+        prover = AsyncBackwardProver(self.make_system({}), sensors, timeout=1.0)
+
+        start = time.perf_counter()
+        for goal in GOALS:
+            prover.prove(goal)
+        elapsed = time.perf_counter() - start
+
+        self.assertGreater(sensors.max_active, 1)
+        self.assertLess(elapsed, sensors.completed * delay)
+
+    def test_slow_sensor_times_out(self):
+        sensors = MockSensorService(READINGS, delay=0.01, delays={"дым": 1.0})
+        system = self.make_system({})
+        prover = AsyncBackwardProver(system, sensors, timeout=0.05)
+        self.assertFalse(prover.prove(("пожарная_тревога", "да")))
+        self.assertNotIn("дым", system.facts)
+
+    def test_reading_outside_domain_is_discarded(self):
+        sensors = MockSensorService({"дым": "возможно"}, delay=0.01)
+        system = self.make_system({})
+        prover = AsyncBackwardProver(system, sensors, timeout=1.0)
+        self.assertFalse(prover.prove(("пожарная_тревога", "да")))
+        self.assertNotIn("дым", system.facts)
+
+    def test_impossible_goals_are_not_queried(self):
+        sensors = MockSensorService(READINGS, delay=0.01)
+        prover = AsyncBackwardProver(self.make_system({}), sensors, timeout=1.0)
+        for goal in [("дым", "возможно"), ("включить_освещение", "да"), ("сигнал_тревоги", "включено")]:
+            self.assertFalse(prover.prove(goal), goal)
+        self.assertEqual(sensors.queries, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+Проверка запросов по магическим множествам: результаты совпадают
+с обратной цепочкой (prove) на разных наборах фактов.
+
+    python -m unittest test_magic_sets
+"""
+
+import os
+import random
+import unittest
+
+from answer_providers import StaticAnswerProvider
+from expert_system_backward import BackwardExpertSystem
+from magic_sets import MagicSetQuery, random_homes
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.txt")
+
+
+class MagicSetsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.system = BackwardExpertSystem(RULES_FILE, answer_provider=StaticAnswerProvider(), interactive=False)
+        cls.goals = list(dict.fromkeys(rule["conclusion"] for rule in cls.system.kb))
+
+    def prove_all(self, goals, homes):
+        """Каждая цель доказывается заново с фактами дома, без ответов на вопросы"""
+        results = {goal: [] for goal in goals}
+        for home in homes:
+            for goal in goals:
+                self.system.facts = dict(home)
+                self.system.asked_facts = set()
+                results[goal].append(self.system.prove(goal, trace=False))
+        return results
+
+    def assert_same_results(self, query, goals, homes):
+        expected = self.prove_all(goals, homes)
+        actual = query.evaluate(homes)
+        for goal in goals:
+            self.assertEqual(actual[goal], expected[goal], goal)
+
+    def test_random_homes(self):
+        query = MagicSetQuery(self.system.kb, self.goals, self.system.domain)
+        for seed, missing in [(0, 0.3), (1, 0.0), (2, 0.7)]:
+            with self.subTest(seed=seed, missing=missing):
+                homes = random_homes(self.system.domain, 60, seed, missing)
+                self.assert_same_results(query, self.goals, homes)
+
+    def test_known_conclusions_override_rules(self):
+        # В домах известны и некоторые выводимые объекты: известный факт важнее правил
+        rng = random.Random(3)
+        homes = random_homes(self.system.domain, 60, seed=3)
+        derived = [obj for obj in self.system.domain if self.system.domain.is_askable(obj) is False]
+        for home in homes:
+            for obj in rng.sample(derived, 3):
+                home[obj] = rng.choice(self.system.domain.values(obj))
+
+        query = MagicSetQuery(self.system.kb, self.goals, self.system.domain)
+        self.assert_same_results(query, self.goals, homes)
+
+    def test_goal_subset(self):
+        goals = self.goals[::3]
+        query = MagicSetQuery(self.system.kb, goals, self.system.domain)
+        self.assertLessEqual(len(query.rules), len(list(self.system.kb)))
+        self.assert_same_results(query, goals, random_homes(self.system.domain, 60, seed=4))
+
+    def test_empty_homes(self):
+        query = MagicSetQuery(self.system.kb, self.goals, self.system.domain)
+        self.assert_same_results(query, self.goals, [{}, {}])
+
+
+if __name__ == "__main__":
+    unittest.main()
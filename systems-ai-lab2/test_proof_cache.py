@@ -0,0 +1,77 @@
+"""
+Проверка кэша доказательств между сеансами: результат используется повторно,
+пока не изменились правила конуса цели.
+
+    python -m unittest test_proof_cache
+"""
+
+import os
+import tempfile
+import unittest
+
+from answer_providers import StaticAnswerProvider
+from expert_system_backward import BackwardExpertSystem
+from proof_cache import ProofCache
+
+RULES = """
+ЕСЛИ дым=да ТО пожарная_тревога=да
+ЕСЛИ утечка_газа=да ТО перекрыть_газ=да
+"""
+GOAL = ("пожарная_тревога", "да")
+
+
+class ProofCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.rules_file = os.path.join(self.directory.name, "rules.txt")
+        self.cache_file = os.path.join(self.directory.name, "cache.json")
+        self.write_rules(RULES)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_rules(self, text):
+        with open(self.rules_file, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def session(self, answers=None):
+        """Новый сеанс: система заново читает правила и файл кэша"""
+        cache = ProofCache(self.cache_file, clock=lambda: 1000.0)
+        system = BackwardExpertSystem(
+            self.rules_file, answer_provider=StaticAnswerProvider(answers), interactive=False, proof_cache=cache
+        )
+        system.facts = {}
+        return system, cache
+
+    def test_unchanged_rules_reuse_cached_proof(self):
+        system, _ = self.session({"дым": "да"})
+        self.assertTrue(system.prove(GOAL, trace=False))
+
+        system, cache = self.session()
+        self.assertTrue(system.prove(GOAL, trace=False))
+        self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_edited_rule_invalidates_cached_proof(self):
+        system, _ = self.session({"дым": "да"})
+        self.assertTrue(system.prove(GOAL, trace=False))
+
+        self.write_rules(RULES.replace("дым=да", "дым=нет"))
+        system, cache = self.session()
+        # Ответ о дыме по-прежнему берется из кэша, а доказательство - нет
+        self.assertFalse(system.prove(GOAL, trace=False))
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        # Запись, полученная по прежним правилам, удалена и из файла
+        self.assertEqual(ProofCache(self.cache_file).proofs, {})
+
+    def test_rules_outside_cone_do_not_invalidate(self):
+        system, _ = self.session({"дым": "да"})
+        self.assertTrue(system.prove(GOAL, trace=False))
+
+        self.write_rules(RULES.replace("утечка_газа=да", "утечка_газа=возможно"))
+        system, cache = self.session()
+        self.assertTrue(system.prove(GOAL, trace=False))
+        self.assertEqual(cache.hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
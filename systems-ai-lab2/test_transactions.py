@@ -0,0 +1,89 @@
+"""
+Проверка транзакций доказательства: пробные доказательства не меняют результат
+последующих (в том числе с отсечением по опорным наборам).
+
+    python -m unittest test_transactions
+"""
+
+import os
+import random
+import unittest
+
+from answer_providers import StaticAnswerProvider
+from expert_system_backward import BackwardExpertSystem
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.txt")
+
+
+def make_system(answers, short_circuit=True):
+    return BackwardExpertSystem(
+        RULES_FILE, answer_provider=StaticAnswerProvider(answers), interactive=False, short_circuit=short_circuit
+    )
+
+
+class TransactionTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        system = make_system({})
+        cls.domain = system.domain
+        cls.goals = list(dict.fromkeys(rule["conclusion"] for rule in system.kb))
+
+    def random_answers(self, rng):
+        askable = [obj for obj in self.domain if self.domain.is_askable(obj)]
+        return {obj: rng.choice(self.domain.values(obj)) for obj in askable if rng.random() < 0.8}
+
+    def test_can_prove_leaves_facts_unchanged(self):
+        system = make_system({"дым": "да", "утечка_газа": "нет"})
+        facts, log = dict(system.facts), list(system.inference_log)
+        for goal in self.goals:
+            system.can_prove(goal)
+        self.assertEqual(system.facts, facts)
+        self.assertEqual(system.inference_log, log)
+
+    def test_failed_try_prove_is_discarded(self):
+        system = make_system({"дым": "нет", "утечка_газа": "нет"})
+        facts = dict(system.facts)
+        self.assertFalse(system.try_prove(("перекрыть_газ", "да")))
+        self.assertEqual(system.facts, facts)
+
+    def test_prove_after_can_prove_with_short_circuit(self):
+        rng = random.Random(7)
+        for _ in range(300):
+            answers = self.random_answers(rng)
+            goal = rng.choice(self.goals)
+            expected = make_system(answers).prove(goal, trace=False)
+
+            system = make_system(answers)
+            self.assertEqual(system.can_prove(goal), expected, (goal, answers))
+            self.assertEqual(system.prove(goal, trace=False), expected, (goal, answers))
+
+    def test_prove_after_failed_try_prove_with_short_circuit(self):
+        rng = random.Random(11)
+        for _ in range(100):
+            answers = self.random_answers(rng)
+            first, goal = rng.choice(self.goals), rng.choice(self.goals)
+            expected = make_system(answers).prove(goal, trace=False)
+
+            system = make_system(answers)
+            if not system.try_prove(first):
+                self.assertEqual(system.prove(goal, trace=False), expected, (first, goal, answers))
+
+    def test_answers_survive_discard(self):
+        asked = []
+
+        class CountingProvider(StaticAnswerProvider):
+            def answer(self, fact_name, indent=""):
+                asked.append(fact_name)
+                return super().answer(fact_name, indent)
+
+        system = BackwardExpertSystem(
+            RULES_FILE, answer_provider=CountingProvider({"утечка_газа": "да"}), interactive=False, short_circuit=True
+        )
+        self.assertTrue(system.can_prove(("перекрыть_газ", "да")))
+        questions = len(asked)
+        self.assertTrue(system.prove(("перекрыть_газ", "да"), trace=False))
+        self.assertEqual(len(asked), questions)
+
+
+if __name__ == "__main__":
+    unittest.main()
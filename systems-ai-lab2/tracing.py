@@ -0,0 +1,193 @@
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from colors import Colors
+
+# События доказательства. Каждое событие - словарь с ключами "event", "goal" (объект, значение),
+# "depth" (глубина цели) и полями, специфичными для события:
+#   goal_enter  - начало доказательства цели
+#   goal_exit   - цель решена: result
+#   fact        - цель решена известным фактом: value, result
+#   derived     - цель следует из фактов по прямой цепочке (гибридный режим): rule
+#   table_hit   - результат взят из таблицы подцелей: result
+#   cached      - результат взят из кэша доказательств между сеансами: result
+#   cycle       - цель уже доказывается выше по цепочке
+#   impossible  - цель недостижима по области значений: reason
+#   pruned      - известные факты исключают все правила цели
+#   rules_found - найдены правила-кандидаты: count
+#   rule_try    - проверка правила: rule, index (с 1)
+#   subgoal     - проверка условия правила (goal - условие)
+#   rule_fail   - условие не доказано, правило отброшено
+#   goal_proved - цель доказана правилом: rule
+#   ask         - правила не доказали цель, задается вопрос
+#   answer      - ответ на вопрос: value (None - ответа нет), result
+#   unproven    - правила не доказали выводимую цель, вопрос не задается
+EVENTS = (
+    "goal_enter",
+    "goal_exit",
+    "fact",
+    "derived",
+    "table_hit",
+    "cached",
+    "cycle",
+    "impossible",
+    "pruned",
+    "rules_found",
+    "rule_try",
+    "subgoal",
+    "rule_fail",
+    "goal_proved",
+    "ask",
+    "answer",
+    "unproven",
+)
+
+
+class TraceSink(ABC):
+    """
+    Приемник событий трассировки. Доказательство создает события только
+    при подключенном приемнике, поэтому без него трассировка ничего не стоит
+    """
+
+    @abstractmethod
+    def emit(self, event: Dict):
+        """Обработка одного события доказательства"""
+
+
+class ConsoleTraceSink(TraceSink):
+    """Цветное дерево доказательства в консоли (прежний вывод trace=True)"""
+
+    def emit(self, event: Dict):
+        kind = event["event"]
+        indent = "  " * event["depth"]
+        goal_obj, goal_value = event["goal"]
+
+        if kind == "goal_enter":
+            print(f"\n{indent}{Colors.BRIGHT_MAGENTA}🎯 Цель: {Colors.CYAN}{goal_obj} = {goal_value}{Colors.RESET}")
+        elif kind == "fact":
+            if event["result"]:
+                print(f"{indent}{Colors.BRIGHT_GREEN}✓ Найдено в базе фактов: {goal_obj} = {event['value']}{Colors.RESET}")
+            else:
+                print(
+                    f"{indent}{Colors.BRIGHT_RED}✗ Противоречие: {goal_obj} = {event['value']} ≠ {goal_value}{Colors.RESET}"
+                )
+        elif kind == "derived":
+            print(f"{indent}{Colors.BRIGHT_GREEN}⚡ Следует из известных фактов: {event['rule']}{Colors.RESET}")
+        elif kind == "table_hit":
+            status = "доказана" if event["result"] else "не доказана"
+            print(f"{indent}{Colors.BRIGHT_BLUE}♻ Подцель уже {status} в этом доказательстве{Colors.RESET}")
+        elif kind == "cached":
+            status = "доказана" if event["result"] else "не доказана"
+            print(f"{indent}{Colors.BRIGHT_BLUE}💾 Цель {status} ранее (кэш доказательств){Colors.RESET}")
+        elif kind == "cycle":
+            print(f"{indent}{Colors.BRIGHT_YELLOW}↻ Цикл: цель уже доказывается выше по цепочке{Colors.RESET}")
+        elif kind == "impossible":
+            print(f"{indent}{Colors.BRIGHT_RED}⊘ Цель недостижима: {event['reason']}{Colors.RESET}")
+        elif kind == "pruned":
+            print(f"{indent}{Colors.BRIGHT_BLUE}⊘ Известные факты исключают все правила цели{Colors.RESET}")
+        elif kind == "rules_found":
+            print(f"{indent}{Colors.BRIGHT_BLUE}📚 Найдено правил для проверки: {event['count']}{Colors.RESET}")
+        elif kind == "rule_try":
+            print(f"\n{indent}{Colors.BRIGHT_YELLOW}🔍 Проверяю правило #{event['index']}:{Colors.RESET}")
+            print(f"{indent}{Colors.DIM}   {event['rule']}{Colors.RESET}")
+        elif kind == "subgoal":
+            print(f"{indent}{Colors.DIM}├─ Подцель: {goal_obj} = {goal_value}{Colors.RESET}")
+        elif kind == "rule_fail":
+            print(f"{indent}{Colors.BRIGHT_RED}└─ ✗ Подцель не доказана{Colors.RESET}")
+        elif kind == "goal_proved":
+            print(f"\n{indent}{Colors.BRIGHT_GREEN}✓✓✓ ЦЕЛЬ ДОКАЗАНА: {goal_obj} = {goal_value}{Colors.RESET}")
+            print(f"{indent}{Colors.BRIGHT_GREEN}    Использовано правило: {event['rule']}{Colors.RESET}")
+        elif kind == "ask":
+            print(f"\n{indent}{Colors.BRIGHT_YELLOW}💭 Не удалось доказать через правила{Colors.RESET}")
+        elif kind == "unproven":
+            print(f"\n{indent}{Colors.BRIGHT_RED}✗✗✗ ЦЕЛЬ НЕ ДОКАЗАНА: {goal_obj} = {goal_value}{Colors.RESET}")
+        elif kind == "answer":
+            if event["value"] is None:
+                print(f"{indent}{Colors.BRIGHT_RED}✗✗✗ ЦЕЛЬ НЕ ДОКАЗАНА: {goal_obj} = {goal_value}{Colors.RESET}")
+            elif event["result"]:
+                print(f"{indent}{Colors.BRIGHT_GREEN}✓ Цель подтверждена пользователем{Colors.RESET}")
+            else:
+                print(f"{indent}{Colors.BRIGHT_RED}✗ Цель опровергнута пользователем{Colors.RESET}")
+
+
+class ListTraceSink(TraceSink):
+    """Накопление событий в списке (для тестов и анализа)"""
+
+    def __init__(self):
+        self.events: List[Dict] = []
+
+    def emit(self, event: Dict):
+        self.events.append(event)
+
+
+class TeeTraceSink(TraceSink):
+    """Передача каждого события нескольким приемникам"""
+
+    def __init__(self, *sinks: TraceSink):
+        self.sinks = sinks
+
+    def emit(self, event: Dict):
+        for sink in self.sinks:
+            sink.emit(event)
+
+
+class ChromeTraceSink(TraceSink):
+    """
+    Экспорт в формат Chrome Trace Event (открывается в chrome://tracing и ui.perfetto.dev).
+    Цели, проверки правил и вопросы становятся вложенными интервалами,
+    остальные события - мгновенными отметками. Время - в микросекундах от создания приемника
+    """
+
+    def __init__(self, process_name: str = "Обратная цепочка"):
+        self.process_name = process_name
+        self.trace_events: List[Dict] = []
+        self._start = time.perf_counter()
+        self._pid = os.getpid()
+        # Открытые интервалы правил по глубине цели (правило закрывается неуспехом или доказательством)
+        self._open_rules: Dict[int, bool] = {}
+
+    def _timestamp(self) -> float:
+        return (time.perf_counter() - self._start) * 1_000_000
+
+    def _add(self, phase: str, name: str, category: str, args: Optional[Dict] = None):
+        record = {"name": name, "cat": category, "ph": phase, "ts": self._timestamp(), "pid": self._pid, "tid": 1}
+        if phase == "i":
+            record["s"] = "t"
+        if args:
+            record["args"] = args
+        self.trace_events.append(record)
+
+    def emit(self, event: Dict):
+        kind = event["event"]
+        goal_obj, goal_value = event["goal"]
+        name = f"{goal_obj} = {goal_value}"
+        depth = event["depth"]
+
+        if kind == "goal_enter":
+            self._add("B", name, "goal")
+        elif kind == "goal_exit":
+            self._add("E", name, "goal", {"result": event["result"]})
+        elif kind == "rule_try":
+            self._add("B", event["rule"], "rule", {"index": event["index"]})
+            self._open_rules[depth] = True
+        elif kind in ("rule_fail", "goal_proved"):
+            if self._open_rules.pop(depth, False):
+                self._add("E", "", "rule", {"result": kind == "goal_proved"})
+        elif kind == "ask":
+            self._add("B", f"вопрос: {goal_obj}", "ask")
+        elif kind == "answer":
+            self._add("E", f"вопрос: {goal_obj}", "ask", {"value": event["value"], "result": event["result"]})
+        else:
+            args = {key: value for key, value in event.items() if key not in ("event", "goal", "depth")}
+            self._add("i", f"{kind}: {name}", kind, args or None)
+
+    def to_json(self) -> Dict:
+        metadata = {"name": "process_name", "ph": "M", "pid": self._pid, "args": {"name": self.process_name}}
+        return {"traceEvents": [metadata] + self.trace_events, "displayTimeUnit": "ms"}
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, ensure_ascii=False)